@@ -1,24 +1,33 @@
 import sys, os
-import struct
 import json
+import time
 from datetime import datetime
 
+_STARTED = time.perf_counter()
+
 from PyQt5 import QtWidgets, QtGui
 from PyQt5.QtWidgets import QMessageBox, QSplashScreen, QApplication
-from PyQt5.QtCore import QThread, Qt, QTimer, QEvent, QUrl, QMimeData, QByteArray
-from PyQt5.QtGui import QIcon, QPixmap, QDrag
-from PyQt5 import uic
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QIcon, QPixmap
+from support_files.ui_loader import load_ui
 
 
 
 from appdirs import user_config_dir
 
 from support_files.settings import LocalAssetBrowserSettings
-from support_files.search import SearchWorker
-from support_files.flow_layout import FlowLayout
-from support_files.asset_widget import ClickableVersionWidget
-from support_files.ffmpeg_worker import FFMPEGWorker, BackGroundWorker
-from support_files.workers import TableBuilderWorker, OptimizedTableDelegate
+from support_files.search import DatabaseLoader, DatabasePoller, DatabaseSaver, SearchWorker
+from support_files.library import changed_assets, copy_assets, merge_scan
+from support_files.shared_db import SharedDatabase
+from support_files.integrity import FRAME_PROBLEM_KEYS
+from support_files.asset_model import AssetModel, AssetProxyModel, INTERNAL_KEYS
+from support_files.grid_view import AssetGridView
+from support_files.workers import (TableBuilderWorker, OptimizedTableDelegate, IncrementalBuilder,
+                                   asset_info_text, asset_row, thumbnail_loader)
+from support_files.patterns import version_stacks
+from support_files.diagnostics import metrics
+from support_files.startup import StartupProgress
+from support_files.jobs import HIGH, job_scheduler
 
 
 
@@ -27,30 +36,27 @@ class SplashScreen(QSplashScreen):
         image = os.path.join(os.path.dirname(__file__), 'icons', 'splash.jpg')
         super().__init__(QPixmap(image))
         
-        self.ui = uic.loadUi(os.path.join(os.path.dirname(__file__), 'ui', 'splash.ui'), self)
+        self.ui = load_ui('splash', self)
         self.window = window
-        self.ui.status_text.setText(self.window.status)
-        self.ui.progressBar.setValue(0)
         self.setFixedSize(1050, 600)
         self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint | Qt.CustomizeWindowHint)
+
+        # Updated by the startup progress signals, no polling
+        startup = self.window.startup
+        self.set_progress(startup.text, startup.percent())
+        startup.changed.connect(self.set_progress)
+        startup.ready.connect(self.show_window)
         self.show()
-        
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.refresh_status)
-        self.timer.start(10)
-
-    def refresh_status(self):
-        if self.window.loaded:
-            self.timer.stop()
-            self.close()
-            self.window.show()
-        else:
-            if not self.window.database or len(self.window.database) == 0:
-                self.ui.status_text.setText(self.window.status)
-                self.ui.progressBar.setValue(int(self.window.percent/3.33))
-            else:
-                self.ui.status_text.setText(self.window.status)
-                self.ui.progressBar.setValue(int(self.window.percent/3.33*2 +33))
+        if startup.done:
+            QTimer.singleShot(0, self.show_window)
+
+    def set_progress(self, text, percent):
+        self.ui.status_text.setText(text)
+        self.ui.progressBar.setValue(percent)
+
+    def show_window(self):
+        self.close()
+        self.window.show()
 
             
         
@@ -60,169 +66,426 @@ class LocalAssetBrowser(QtWidgets.QMainWindow):
         super().__init__()
         
         self.setWindowTitle("Local Asset Browser")
+        # Weighted startup phases, the splash screen follows them (see startup.py)
+        self.startup = StartupProgress(self)
+        self.startup.ready.connect(self.on_startup_ready)
         self.settings = LocalAssetBrowserSettings()
         self.status = 'Initializing...'
         self.percent = 0
         self.file_list = {}
         self.database = {}
         
-        # Track active threads for proper cleanup
-        self.table_builder_thread = None
+        # Background jobs (see jobs.py), kept to cancel them
+        self.scan_job = None
         self.table_builder_worker = None
-
-        self.search_worker = SearchWorker()
-        self.search_worker.search_completed.connect(self.on_search_completed)
-        self.search_worker.search_status.connect(self.on_search_status)
-        self.search_worker.create_widget.connect(self.create_asset_widget)
-        
-        # queue for batching widget creation to keep UI responsive
-        self._widget_queue = []
-        self._processing_queue = False
+        self._table_build_id = 0
+        self.background_worker = None
+
+        # Thumbnail slider / header resizes are coalesced into one update per frame,
+        # and the delegate gets a full-quality redraw once the size has settled
+        self._pending_row_height = None
+        self._resize_frame_timer = QTimer(self)
+        self._resize_frame_timer.setSingleShot(True)
+        self._resize_frame_timer.setInterval(16)
+        self._resize_frame_timer.timeout.connect(self._apply_pending_resize)
+        self._resize_settle_timer = QTimer(self)
+        self._resize_settle_timer.setSingleShot(True)
+        self._resize_settle_timer.setInterval(150)
+        self._resize_settle_timer.timeout.connect(self.reset_thumbnail_sizes)
+
+        # Version stacks: head id -> older version ids, and older id -> head id
+        self.version_stacks = {}
+        self.version_head = {}
+        self._search_heads_shown = set()
+        # Thumbnail/metadata jobs started when a stack is expanded, kept until finished
+        self.version_workers = []
+
+        self.metadata_worker = None
+        self.diagnostics_dialog = None
+        self._metadata_save_timer = QTimer(self)
+        self._metadata_save_timer.setSingleShot(True)
+        self._metadata_save_timer.setInterval(5000)
+        self._metadata_save_timer.timeout.connect(self.save_database)
+        # One save at a time, a save asked for meanwhile follows it
+        self.database_saver = None
+        self._save_pending = False
+        # Other browsers/indexers on the same library: their saves are merged in as they come
+        self.database_poller = None
+        # (generation, changes) polled while a save was running (see database_busy)
+        self._polled_changes = None
+        self._database_poll_timer = QTimer(self)
+        self._database_poll_timer.setInterval(3000)
+        self._database_poll_timer.timeout.connect(self.poll_database)
+
+        # Render farm mode: results committed by farm workers are picked up periodically
+        self.farm_collector = None
+        self._farm_timer = QTimer(self)
+        self._farm_timer.setInterval(10000)
+        self._farm_timer.timeout.connect(self.collect_farm_results)
 
         self.setup_ui()
         self.settings.load_settings()
         self.set_library_root()
-        self.search_worker.set_search_parameters(self.library_root)
-        self.refresh_versions_threaded()
+
+        # Token/trigram index behind the search box, queried off the GUI thread,
+        # and perceptual hashes of the thumbnails for "Find Similar" (see setup_search)
+        self.search_index = None
+        self.search_query_worker = None
+        self.similarity_index = None
+        self.search_generation = 0
+        self.search_query = None
+        # Asset shown by "Find Similar", None for a search box query
+        self.similar_to = None
         self.loaded = False
+        startup_milestone('window')
+
+        # The stored database is shown first, the rescan waits for the first paint
+        self._rescan_pending = False
+        self._first_paint = False
+        self._thumbnails_pending = False
+        self._table_built = False
+        self.asset_model.rowsInserted.connect(self.check_first_page)
+        self.startup.begin('database', 'Loading database...')
+        self.shared_database = SharedDatabase(self.library_root)
+        self.database_loader = DatabaseLoader(self.shared_database)
+        self.database_loader.loaded.connect(self.on_database_loaded)
+        job_scheduler().submit(self.database_loader)
+
+    def setup_search(self):
+        """Search and similarity indexes, made once there is something to index"""
+        if self.search_index is not None:
+            return
+        # Imported here: both use numpy, which isn't needed to show the window
+        from support_files.search_index import SearchIndex, SearchQueryWorker
+        from support_files.similarity import SimilarityIndex
+        self.search_index = SearchIndex(self.search_index_path())
+        self.search_query_worker = SearchQueryWorker(self.search_index)
+        self.search_query_worker.results_ready.connect(self.on_search_results)
+        self.search_query_worker.start()
+        self.similarity_index = SimilarityIndex()
+
+    def on_database_loaded(self, database):
+        startup_milestone('database_loaded')
+        self.database = database
+        self.setup_search()
+        self._database_poll_timer.start()
+        if not database:
+            # First run on this library: nothing to show until it is scanned
+            self.refresh_versions_threaded()
+            return
+        self._rescan_pending = True
+        self.build_table_widget()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._first_paint:
+            self._first_paint = True
+            QTimer.singleShot(0, self.on_first_paint)
+
+    def on_first_paint(self):
+        startup_milestone('first_paint')
+        if self._rescan_pending:
+            self._rescan_pending = False
+            self.refresh_versions_threaded()
         
 
 
         
-    def refresh_versions_threaded(self):
-        # If a worker thread is already running, stop it first
-        self.ui.version_grid.clear()
+    def scanning(self):
+        return self.scan_job is not None and not self.scan_job.done
+
+    def refresh_versions_threaded(self, incremental=True):
+        # A second click on the button cancels the running scan
         self.file_list = {}
-        try:
-            if hasattr(self, "worker_thread") and self.worker_thread.isRunning():
-                print("⏹ Stopping previous worker...")
-                self.worker.is_stopped = True
-                self.worker_thread.requestInterruption()
-                self.worker_thread.quit()
-                self.worker_thread.wait()  # Block until fully stopped
-                self.ui.refresh_button.setText("Refresh")
-                return
-        except Exception as e:
-            print("Error stopping previous worker:", e)
+        if self.scanning():
+            print("⏹ Cancelling the running scan...")
+            self.scan_job.cancel()
+            self.ui.refresh_button.setText("Refresh")
+            return
 
         self.ui.refresh_button.setText("Cancel")
+        self.startup.begin('scan', 'Scanning library...')
 
         print("🔄 Starting new refresh...")
         
-        self.worker_thread = QThread()
-        self.worker = SearchWorker()
-        self.worker.set_search_parameters(self.set_library_root())
-        self.worker.moveToThread(self.worker_thread)
-
-        # Connect signals
-        self.worker_thread.started.connect(self.worker.run)
-        self.worker.create_widget.connect(self.create_asset_widget)
-        self.worker.search_status.connect(self.on_search_status)
-        #self.worker.finished.connect(self.on_search_completed)
-        self.worker.search_completed.connect(self.on_search_completed)
-
-        # Cleanup
-        self.worker.finished.connect(self.worker_thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.worker_thread.finished.connect(self.worker_thread.deleteLater)
-        self.worker_thread.start()
-        return
+        self.scan_job = SearchWorker()
+        self.scan_job.set_search_parameters(self.set_library_root())
+        self.setup_search()
+        if self.search_index.path != self.search_index_path():
+            # Library root changed: start a fresh index for it
+            self.search_index.clear()
+            self.search_index.path = self.search_index_path()
+            self.similarity_index.clear()
+        if self.shared_database.root != self.library_root:
+            self.shared_database = SharedDatabase(self.library_root)
+        self.scan_job.search_index = self.search_index
+        self.scan_job.check_integrity = self.settings.ui.check_sequences.isChecked()
+        # At startup only folders changed since the last scan (GUI or headless indexer) are rescanned
+        self.scan_job.incremental = incremental
+        self.scan_job.database = copy_assets(self.database)
+
+        self.scan_job.search_status.connect(self.on_search_status)
+        self.scan_job.search_completed.connect(self.on_search_completed)
+        self.scan_job.finished.connect(self.on_scan_finished)
+        job_scheduler().submit(self.scan_job)
+
+    def on_scan_finished(self):
+        if not self.scanning():
+            self.ui.refresh_button.setText("Refresh")
     
     def save_database(self):
-        db_folder = os.path.join(self.library_root, ".db")
-        if not os.path.exists(db_folder):
-            os.makedirs(db_folder)
-        db_file = os.path.join(db_folder, "database.json")
-        with open(db_file, "w") as f:
-            json.dump(self.database, f, indent=4)
+        """Only what changed here is written, the changes of others are kept (see shared_db.py)"""
+        if self.database_saver is not None and not self.database_saver.done:
+            self._save_pending = True
+            return
+        self._save_pending = False
+        # Saved from a copy: the lock wait and the diff run off the GUI thread
+        self.database_saver = DatabaseSaver(self.shared_database, copy_assets(self.database))
+        self.database_saver.finished.connect(self.on_database_saved)
+        job_scheduler().submit(self.database_saver)
+
+    def on_database_saved(self):
+        if self._save_pending:
+            self.save_database()
+
+    def database_busy(self):
+        """Whether a save is syncing the database with the store (the other
+        jobs work on copies), changes of others wait for it"""
+        return self.database_saver is not None and not self.database_saver.done
+
+    def poll_database(self):
+        if self._polled_changes is not None:
+            # Only merged once the save is done
+            self.on_database_changes(*self._polled_changes)
+            return
+        if not self.shared_database.root or (self.database_poller is not None and not self.database_poller.done):
+            return
+        self.database_poller = DatabasePoller(self.shared_database)
+        self.database_poller.changes.connect(self.on_database_changes)
+        job_scheduler().submit(self.database_poller)
+
+    def on_database_changes(self, generation, changes):
+        """Merge what other browsers and indexers saved into the database and the views"""
+        self._polled_changes = None
+        if self.shared_database.root != self.library_root:
+            return  # polled before the library root changed
+        if self.database_busy():
+            # Kept for the next poll, which waits for it
+            self._polled_changes = generation, changes
+            return
+        changed, added, removed = self.shared_database.apply(self.database, generation, changes)
+        if not (changed or added or removed):
+            return
+        print(f"Database changed elsewhere: {len(changed)} updated, {len(added)} new, {len(removed)} removed")
+        for id in changed | added:
+            file = self.database[id]
+            self.search_index.add(id, file)
+            if file.get('phash'):
+                self.similarity_index.add(id, int(file['phash'], 16))
+        for id in removed:
+            self.search_index.remove(id)
+            self.similarity_index.remove(id)
+        if added or removed:
+            self.update_version_stacks()
+            self.build_table_widget()
+            return
+        for id in changed:
+            file = self.database[id]
+            if file.get('thumbnail'):
+                self.asset_model.set_thumbnail(id, file['thumbnail'])
+            self.asset_model.set_info(id, asset_info_text(file, self.database))
     
     def generate_thumbnails_in_bg(self, thumbnails_folder, file_list):
+        # Imported on first use: thumbnails, duplicates and metadata aren't needed to show the window
+        if self.settings.ui.farm_thumbnails.isChecked():
+            self.submit_to_farm(file_list)
+            return
+        from support_files.ffmpeg_worker import BackGroundWorker
         if not os.path.exists(thumbnails_folder):
             os.makedirs(thumbnails_folder)
-        self.background_worker = BackGroundWorker(thumbnails_folder,file_list)
+        from support_files.concurrency import AdaptiveConcurrency
+        if self.background_worker is not None:
+            self.background_worker.cancel()
+        # NAS or local disk, encoder bound or not: the worker count follows what is measured
+        concurrency = AdaptiveConcurrency(self.settings.ui.thumbnail_workers_min.value(),
+                                          self.settings.ui.thumbnail_workers_max.value(), name='thumbnails.workers')
+        self.background_worker = BackGroundWorker(thumbnails_folder, file_list, concurrency=concurrency,
+                                                  queue_path=self.thumbnail_queue_path())
         self.background_worker.set_tumbnail.connect(self.set_thumbnail)
+        self.background_worker.set_phash.connect(self.set_phash)
+        self.background_worker.set_fields.connect(self.set_fields)
         self.background_worker.set_status.connect(self.on_search_status)
-        self.background_worker.finished.connect(self.build_table_widget)
-        self.background_worker.finished.connect(self.save_database)
-        self.background_worker.moveToThread(self.worker_thread)
-        self.background_worker.start()
+        self.background_worker.finished.connect(self.on_thumbnails_finished)
+        job_scheduler().submit(self.background_worker)
+
+    def on_thumbnails_finished(self):
+        job = self.background_worker
+        if job is None or not job.done or job.cancelled():
+            return  # replaced by a newer pass, or the window is closing
+        self.save_database()
+        self.extract_metadata_in_bg()
+
+    def submit_to_farm(self, assets):
+        """Farm mode: the assets without a thumbnail are queued for farm workers
+        (LocalAssetIndexer.py --farm work), the others get their metadata here"""
+        from support_files.farm import farm_candidates
+        from support_files.workers import FarmSubmitWorker
+        candidates = farm_candidates(assets)
+        # Copies: written out off the GUI thread while the database keeps changing
+        job = FarmSubmitWorker(self.library_root, copy_assets(candidates))
+        job.submitted.connect(self.on_farm_submitted)
+        job_scheduler().submit(job)
+        self.extract_metadata_in_bg({id: info for id, info in assets.items() if id not in candidates})
+
+    def on_farm_submitted(self, count):
+        print(f"Queued {count} render farm jobs")
+        # Also picks up results committed while the browser was closed
+        self._farm_timer.start()
+        self.collect_farm_results()
+
+    def collect_farm_results(self):
+        if self.farm_collector is not None and not self.farm_collector.done:
+            return
+        from support_files.workers import FarmCollectWorker
+        self.farm_collector = FarmCollectWorker(self.library_root)
+        self.farm_collector.collected.connect(self.on_farm_results)
+        self.farm_collector.queue_counts.connect(self.on_farm_queue_counts)
+        job_scheduler().submit(self.farm_collector)
+
+    def on_farm_results(self, updates):
+        """Thumbnails, hashes and metadata committed by farm workers"""
+        metadata = {}
+        for id, fields in updates.items():
+            if id not in self.database:
+                continue
+            fields = dict(fields)
+            thumbnail = fields.pop('thumbnail', None)
+            phash = fields.pop('phash', None)
+            if thumbnail:
+                self.set_thumbnail(id, thumbnail)
+            if phash:
+                self.set_phash(id, phash)
+            metadata[id] = fields
+        self.on_metadata_ready(metadata)
+
+    def on_farm_queue_counts(self, counts):
+        if counts['pending'] or counts['claimed']:
+            self.ui.statusbar.showMessage(f"Render farm: {counts['pending']} jobs queued, {counts['claimed']} running")
+            return
+        self._farm_timer.stop()
+        failed = f" ({counts['failed']} failed, see .db/farm/failed)" if counts['failed'] else ""
+        self.ui.statusbar.showMessage(f"Render farm jobs finished{failed}")
+
+    def extract_metadata_in_bg(self, assets=None):
+        """Fill in resolution, duration, fps, codec... without blocking anything"""
+        from support_files.workers import MetadataWorker
+        if self.metadata_worker is not None:
+            self.metadata_worker.cancel()
+        if assets is None:
+            assets = self.without_older_versions(self.database)
+        self.metadata_worker = MetadataWorker(assets,
+                                              os.path.join(self.library_root, ".db", "metadata_cache.json"))
+        self.metadata_worker.metadata_ready.connect(self.on_metadata_ready)
+        self.metadata_worker.set_status.connect(self.on_search_status)
+        job_scheduler().submit(self.metadata_worker)
+
+    def on_metadata_ready(self, updates):
+        """Merge a batch of extracted metadata into the database, index and views"""
+        for id, fields in updates.items():
+            file = self.database.get(id)
+            if file is None:
+                continue
+            file.update(fields)
+            self.search_index.add(id, file)
+            self.asset_model.set_info(id, asset_info_text(file, self.database))
+        # Written to disk once batches stop arriving for a moment
+        self._metadata_save_timer.start()
+
+    def update_version_stacks(self):
+        self.version_stacks = version_stacks(self.database)
+        self.version_head = {old: head for head, older in self.version_stacks.items() for old in older}
+
+    def without_older_versions(self, assets):
+        if not self.version_head:
+            return assets
+        return {id: info for id, info in assets.items() if id not in self.version_head}
+
+    def set_stack_expanded(self, proxy_row, expanded):
+        """Expand/collapse a version stack; older versions get rows, thumbnails
+        and metadata the first time they are shown"""
+        file_id = self.asset_proxy.index(proxy_row, AssetModel.NAME).data(AssetModel.FileIdRole)
+        self.asset_proxy.set_expanded(proxy_row, expanded)
+        if not expanded or self.asset_model.has_children_built(file_id):
+            return
+        older = [id for id in self.version_stacks.get(file_id, []) if id in self.database]
+        rows = []
+        for id in older:
+            row_data = asset_row(id, self.database[id], self.database)
+            row_data['stack_head'] = file_id
+            rows.append(row_data)
+        self.asset_model.add_rows(rows)
+        self.process_versions({id: self.database[id] for id in older})
+
+    def process_versions(self, assets):
+        """Thumbnails then metadata for a few assets, alongside the main passes"""
+        from support_files.ffmpeg_worker import BackGroundWorker
+        from support_files.workers import MetadataWorker
+        worker = BackGroundWorker(os.path.join(self.library_root, ".db", "thumbnails"), assets,
+                                  find_duplicates=False, queue_path=self.thumbnail_queue_path())
+        worker.set_tumbnail.connect(self.set_thumbnail)
+        worker.set_phash.connect(self.set_phash)
+        metadata = MetadataWorker(assets, os.path.join(self.library_root, ".db", "metadata_cache.json"))
+        metadata.metadata_ready.connect(self.on_metadata_ready)
+        # Asked for by the user: ahead of the library wide passes
+        worker.finished.connect(lambda: worker.cancelled() or job_scheduler().submit(metadata, HIGH))
+        self.version_workers = [job for job in self.version_workers if not job.done] + [worker, metadata]
+        job_scheduler().submit(worker, HIGH)
 
     def set_thumbnail(self, id ,thumbnail_path):
-        self.database[id]['thumbnail'] = thumbnail_path
-  
-    def set_file_list(self, file_list):
-        self.file_list = file_list
-        self.ui.statusbar.showMessage(f"Search completed: {len(file_list)} items found.")
-        db_folder = os.path.join(self.library_root, ".db")
-        db_file = os.path.join(db_folder, "database.json")
-
-
-
-        if not os.path.exists(db_file):
-            with open(db_file, "w") as f:
-                json.dump({}, f, indent=4)
-
-
-        thumbnails_folder = os.path.join(db_folder, "thumbnails")
-        if not os.path.exists(thumbnails_folder):
-            os.makedirs(thumbnails_folder)
-
-        #update the current json file and add keys that are missing
-        with open(db_file, "r") as f:
-            data = json.load(f)
-            for file in file_list:
-                if file not in data:
-                    data[file] = file_list[file]
-            with open(db_file, "w") as f:
-                json.dump(data, f, indent=4)
-
-        
-
-        #self.generate_thumbnails_in_bg(thumbnails_folder,file_list)
+        file = self.database.get(id)
+        if file is None:
+            return  # removed elsewhere while the result was on its way
+        file['thumbnail'] = thumbnail_path
+        self.asset_model.set_thumbnail(id, thumbnail_path)
+
+    def set_fields(self, updates):
+        """Fields a job worked out (duplicate hashes), None for the ones it removed"""
+        for id, fields in updates.items():
+            file = self.database.get(id)
+            if file is None:
+                continue
+            for key, value in fields.items():
+                if value is None:
+                    file.pop(key, None)
+                else:
+                    file[key] = value
+            self.asset_model.set_info(id, asset_info_text(file, self.database))
 
+    def set_phash(self, id, phash):
+        file = self.database.get(id)
+        if file is None:
+            return
+        file['phash'] = phash
+        self.similarity_index.add(id, int(phash, 16))
+  
     def finished_search(self):
+        startup_milestone('table_built')
         self.ui.statusbar.showMessage(f"Search completed: {len(self.database)} items found.")
         #self.update()
         self.ui.setUpdatesEnabled(True)
         self.ui.table_widget.viewport().update()
-        self.loaded = True
+        self._table_built = True
+        self.check_first_page()
+        if not self._thumbnails_pending:
+            return
+        self._thumbnails_pending = False
+        if '--startup-time' in sys.argv:
+            print_startup_time(len(self.database))
+            QApplication.quit()
+            return
+        self.generate_thumbnails_in_bg(os.path.join(self.library_root, ".db", "thumbnails"),
+                                       self.without_older_versions(self.database))
         
-    def create_asset_widget(self, file, preview_file):
-        # Prefer a generated thumbnail if available in file metadata
-        thumb = None
-        if isinstance(file, dict) and file.get('thumbnail'):
-            thumb = file.get('thumbnail')
-        else:
-            # if preview_file is inside .db/thumbnails, treat it as thumbnail
-            try:
-                if preview_file and '.db' + os.sep + 'thumbnails' in preview_file:
-                    thumb = preview_file
-            except Exception:
-                thumb = None
-
-        # enqueue widget creation to avoid blocking the GUI when many widgets arrive
-        self._widget_queue.append((file, thumb))
-        if not self._processing_queue:
-            self._process_widget_queue()
-
-    def _process_widget_queue(self, batch_size=20):
-        """Process queued widget creations in small batches to keep UI responsive."""
-        self._processing_queue = True
-        count = 0
-        while self._widget_queue and count < batch_size:
-            file, thumb = self._widget_queue.pop(0)
-            widget = ClickableVersionWidget(file, thumb)
-            widget.doubleClicked.connect(self.load_file)
-            self.ui.version_grid.addWidget(widget)
-            count += 1
-
-        if self._widget_queue:
-            # schedule next batch after a short delay to let the UI breathe
-            QTimer.singleShot(50, lambda: self._process_widget_queue(batch_size))
-        else:
-            self._processing_queue = False
-        #self.update()
-
     def load_file(self, id):
         # find all child of the Qwidget and delete them
         for child in self.ui.info_widget.findChildren(QtWidgets.QWidget):
@@ -231,7 +494,8 @@ class LocalAssetBrowser(QtWidgets.QMainWindow):
         file = self.database.get(id)
         preview_file = file.get('thumbnail', None)
 
-        order = ["name", "type", 'first_frame', 'last_frame', 'duration', 'fps', 'size', 'path']
+        order = ["name", "type", 'first_frame', 'last_frame', 'missing_frames', 'short_frames', 'corrupt_frames', 'duration', 'fps', 'size', 'resolution', 'codec',
+                 'channels', 'path']
         sorted_dict = {k: file[k] for k in order if k in file}
 
         # Add remaining keys not in 'order'
@@ -240,80 +504,54 @@ class LocalAssetBrowser(QtWidgets.QMainWindow):
                 sorted_dict[k] = file[k]
 
         for key in sorted_dict:
-            print(key, file[key])
             if key == 'thumbnail':
                 self.ui.current_frame_label.setPixmap(QPixmap(preview_file))
+            elif key in INTERNAL_KEYS or file[key] == '':
+                continue
             else:
                 if key == 'ctime':
                     value = QtWidgets.QLabel(str(datetime.fromtimestamp(file[key]).strftime('%Y-%m-%d %H:%M:%S')))
                     title = QtWidgets.QLabel('Creation Date'.upper())
+                elif key == 'duplicate_of':
+                    original = self.database.get(file[key], {})
+                    value = QtWidgets.QLabel(str(original.get('path', file[key])))
+                    title = QtWidgets.QLabel('Duplicate Of'.upper())
                 else:
                     value = QtWidgets.QLabel(str(file[key]))
                     title = QtWidgets.QLabel(str(key).replace("_", " ").upper())
                 value.setTextInteractionFlags(Qt.TextSelectableByMouse)
                 value.setWordWrap(True)
-                value.setStyleSheet("font-weight: italic;")
+                value.setStyleSheet("font-weight: italic;" + (" color: #e06c5a;" if key in FRAME_PROBLEM_KEYS else ""))
                 title.setStyleSheet("font-weight: bold;")
                 self.ui.info_widget.layout().addRow(title, value)
-        print(f"Loading file: {file}")
-
-
-    def merge_dicts(self, dict1, dict2):
-        """
-        Merge dict2 into dict1.
-        - For overlapping keys:
-            * If both values are dicts, merge recursively.
-            * Otherwise, keep dict1's value.
-        - Add keys missing in dict1 from dict2.
-        """
 
-        result = dict1.copy()
-
-        for key, value in dict2.items():
-            if key not in result:
-                # Add missing key from dict2
-                result[key] = value
-            else:
-                # If both values are dicts → merge recursively
-                if isinstance(result[key], dict) and isinstance(value, dict):
-                    result[key] = self.merge_dicts(result[key], value)
-                # Else keep dict1’s value (result[key]) and ignore dict2’s
-
-        return result
 
     def on_search_completed(self, results):
-        self.ui.version_grid.clear()
-        self.ui.table_widget.clear()
-
-        db_file = os.path.join(self.library_root, ".db", "database.json")
-
-        if os.path.exists(db_file):
-            with open(db_file, "r") as f:
-                self.database = json.load(f)
-
-        new_db = self.merge_dicts(self.database, results)
-        self.database = new_db
-
-        with open(db_file, "w") as f:
-            json.dump(new_db, f, indent=4)
-        
+        startup_milestone('rescan_done')
+        changed = changed_assets(self.database, results)
+        self.database = merge_scan(self.database, results)
         self.on_search_status('Saving database...', 0)
-        
-        self.generate_thumbnails_in_bg(os.path.join(self.library_root, ".db", "thumbnails"), new_db)
+        self.save_database()
+
+        # Older versions get their thumbnails and metadata when their stack is expanded
+        self.update_version_stacks()
+        # Thumbnails follow once the rows exist, they then arrive one by one (set_thumbnail)
+        self._thumbnails_pending = True
+        # The stored database is already on screen: only rebuilt if the scan found something new
+        if changed or not self.asset_model.rowCount():
+            self.build_table_widget()
+        else:
+            self.finished_search()
 
 
     def build_table_widget(self):
-        # Stop any existing table builder thread before creating a new one
+        # Cancel any table build still running before starting a new one
         self._stop_table_builder_thread()
         
-        # Clear and setup table widget on main thread
-        self.ui.table_widget.setRowCount(0)
-        self.ui.table_widget.setColumnCount(5)
-        self.ui.table_widget.setHorizontalHeaderLabels(["Thumbnail", "Name", "Type", "Info", "Path"])
-        
-        # Make table non-editable
-        self.ui.table_widget.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
-        self.ui.table_widget.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        # Clear the shared model on main thread (table and grid both show it)
+        self.clear_assets()
+        self._table_built = False
+        self.startup.begin('view', 'Building table...')
         
         # Set column widths
         self.ui.table_widget.setColumnWidth(0, 120)
@@ -322,151 +560,135 @@ class LocalAssetBrowser(QtWidgets.QMainWindow):
         self.ui.table_widget.setColumnWidth(3, 200)
         self.ui.table_widget.setColumnWidth(4, 300)
         
+        # All rows share the header's default section size, so resizing is a
+        # single call instead of a setRowHeight() per row
+        self.ui.table_widget.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        self.ui.table_widget.verticalHeader().setDefaultSectionSize(110)
+
         # Set custom delegate for thumbnail column to handle rendering efficiently
         # keep a reference on self so we can update delegate sizes later
         self.table_delegate = OptimizedTableDelegate()
         self.ui.table_widget.setItemDelegateForColumn(0, self.table_delegate)
-        # Connect header resize signals so thumbnails update to fill cell on resize
-        try:
-            self.ui.table_widget.horizontalHeader().sectionResized.connect(self.on_table_section_resized)
-            self.ui.table_widget.verticalHeader().sectionResized.connect(self.on_table_section_resized)
-        except Exception:
-            # If UI isn't fully constructed yet, ignore - connections can be made later
-            pass
-        # Enable dragging rows (we handle the drag start in an event filter)
-        try:
-            self.ui.table_widget.setDragEnabled(True)
-            self.ui.table_widget.setDragDropMode(QtWidgets.QAbstractItemView.DragOnly)
-            # Install event filter to start drag with custom mime data
-            self.ui.table_widget.installEventFilter(self)
-            # track drag start
-            self._drag_start_pos = None
-            self._drag_pressed_row = None
-        except Exception:
-            pass
-        
-        # Connect double-click signal
-        self.ui.table_widget.doubleClicked.connect(self.on_table_row_double_clicked)
         
-        # Create a new thread for the table builder
-        self.table_builder_thread = QThread()
-        self.table_builder_worker = TableBuilderWorker(database=self.database)
-        
-        # Move worker to thread
-        self.table_builder_worker.moveToThread(self.table_builder_thread)
+        self._table_build_id += 1
+        self.update_version_stacks()
+        self.table_builder_worker = TableBuilderWorker(database=self.database, build_id=self._table_build_id,
+                                                       search_index=self.search_index,
+                                                       similarity_index=self.similarity_index,
+                                                       version_stacks=self.version_stacks)
         
         # Connect signals
-        self.table_builder_thread.started.connect(self.table_builder_worker.run)
         self.table_builder_worker.update_status.connect(self.on_search_status)
         # Connect worker signals to add rows in batches on main thread
         self.table_builder_worker.add_rows_batch.connect(self.add_table_rows_batch)
-        
-        # Cleanup connections
-        self.table_builder_worker.finished.connect(self.table_builder_thread.quit)
-        self.table_builder_worker.finished.connect(self.table_builder_worker.deleteLater)
-        self.table_builder_thread.finished.connect(self.finished_search)
-        
-        # Start the thread
-        self.table_builder_thread.start()
+        self.table_builder_worker.finished.connect(self.on_table_build_finished)
+        job_scheduler().submit(self.table_builder_worker)
+
+    def on_table_build_finished(self):
+        # A build replaced by a newer one finishes too, only the current one counts
+        job = self.table_builder_worker
+        if job is not None and job.done and not job.cancelled():
+            self.finished_search()
     
     def on_table_row_double_clicked(self, index):
-        """Handle table row double-click"""
-        row = index.row()
-        
-        # Get the file ID from the Name column (column 1)
-        name_item = self.ui.table_widget.item(row, 1)
-        if name_item is None:
+        """Handle table row / grid tile double-click"""
+        # Every column of the model carries the file ID
+        file_id = index.data(AssetModel.FileIdRole)
+        if file_id is None:
             return
-        
-        file_id = name_item.data(Qt.UserRole)
         self.load_file(file_id)
     
-    def add_table_rows_batch(self, rows_batch):
-        """Add a batch of rows to the table widget (runs on main thread)"""
-        # Disable updates while adding rows to prevent repainting
-        self.ui.table_widget.setUpdatesEnabled(False)
-        
-        try:
-            for row_data in rows_batch:
-                thumbnail = row_data['thumbnail']
-                name = row_data['name']
-                type_ = row_data['type']
-                extra_info_text = row_data['extra_info']
-                path = row_data['path']
-                file_id = row_data['file_id']
-                
-                # ---- Insert row ----
-                row = self.ui.table_widget.rowCount()
-                self.ui.table_widget.insertRow(row)
-
-                # ---- COLUMN 0: THUMBNAIL (using delegate, just store path) ----
-                thumb_item = QtWidgets.QTableWidgetItem(thumbnail)
-                thumb_item.setData(Qt.DisplayRole, thumbnail)
-                self.ui.table_widget.setItem(row, 0, thumb_item)
-
-                # ---- COLUMN 1: NAME ----
-                name_item = QtWidgets.QTableWidgetItem(str(name))
-                # Store file_id in the name item for easy access
-                name_item.setData(Qt.UserRole, file_id)
-                self.ui.table_widget.setItem(row, 1, name_item)
-
-                # ---- COLUMN 2: TYPE ----
-                self.ui.table_widget.setItem(row, 2, QtWidgets.QTableWidgetItem(str(type_)))
-
-                # ---- COLUMN 3: INFO (QLabel for multiline) ----
-                info_label = QtWidgets.QLabel(extra_info_text)
-                info_label.setWordWrap(True)
-                info_label.setAlignment(Qt.AlignLeft | Qt.AlignTop)
-                info_label.setStyleSheet("padding: 5px;")
-                self.ui.table_widget.setCellWidget(row, 3, info_label)
-
-                # ---- COLUMN 4: PATH ----
-                path_item = QtWidgets.QTableWidgetItem(str(path))
-                self.ui.table_widget.setItem(row, 4, path_item)
-
-                # Set row height
-                self.ui.table_widget.setRowHeight(row, 110)
-        
-        finally:
-            # Re-enable updates and refresh once
-            self.ui.table_widget.setUpdatesEnabled(True)
-            self.ui.table_widget.viewport().update()
+    def show_asset_menu(self, view, pos):
+        """Right-click menu of a table row / grid tile"""
+        index = view.indexAt(pos)
+        file_id = index.data(AssetModel.FileIdRole) if index.isValid() else None
+        if file_id is None:
+            return
+        menu = QtWidgets.QMenu(self)
+        versions, expanded = self.asset_proxy.stack_state(index.row())
+        if versions:
+            stack = menu.addAction("Hide Older Versions" if expanded else f"Show {versions} Older Versions")
+            stack.triggered.connect(lambda: self.set_stack_expanded(index.row(), not expanded))
+        similar = menu.addAction("Find Similar")
+        similar.setEnabled(self.similarity_index.hash_of(file_id) is not None)
+        similar.triggered.connect(lambda: self.find_similar(file_id))
+        menu.exec_(view.viewport().mapToGlobal(pos))
+
+    def find_similar(self, file_id):
+        """Show the assets whose thumbnail looks like this one, closest first"""
+        neighbours = self.similarity_index.similar(file_id)
+        name = self.database.get(file_id, {}).get('name', file_id)
+        # The search box no longer describes what is shown
+        self.ui.lineEdit.blockSignals(True)
+        self.ui.lineEdit.clear()
+        self.ui.lineEdit.blockSignals(False)
+        self.search_generation = 0
+        self.similar_to = file_id
+        ids = [file_id] + [other for _, other in neighbours]
+        self.asset_proxy.set_filter_ids(f"similar:{file_id}", ids, ranked=True)
+        self.ui.statusbar.showMessage(f"{len(neighbours)} assets similar to {name}")
+
+    def add_table_rows_batch(self, build_id, rows_batch):
+        """Add a batch of rows to the shared asset model (runs on main thread)"""
+        # Drop batches still queued from a builder that was replaced by a newer one
+        if build_id != self._table_build_id:
+            return
+        # Rows are inserted into the model within a per-tick time budget
+        self.row_builder.add(rows_batch)
+
+    def clear_assets(self):
+        """Empty the shared model and drop rows still waiting to be inserted"""
+        self.row_builder.clear()
+        self.asset_model.clear()
 
     def set_table_row_height(self, height):
-        """Set a fixed height for all table rows and update the thumbnail delegate.
+        """Request a fixed height for all table rows.
 
         height: integer pixels for each row (will be clamped to >=1)
+
+        Slider events are coalesced: only the latest value is applied, at most
+        once per frame, by _apply_pending_resize.
         """
         try:
-            h = int(max(1, height))
+            self._pending_row_height = int(max(1, height))
         except Exception:
             return
+        self._schedule_resize()
 
-        # Update default size and delegate expectations
-        #print(self.ui.table_widget.verticalHeader().defaultSectionSize())
-        self.ui.table_widget.verticalHeader().setDefaultSectionSize(h)
-        self.ui.table_widget.setColumnWidth(0, int(h*16/9))
-        
-        #self.ui.table_widget.horizontalHeader().setDefaultSectionSize(h)
+    def _schedule_resize(self):
+        """Start (or extend) a resize burst and queue one update for the next frame"""
         if hasattr(self, 'table_delegate') and self.table_delegate:
-            # Keep thumbnail height slightly smaller than row
-            self.table_delegate.row_height = h
-            self.table_delegate.thumbnail_height = max(16, h - 10)
+            self.table_delegate.resizing = True
+        self.ui.asset_grid.delegate.resizing = True
+        if not self._resize_frame_timer.isActive():
+            self._resize_frame_timer.start()
+        self._resize_settle_timer.start()
+
+    def _apply_pending_resize(self):
+        """Apply the latest requested row height in one go (runs once per frame)"""
+        h = self._pending_row_height
+        self._pending_row_height = None
+
+        if h is not None:
+            # Uniform rows: the default section size is the height of every row
+            self.ui.table_widget.verticalHeader().setDefaultSectionSize(h)
+            self.ui.table_widget.setColumnWidth(0, int(h*16/9))
+            # Grid tiles follow the same 16:9 thumbnail size
+            self.ui.asset_grid.set_tile_size(int(h*16/9), h)
 
-        # Apply to each existing row quickly with updates disabled
-        self.ui.table_widget.setUpdatesEnabled(False)
-        try:
-            for r in range(self.ui.table_widget.rowCount()):
-                self.ui.table_widget.setRowHeight(r, h)
-        finally:
-            self.ui.table_widget.setUpdatesEnabled(True)
-            self.ui.table_widget.viewport().update()
+            if hasattr(self, 'table_delegate') and self.table_delegate:
+                # Keep thumbnail height slightly smaller than row
+                self.table_delegate.row_height = h
+                self.table_delegate.thumbnail_height = max(16, h - 10)
+
+        self.ui.table_widget.viewport().update()
 
     def reset_thumbnail_sizes(self):
         """Recalculate and apply thumbnail sizes based on current column/row sizes.
 
-        This updates the delegate's expected thumbnail width/height and clears
-        the pixmap cache so images are reloaded and scaled to the new size.
+        Called once a resize burst has settled. This updates the delegate's
+        expected thumbnail width/height and leaves resizing mode, so cached
+        pixmaps that no longer match their cell are reloaded at the new size.
         """
         try:
             # Column 0 width (thumbnail column)
@@ -479,203 +701,50 @@ class LocalAssetBrowser(QtWidgets.QMainWindow):
                 self.table_delegate.thumbnail_width = max(16, col_w - 8)
                 self.table_delegate.thumbnail_height = max(16, row_h - 8)
                 self.table_delegate.row_height = row_h
-
-            # Clear the pixmap cache so images are reloaded at the new size
-            try:
-                from support_files.workers import pixmap_cache
-                pixmap_cache.clear()
-            except Exception:
-                pass
+                self.table_delegate.resizing = False
+            self.ui.asset_grid.delegate.resizing = False
 
             # Trigger a repaint
             self.ui.table_widget.viewport().update()
+            self.ui.asset_grid.viewport().update()
         except Exception:
             # Non-fatal; ignore errors during resize handling
             pass
 
-    def on_table_section_resized(self, *args):
-        """Slot for header sectionResized — refresh thumbnail sizes."""
-        # Delegate actual work to reset_thumbnail_sizes for clarity/testing
-        self.reset_thumbnail_sizes()
-
-    def _get_drag_path_for_row(self, row):
-        """Return the appropriate path to drag for a given row.
-
-        If the type column indicates a sequence (case-insensitive contains 'sequence'),
-        return the containing folder of the file path. Otherwise return the file path.
-        Returns None if path can't be determined.
-        """
-        try:
-            type_item = self.ui.table_widget.item(row, 2)
-            path_item = self.ui.table_widget.item(row, 4)
-            if path_item is None:
-                return None
-            path = path_item.text()
-            type_text = '' if type_item is None else type_item.text() or ''
-            if 'sequence' in type_text.lower():
-                # return folder containing the path
-                return os.path.dirname(path)
-            return path
-        except Exception:
-            return None
-
-    def eventFilter(self, obj, event):
-        """Handle mouse events on the table to start a drag with file/folder path."""
-        try:
-            if obj is self.ui.table_widget:
-                # Mouse press: record start pos and row
-                if event.type() == QEvent.MouseButtonPress:
-                    if event.buttons() & Qt.LeftButton:
-                        self._drag_start_pos = event.pos()
-                        idx = self.ui.table_widget.indexAt(self._drag_start_pos)
-                        self._drag_pressed_row = idx.row() if idx.isValid() else None
-                # Mouse move: check threshold and start drag
-                elif event.type() == QEvent.MouseMove:
-                    if self._drag_start_pos is None:
-                        return super().eventFilter(obj, event)
-                    if not (event.buttons() & Qt.LeftButton):
-                        return super().eventFilter(obj, event)
-                    dist = (event.pos() - self._drag_start_pos).manhattanLength()
-                    if dist >= QApplication.startDragDistance() and self._drag_pressed_row is not None:
-                        pressed_row = self._drag_pressed_row
-                        # Decide which rows to drag: if multiple selected and the pressed row is in selection,
-                        # drag all selected rows; otherwise drag only the pressed row.
-                        sel_rows = [idx.row() for idx in self.ui.table_widget.selectionModel().selectedRows()]
-                        if sel_rows and pressed_row in sel_rows:
-                            rows_to_drag = sel_rows
-                        else:
-                            rows_to_drag = [pressed_row]
-
-                        # Collect unique paths (preserve order)
-                        paths = []
-                        seen = set()
-                        for r in rows_to_drag:
-                            p = self._get_drag_path_for_row(r)
-                            if p and p not in seen:
-                                seen.add(p)
-                                paths.append(p)
-
-                        if not paths:
-                            # nothing to drag
-                            self._drag_start_pos = None
-                            self._drag_pressed_row = None
-                            return super().eventFilter(obj, event)
-
-                        mime = QMimeData()
-                        urls = [QUrl.fromLocalFile(p) for p in paths]
-                        mime.setUrls(urls)
-                        mime.setText(';'.join(paths))
-
-                        # Also provide several additional formats to increase compatibility with Windows apps
-                        try:
-                            # 1) text/uri-list (UTF-8) — common URI list format
-                            uri_list = '\r\n'.join([u.toString() for u in urls])
-                            mime.setData('text/uri-list', QByteArray(uri_list.encode('utf-8')))
-
-                            # 2) plain text with local paths (newline separated)
-                            mime.setData('text/plain', QByteArray('\r\n'.join(paths).encode('utf-8')))
-
-                            # 3) FileNameW (UTF-16LE Windows native)
-                            fnw = b''.join([p.encode('utf-16le') + b'\x00\x00' for p in paths]) + b'\x00\x00'
-                            mime.setData('application/x-qt-windows-mime;value="FileNameW"', QByteArray(fnw))
-
-                            # 4) FileName (ANSI) — some older apps expect ANSI null-terminated strings
-                            try:
-                                ansi = b''.join([p.encode('mbcs', errors='replace') + b'\x00' for p in paths]) + b'\x00'
-                                mime.setData('application/x-qt-windows-mime;value="FileName"', QByteArray(ansi))
-                            except Exception:
-                                pass
-
-                            # 5) CF_HDROP (DROPFILES wide) — construct DROPFILES struct + UTF-16LE filenames
-                            try:
-                                # DROPFILES struct: DWORD pFiles; LONG pt.x; LONG pt.y; BOOL fNC; BOOL fWide;
-                                # We set pFiles to size of header (20) and fWide=1
-                                pFiles = 20
-                                drop_header = struct.pack('<IiiII', pFiles, 0, 0, 0, 1)
-                                drop_buf = drop_header + fnw
-                                mime.setData('application/x-qt-windows-mime;value="CF_HDROP"', QByteArray(drop_buf))
-                            except Exception:
-                                pass
-                        except Exception:
-                            pass
-
-                        drag = QDrag(self.ui.table_widget)
-                        drag.setMimeData(mime)
-
-                        # Try to use the first thumbnail as drag pixmap for nicer UX
-                        try:
-                            thumb_item = self.ui.table_widget.item(rows_to_drag[0], 0)
-                            thumb_path = thumb_item.data(Qt.DisplayRole) if thumb_item is not None else None
-                            if thumb_path and os.path.exists(thumb_path):
-                                pm = QPixmap(thumb_path)
-                                if not pm.isNull():
-                                    pm = pm.scaled(128, 128, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                                    drag.setPixmap(pm)
-                        except Exception:
-                            pass
-
-                        drag.exec_(Qt.CopyAction)
-                        # reset drag trackers
-                        self._drag_start_pos = None
-                        self._drag_pressed_row = None
-                        return True
-                # Mouse release: clear trackers
-                elif event.type() == QEvent.MouseButtonRelease:
-                    self._drag_start_pos = None
-                    self._drag_pressed_row = None
-        except Exception:
-            # swallow exceptions in filter to avoid breaking UI
-            pass
-        return super().eventFilter(obj, event)
-
-    def auto_adjust_table_row_heights(self, min_height=50, max_height=400):
-        """Adjust row heights to fit content.
-
-        This inspects the info widget (column 3) and the delegate thumbnail
-        height and sets each row to the larger of those values clamped by
-        min_height/max_height. Runs on the main thread and disables updates
-        while resizing to reduce flicker.
-        """
-        # Read thumbnail preferred height from delegate if available
-
-        print(min_height, max_height)
-        thumb_h = 100
-        if hasattr(self, 'table_delegate') and self.table_delegate:
-            try:
-                thumb_h = int(getattr(self.table_delegate, 'thumbnail_height', thumb_h))
-            except Exception:
-                pass
-
-        self.ui.table_widget.setUpdatesEnabled(False)
-        try:
-            rows = self.ui.table_widget.rowCount()
-            for r in range(rows):
-                # Prefer the info widget sizeHint if present
-                info_widget = self.ui.table_widget.cellWidget(r, 3)
-                info_h = 0
-                if info_widget is not None:
-                    info_h = info_widget.sizeHint().height()
-
-                required = max(min_height, min(max_height, max(info_h, thumb_h)))
-                self.ui.table_widget.setRowHeight(r, required)
-        finally:
-            self.ui.table_widget.setUpdatesEnabled(True)
-            self.ui.table_widget.viewport().update()
+    def on_table_section_resized(self, logical_index, old_size=None, new_size=None):
+        """Slot for horizontal header sectionResized — refresh thumbnail sizes."""
+        # Only the thumbnail column affects thumbnails; rows are uniform and
+        # driven by the slider, so the vertical header is not connected at all
+        if logical_index == 0:
+            self._schedule_resize()
 
+    def check_first_page(self, *args):
+        """Startup is over once a page of rows is in the model (or all of them, if fewer)"""
+        if self.startup.done:
+            return
+        # The view isn't laid out before it is shown: the window height bounds a page
+        page = self.height() // self.ui.table_widget.verticalHeader().defaultSectionSize() + 1
+        if self.asset_model.rowCount() >= page or (self._table_built and not self.row_builder.pending()):
+            self.startup.finish()
 
+    def on_startup_ready(self):
+        startup_milestone('first_page')
+        self.loaded = True
 
     def on_search_status(self, status, percent=None):
         self.status = status
         self.percent = percent
+        if not self.startup.done:
+            self.startup.report(status, percent)
         self.ui.statusbar.showMessage(status)
         self.ui.statusbar.update()
         self.update()
 
     def refresh_library(self):
+        if self.scanning():
+            self.refresh_versions_threaded()
+            return
         root_dir = self.set_library_root()
-        self.ui.table_widget.clearContents()
-        self.ui.table_widget.setRowCount(0)
-        self.ui.version_grid.clear()
         if not root_dir or not os.path.exists(root_dir):
             QMessageBox.warning(self, "Invalid Directory", "The specified root directory does not exist.")
             return
@@ -689,8 +758,65 @@ class LocalAssetBrowser(QtWidgets.QMainWindow):
             os.makedirs(thumbnails_folder)
 
         print(f"Refreshing library from: {root_dir}")
-        self.search_worker.set_search_parameters(root_dir)
-        self.search_worker.start()
+        # Full rescan, or cancel the running one
+        self.refresh_versions_threaded(incremental=False)
+
+    def search(self, *args):
+        """Filter both views by the search box text (terms and field filters, see query.py)"""
+        from support_files.query import QueryError, parse_query
+        text = self.ui.lineEdit.text()
+        self.similar_to = None
+        try:
+            query = parse_query(text)
+        except QueryError as e:
+            self.ui.statusbar.showMessage(f"Invalid filter: {e}")
+            return
+        indexed = self.search_index is not None and len(self.search_index) > 0
+        if (query.filters or query.fuzzy and query.terms) and not indexed:
+            self.ui.statusbar.showMessage("Filters and fuzzy search are available once the library is indexed")
+            return
+        if not query or not indexed:
+            # Nothing to look up (empty, or a bare '~') or nothing indexed yet: filter the rows in the proxy directly
+            self.search_generation = 0
+            self.asset_proxy.set_filter_text(text if query else '')
+            return
+        self.search_query = query
+        self.search_generation = self.search_query_worker.submit(query)
+
+    def on_search_results(self, generation, asset_ids, first, last):
+        """Receive a chunk of index results (stale queries are ignored)"""
+        if generation != self.search_generation:
+            return
+        if self.version_head:
+            # An older version that matches shows up as its stack
+            if first:
+                self._search_heads_shown = set()
+            shown = self._search_heads_shown
+            asset_ids = [id for id in (self.version_head.get(i, i) for i in asset_ids)
+                         if not (id in shown or shown.add(id))]
+        self.asset_proxy.set_filter_ids(self.ui.lineEdit.text(), asset_ids, append=not first,
+                                        ranked=self.search_query.fuzzy)
+        if last:
+            if self.search_query.fuzzy:
+                self.ui.statusbar.showMessage(f"{self.asset_proxy.rowCount()} best matches "
+                                              f"({self.asset_model.rowCount()} items)")
+            else:
+                self.ui.statusbar.showMessage(f"{self.asset_proxy.rowCount()} / {self.asset_model.rowCount()} items")
+
+    def refresh_search(self):
+        """Run the shown query again, for the rows added since (see AssetProxyModel)"""
+        if not self.asset_proxy.from_index:
+            return
+        if self.similar_to is not None:
+            self.find_similar(self.similar_to)
+        else:
+            self.search()
+
+    def search_index_path(self):
+        return os.path.join(self.library_root, ".db", "search_index.json")
+
+    def thumbnail_queue_path(self):
+        return os.path.join(self.library_root, ".db", "thumbnail_queue.json")
 
     def set_library_root(self):
         self.library_root = self.settings.ui.root_dir.text()
@@ -698,47 +824,67 @@ class LocalAssetBrowser(QtWidgets.QMainWindow):
         return self.library_root
     
     def _stop_table_builder_thread(self):
-        """Helper method to safely stop the table builder thread"""
-        try:
-            if self.table_builder_thread is not None:
-                # Check if thread still exists and is running
-                if self.table_builder_thread.isRunning():
-                    print("⏹ Stopping table builder...")
-                    if self.table_builder_worker:
-                        self.table_builder_worker.is_running = False
-                    self.table_builder_thread.quit()
-                    self.table_builder_thread.wait(5000)  # Wait up to 5 seconds
-        except RuntimeError:
-            # Thread was already deleted
-            pass
+        """Cancel the running table build, its late batches are dropped by build id"""
+        if self.table_builder_worker is not None and not self.table_builder_worker.done:
+            print("⏹ Stopping table builder...")
+            self.table_builder_worker.cancel()
     
     def closeEvent(self, event):
-        """Ensure all threads are properly stopped before closing"""
-        # Stop table builder thread
-        self._stop_table_builder_thread()
-        
-        # Stop search worker thread
-        try:
-            if hasattr(self, "worker_thread") and self.worker_thread is not None:
-                if self.worker_thread.isRunning():
-                    if hasattr(self, "worker"):
-                        self.worker.is_stopped = True
-                    self.worker_thread.quit()
-                    self.worker_thread.wait(5000)
-        except RuntimeError:
-            # Thread was already deleted
-            pass
-        
+        """Cancel every background job, nothing waits for them to wind down"""
+        job_scheduler().shutdown()
+        if self.search_query_worker is not None:
+            self.search_query_worker.stop()
+            self.search_query_worker.wait(1000)
         event.accept()
     
-    def setup_ui(self):
-        uic_path = os.path.join(os.path.dirname(__file__), 'ui', 'LocalAssetBrowser.ui')
-        self.ui = uic.loadUi(uic_path, self)
+    def show_diagnostics(self):
+        """Timers, counters, trace export and profiling (see diagnostics.py)"""
+        if self.diagnostics_dialog is None:
+            from support_files.diagnostics_dialog import DiagnosticsDialog
+            self.diagnostics_dialog = DiagnosticsDialog(self)
+        self.diagnostics_dialog.show()
+        self.diagnostics_dialog.raise_()
 
-        self.ui.scroll_content = QtWidgets.QWidget()
-        self.ui.version_grid = FlowLayout(self.ui.scroll_content)
-        self.ui.scroll_content.setLayout(self.ui.version_grid)
-        self.ui.scrollArea.setWidget(self.ui.scroll_content)
+    def setup_ui(self):
+        self.ui = load_ui('LocalAssetBrowser', self)
+
+        # One model for both views: the table and the grid only paint visible rows
+        self.asset_model = AssetModel(self)
+        self.row_builder = IncrementalBuilder(self.asset_model.add_rows, parent=self)
+        # Both views go through the same sort/filter proxy
+        self.asset_proxy = AssetProxyModel(self)
+        self.asset_proxy.setSourceModel(self.asset_model)
+        # Rows added under an index query: it runs again once they stop coming
+        self._search_refresh_timer = QTimer(self)
+        self._search_refresh_timer.setSingleShot(True)
+        self._search_refresh_timer.setInterval(500)
+        self._search_refresh_timer.timeout.connect(self.refresh_search)
+        self.asset_proxy.query_outdated.connect(self._search_refresh_timer.start)
+        # Large text filters finish off the GUI thread
+        self.asset_proxy.filtered.connect(
+            lambda: self.ui.statusbar.showMessage(f"{self.asset_proxy.rowCount()} / {self.asset_model.rowCount()} items"))
+        self.ui.table_widget.setModel(self.asset_proxy)
+        # No sort column until the user clicks a header: keep the scan (ctime) order
+        self.ui.table_widget.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.ui.table_widget.setSortingEnabled(True)
+        self.ui.table_widget.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.ui.table_widget.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        # Dragging uses AssetModel.mimeData (file path, or folder for sequences)
+        self.ui.table_widget.setDragEnabled(True)
+        self.ui.table_widget.setDragDropMode(QtWidgets.QAbstractItemView.DragOnly)
+        self.ui.table_widget.doubleClicked.connect(self.on_table_row_double_clicked)
+        self.ui.table_widget.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.ui.table_widget.customContextMenuRequested.connect(
+            lambda pos: self.show_asset_menu(self.ui.table_widget, pos))
+        thumbnail_loader().thumbnail_ready.connect(self.ui.table_widget.viewport().update)
+
+        self.ui.asset_grid = AssetGridView()
+        self.ui.asset_grid.setModel(self.asset_proxy)
+        self.ui.asset_grid.doubleClicked.connect(self.on_table_row_double_clicked)
+        self.ui.asset_grid.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.ui.asset_grid.customContextMenuRequested.connect(
+            lambda pos: self.show_asset_menu(self.ui.asset_grid, pos))
+        self.ui.verticalLayout_2.addWidget(self.ui.asset_grid)
 
         self.ui.search_button.setIcon(QIcon(os.path.join(os.path.dirname(__file__), 'icons', 'search.svg')))
         self.ui.refresh_button.setIcon(QIcon(os.path.join(os.path.dirname(__file__), 'icons', 'refresh.svg')))
@@ -748,14 +894,63 @@ class LocalAssetBrowser(QtWidgets.QMainWindow):
        
 
         self.ui.actionPreferences.triggered.connect(self.settings.show)
+        self.ui.actionDiagnostics.triggered.connect(self.show_diagnostics)
         self.ui.refresh_button.clicked.connect(self.refresh_library)
         self.ui.tumb_slider.valueChanged.connect(self.set_table_row_height)
-        #self.ui.search_button.clicked.connect(self.search)
+        # Connected once here (build_table_widget runs on every refresh)
+        self.ui.table_widget.horizontalHeader().sectionResized.connect(self.on_table_section_resized)
+        self.ui.lineEdit.textChanged.connect(self.search)
+        self.ui.lineEdit.returnPressed.connect(self.search)
+        self.ui.search_button.clicked.connect(self.search)
+        self.setup_filter_menu()
         self.ui.list_view.clicked.connect(lambda: self.ui.stackedWidget.setCurrentIndex(1))
         self.ui.grid_view.clicked.connect(lambda: self.ui.stackedWidget.setCurrentIndex(0))
 
+    def setup_filter_menu(self):
+        """Filter icon in the search box listing the field filters of the query syntax"""
+        filter_action = self.ui.lineEdit.addAction(
+            QIcon(os.path.join(os.path.dirname(__file__), 'icons', 'filter.svg')),
+            QtWidgets.QLineEdit.TrailingPosition)
+        filter_action.setToolTip("Field filters")
+        filter_action.triggered.connect(self.show_filter_menu)
+
+    def show_filter_menu(self):
+        from support_files.query import QUERY_HELP
+        menu = QtWidgets.QMenu(self)
+        for example, description in QUERY_HELP:
+            action = menu.addAction(f"{example}    {description}")
+            action.triggered.connect(lambda checked=False, example=example: self.add_search_filter(example))
+        menu.exec_(self.ui.lineEdit.mapToGlobal(self.ui.lineEdit.rect().bottomRight()))
+
+    def add_search_filter(self, example):
+        text = self.ui.lineEdit.text().rstrip()
+        self.ui.lineEdit.setText(f"{text} {example}".strip())
+        self.ui.lineEdit.setFocus()
+
+
+def startup_milestone(name):
+    """Time since the process started, as a 'startup.<name>' timer (only the first occurrence)"""
+    if 'startup.' + name not in metrics.snapshot()['timers']:
+        metrics.record('startup.' + name, _STARTED, time.perf_counter())
+
+
+def print_startup_time(assets):
+    """--startup-time: milestones in ms since the process started, as JSON"""
+    timers = metrics.snapshot()['timers']
+    milestones = {name[len('startup.'):]: round(stat['total_ms'], 1)
+                  for name, stat in sorted(timers.items(), key=lambda item: item[1]['total_ms'])
+                  if name.startswith('startup.')}
+    print(json.dumps({'assets': assets, 'milestones_ms': milestones}, indent=4))
+
+
+startup_milestone('imports')
+
 if __name__ == "__main__":
     app = QtWidgets.QApplication(sys.argv)
     window = LocalAssetBrowser()
     splash = SplashScreen(window)
-    sys.exit(app.exec_())
+    exit_code = app.exec_()
+    # Cancelled jobs wind down before the interpreter tears their objects down
+    job_scheduler().shutdown()
+    job_scheduler().wait(3000)
+    sys.exit(exit_code)
@@ -0,0 +1,124 @@
+"""Headless indexer: builds a library's .db (database, thumbnails, metadata)
+without the GUI, e.g. overnight on render nodes. The browser then loads
+what it produced and only rescans folders that changed since.
+
+    python LocalAssetIndexer.py /path/to/library --jobs 16 --incremental
+
+Render farm mode (see support_files/farm.py): one machine scans and queues
+jobs under .db/farm, any number of workers on any host claim and run them,
+then the browser (or --farm collect) merges their results.
+
+    python LocalAssetIndexer.py /path/to/library --farm submit --incremental
+    python LocalAssetIndexer.py /mnt/library --farm work --drain     # on each node
+    python LocalAssetIndexer.py /path/to/library --farm collect
+"""
+import sys, os
+import time
+import argparse
+
+from support_files.library import index_library, scan_library
+from support_files.shared_db import SharedDatabase
+
+
+class ProgressPrinter:
+    """Status callback for the core passes: one line per stage step, not per file"""
+
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self.stage = None
+        self.last = 0
+
+    def __call__(self, text, percent):
+        stage = text.split(' ')[0]
+        now = time.monotonic()
+        if stage != self.stage or percent >= 100 or now - self.last >= self.interval:
+            print(f"[{percent:3d}%] {text}", flush=True)
+            self.stage = stage
+            self.last = now
+
+
+def phash_hasher():
+    """Thumbnail hashes for "Find Similar" need QtGui (no display though), skipped without it"""
+    try:
+        from support_files.similarity import dhash_files
+    except ImportError:
+        print("PyQt5 not available: thumbnails are not hashed, the browser does it on load")
+        return None
+    return dhash_files
+
+
+def run_farm(args, root):
+    from support_files.farm import FarmQueue, FarmWorker, collect_results, farm_candidates
+
+    start = time.monotonic()
+    if args.farm == 'submit':
+        database = scan_library(root, args.incremental, not args.no_integrity, status=ProgressPrinter())
+        count = FarmQueue(root, args.lease).submit(farm_candidates(database), args.batch_size)
+        print(f"Queued {count} farm jobs")
+    elif args.farm == 'work':
+        worker = FarmWorker(root, max_workers=args.jobs, hasher=phash_hasher(), lease=args.lease,
+                            status=ProgressPrinter())
+        print(f"Farm worker {worker.name} on {root}")
+        count = worker.run(drain=args.drain)
+        print(f"Ran {count} farm jobs in {time.monotonic() - start:.1f}s")
+    else:
+        shared = SharedDatabase(root)
+        database = shared.load()
+        updates = collect_results(root, database)
+        shared.save(database)
+        print(f"Collected results for {len(updates)} assets, queue: {FarmQueue(root).counts()}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index a Local Asset Browser library without the GUI.")
+    parser.add_argument('root', help="library root folder")
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help="parallel thumbnail conversions and metadata processes (default: CPU count)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only rescan folders modified since the last scan")
+    parser.add_argument('--only-thumbnails', action='store_true',
+                        help="generate missing thumbnails for the stored database, no scan or metadata")
+    parser.add_argument('--no-integrity', action='store_true',
+                        help="skip the missing/short frame check of sequences")
+    parser.add_argument('--farm', choices=('submit', 'work', 'collect'),
+                        help="submit: scan and queue jobs for the farm; work: run queued jobs; "
+                             "collect: merge finished jobs into the database")
+    parser.add_argument('--drain', action='store_true',
+                        help="with --farm work, exit once no job is left instead of waiting for more")
+    parser.add_argument('--batch-size', type=int, default=32,
+                        help="with --farm submit, assets per job (default: 32)")
+    parser.add_argument('--lease', type=float, default=None,
+                        help="seconds without heartbeat before a claimed job is given to another worker "
+                             "(default: 300)")
+    args = parser.parse_args(argv)
+
+    root = os.path.abspath(args.root)
+    if not os.path.isdir(root):
+        parser.error(f"not a folder: {root}")
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+
+    if args.farm:
+        try:
+            return run_farm(args, root)
+        except KeyboardInterrupt:
+            print("Interrupted, the running job went back to the queue")
+            return 130
+
+    start = time.monotonic()
+    try:
+        database = index_library(root, jobs=args.jobs, incremental=args.incremental,
+                                 only_thumbnails=args.only_thumbnails, check_integrity=not args.no_integrity,
+                                 hasher=phash_hasher(), status=ProgressPrinter())
+    except KeyboardInterrupt:
+        print("Interrupted, finished stages are saved")
+        return 130
+    print(f"Indexed {len(database)} assets in {time.monotonic() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
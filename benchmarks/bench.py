@@ -0,0 +1,254 @@
+"""Benchmarks for the scan, database and view hot paths on a synthetic library.
+
+    python benchmarks/bench.py --dirs 200 --frames 100 --output before.json
+    python benchmarks/bench.py --dirs 200 --frames 100 --compare before.json
+
+The library is written to tmpfs (/dev/shm) when available. Every stage
+runs --repeat times and reports min/median/mean seconds. The views are
+built under the offscreen Qt platform, so no display is needed. With
+--compare, a stage whose median got slower than the baseline's by more
+than --threshold is reported and the exit code is 1.
+"""
+import sys, os
+import json
+import time
+import hashlib
+import platform
+import argparse
+import statistics
+import subprocess
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from benchmarks.synthetic import DEFAULT_SHAPE, default_tmpdir, remove_library, temporary_library
+from support_files.library import LibraryScanner, load_database, merge_scan
+from support_files.shared_db import SharedDatabase
+from support_files.patterns import PatternEngine, version_stacks
+from support_files.thumbnails import ThumbnailGenerator
+
+
+STAGES = ('scan', 'scan_incremental', 'grouping', 'db_save', 'db_load', 'db_merge', 'thumbnails',
+          'table_rows', 'table_populate', 'views_paint', 'proxy_sort')
+
+
+class StubThumbnails(ThumbnailGenerator):
+    """Dispatch, duplicate check and bookkeeping only: the 'encoder' writes an empty file"""
+
+    def _convert_one(self, file, queued):
+        path = os.path.join(self.thumbnail_path, hashlib.sha1(file['path'].encode('utf-8')).hexdigest() + '.jpeg')
+        open(path, 'wb').close()
+        return path
+
+
+def measure(fn, repeat, setup=None):
+    """Seconds per run of fn() ({min, median, mean, runs}) and the last run's result"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times), 'mean': statistics.mean(times),
+            'runs': len(times)}, result
+
+
+class Benchmark:
+    def __init__(self, root, repeat, stages):
+        self.root = root
+        self.repeat = repeat
+        self.stages = stages
+        self.results = {}
+        self.counts = {}
+
+    def stage(self, name, fn, setup=None):
+        if name not in self.stages:
+            return None
+        timing, result = measure(fn, self.repeat, setup)
+        self.results[name] = timing
+        print(f"{name:<18} {timing['median'] * 1000:10.1f} ms  (min {timing['min'] * 1000:.1f})", flush=True)
+        return result
+
+    def run(self):
+        # The scan result feeds every later stage, so it runs even when not timed
+        scan = lambda: LibraryScanner(self.root, check_integrity=True).run()
+        assets = self.stage('scan', scan) or scan()
+        database = merge_scan({}, assets)
+        shared = SharedDatabase(self.root)
+        shared.save(database)
+        self.counts.update(assets=len(assets), folders=sum(1 for _ in os.walk(self.root)))
+
+        self.stage('scan_incremental', lambda: LibraryScanner(self.root, check_integrity=True).run(
+            database, incremental=True))
+
+        # Pattern grouping alone: listings and sizes gathered up front, no I/O timed
+        engine = PatternEngine.for_library(self.root)
+        listings = []
+        for folder, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d != '.db']
+            listings.append((folder, filenames, {name: os.path.getsize(os.path.join(folder, name))
+                                                 for name in filenames}))
+        self.stage('grouping', lambda: [engine.group_directory(folder, filenames, sizes)
+                                        for folder, filenames, sizes in listings])
+
+        # A full database.json rewrite (saves themselves only journal what changed)
+        self.stage('db_save', shared.compact)
+        loaded = self.stage('db_load', lambda: load_database(self.root)) or load_database(self.root)
+        self.stage('db_merge', lambda: merge_scan(loaded, assets))
+
+        thumbnails = os.path.join(self.root, '.db', 'bench_thumbnails')
+
+        def fresh_thumbnails():
+            remove_library(thumbnails)
+            os.makedirs(thumbnails)
+            for info in database.values():
+                info.pop('thumbnail', None)
+        self.stage('thumbnails', lambda: StubThumbnails(thumbnails, database).run(), setup=fresh_thumbnails)
+        self.counts['thumbnails'] = sum(1 for info in database.values() if info.get('thumbnail'))
+
+        if self.stages & {'table_rows', 'table_populate', 'views_paint', 'proxy_sort'}:
+            self.run_views(database)
+
+    def run_views(self, database):
+        try:
+            from PyQt5 import QtWidgets
+            from support_files.asset_model import AssetModel, AssetProxyModel
+            from support_files.grid_view import AssetGridView
+            from support_files.workers import IncrementalBuilder, OptimizedTableDelegate, TableBuilderWorker
+        except ImportError as e:
+            print(f"Skipping the view stages: {e}")
+            return
+        app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+
+        model = AssetModel()
+        proxy = AssetProxyModel()
+        proxy.setSourceModel(model)
+        table = QtWidgets.QTableView()
+        table.setModel(proxy)
+        table.setItemDelegateForColumn(0, OptimizedTableDelegate())
+        table.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        table.verticalHeader().setDefaultSectionSize(110)
+        table.resize(1600, 900)
+        grid = AssetGridView()
+        grid.setModel(proxy)
+        grid.resize(1600, 900)
+        table.show()
+        grid.show()
+        stacks = version_stacks(database)
+
+        def build_rows():
+            # What the builder thread does, batches collected instead of sent
+            rows = []
+            worker = TableBuilderWorker(database=database, version_stacks=stacks)
+            worker.add_rows_batch.connect(lambda build_id, batch: rows.extend(batch))
+            worker.run()
+            return rows
+        rows = self.stage('table_rows', build_rows) or build_rows()
+        self.counts['rows'] = len(rows)
+
+        builder = IncrementalBuilder(model.add_rows)
+
+        def populate():
+            # Same path as the GUI: time-budgeted inserts between event loop ticks
+            builder.add(rows)
+            while builder.pending():
+                app.processEvents()
+            app.processEvents()
+        self.stage('table_populate', populate, setup=model.clear)
+        if not model.rowCount():
+            populate()
+
+        def paint():
+            table.viewport().repaint()
+            grid.viewport().repaint()
+        self.stage('views_paint', paint)
+
+        # Cold sort: the proxy caches every order it has computed
+        self.stage('proxy_sort', lambda: proxy.sort(AssetModel.NAME), setup=proxy._sorted.clear)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Stages whose median is more than `threshold` slower than in the baseline"""
+    regressions = []
+    for name, timing in results.items():
+        before = baseline.get('results', {}).get(name)
+        if not before or not before['median']:
+            continue
+        ratio = timing['median'] / before['median']
+        flag = '  REGRESSION' if ratio > 1 + threshold else ''
+        print(f"{name:<18} {before['median'] * 1000:10.1f} -> {timing['median'] * 1000:10.1f} ms  x{ratio:.2f}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scan, database and view hot paths.")
+    for key, value in DEFAULT_SHAPE.items():
+        parser.add_argument('--' + key.replace('_', '-'), type=int, default=value)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--stages', default=','.join(STAGES), help="comma separated, from: " + ', '.join(STAGES))
+    parser.add_argument('--tmpdir', default=None, help="where the library is written (default: tmpfs if any)")
+    parser.add_argument('--output', '-o', help="write the results as JSON to this file (default: stdout)")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1, help="slowdown counted as a regression")
+    args = parser.parse_args(argv)
+
+    stages = set(args.stages.split(','))
+    unknown = stages - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    shape = {key: getattr(args, key) for key in DEFAULT_SHAPE}
+
+    tmpdir = args.tmpdir or default_tmpdir()
+    print(f"Writing library to {tmpdir}: {shape}", flush=True)
+    root, files = temporary_library(shape, tmpdir)
+    try:
+        bench = Benchmark(root, args.repeat, stages)
+        bench.run()
+    finally:
+        remove_library(root)
+
+    report = {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'tmpdir': tmpdir,
+        'shape': shape,
+        'files': files,
+        'counts': bench.counts,
+        'repeat': args.repeat,
+        'results': bench.results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get('shape') != shape:
+            print("Warning: the baseline was run on a different library shape")
+        if compare(bench.results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
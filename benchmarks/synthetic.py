@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+
+
+# Library shape used when nothing else is given
+DEFAULT_SHAPE = {
+    'dirs': 50,         # shot folders
+    'sequences': 10,    # frame sequences per folder
+    'frames': 50,       # frames per sequence
+    'videos': 5,        # videos per folder
+    'stills': 10,       # still images per folder
+    'frame_bytes': 512,
+    'file_bytes': 4096,
+}
+
+
+def default_tmpdir():
+    """tmpfs when there is one, so the disk is not what gets measured"""
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+def make_library(root, shape):
+    """Write a library of the given shape under `root`, returns the number of files.
+
+    Frames carry fixed-size dummy bytes, videos and stills unique ones so the
+    duplicate check has to hash them rather than short-circuit on content.
+    """
+    shape = dict(DEFAULT_SHAPE, **shape)
+    frame_data = b'\0' * shape['frame_bytes']
+    count = 0
+    for d in range(shape['dirs']):
+        folder = os.path.join(root, f"seq{d // 10:03d}", f"shot{d:04d}")
+        os.makedirs(folder, exist_ok=True)
+        for s in range(shape['sequences']):
+            # Every other sequence is a version of a comp (three per stack), so stacks get built too
+            name = f"shot{d:04d}_plate{s:02d}" if s % 2 == 0 else \
+                f"shot{d:04d}_comp{s // 6:02d}_v{s // 2 % 3 + 1:03d}"
+            for frame in range(1001, 1001 + shape['frames']):
+                with open(os.path.join(folder, f"{name}.{frame}.exr"), 'wb') as f:
+                    f.write(frame_data)
+            count += shape['frames']
+        for kind, ext, total in (('clip', '.mov', shape['videos']), ('still', '.png', shape['stills'])):
+            for i in range(total):
+                with open(os.path.join(folder, f"shot{d:04d}_{kind}{i:03d}{ext}"), 'wb') as f:
+                    f.write(f"{d}/{kind}/{i}".encode().ljust(shape['file_bytes'], b'.'))
+            count += total
+    return count
+
+
+def temporary_library(shape, tmpdir=None):
+    """(root, file count) of a fresh library in its own temporary folder"""
+    root = tempfile.mkdtemp(prefix='lab_bench_', dir=tmpdir or default_tmpdir())
+    return root, make_library(root, shape)
+
+
+def remove_library(root):
+    shutil.rmtree(root, ignore_errors=True)
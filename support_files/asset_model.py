@@ -0,0 +1,671 @@
+import os
+import re
+import struct
+
+from PyQt5.QtCore import (QAbstractTableModel, QAbstractProxyModel, QModelIndex, Qt, QMimeData, QUrl,
+                          QByteArray, QTimer, pyqtSignal)
+
+from support_files.jobs import HIGH, Job, job_scheduler
+
+
+# Sort code per asset type (Type column)
+TYPE_CODES = {'sequence': 0, 'video': 1, 'image': 2, 'udim': 3}
+
+# Per-asset bookkeeping of the pipeline stages, never shown or searched
+INTERNAL_KEYS = {'phash', 'hash_stat', 'partial_hash', 'content_hash', 'version_stack'}
+# Keys that are shown in their own columns / not useful to search on
+EXCLUDED_KEYS = {"id", "thumbnail", "ctime", "duplicate_of"} | INTERNAL_KEYS
+
+_digits = re.compile(r'(\d+)')
+
+
+def asset_search_text(info):
+    """Lowercase text an asset is searched on: name, path, type and metadata values.
+
+    The first three lines are always the name, path and type.
+    """
+    parts = [str(info.get("name", "")), str(info.get("path", "")), str(info.get("type", ""))]
+    for key, value in info.items():
+        if key not in EXCLUDED_KEYS and key not in ("name", "path", "type"):
+            parts.append(str(value))
+    return "\n".join(parts).lower()
+
+
+def filter_rows(texts, rows, query):
+    """The rows whose search text contains every word of `query`, in the order given"""
+    if not query:
+        return list(rows)
+    terms = query.split()
+    if len(terms) == 1:
+        return [r for r in rows if query in texts[r]]
+    return [r for r in rows if all(term in texts[r] for term in terms)]
+
+
+def natural_key(text):
+    """Sort key that orders 'shot2' before 'shot10' (case-insensitive).
+
+    re.split with a capture group always alternates text/number, so keys of
+    different strings compare position by position without type errors.
+    """
+    parts = _digits.split(text.lower())
+    parts[1::2] = [int(p) for p in parts[1::2]]
+    return tuple(parts)
+
+
+def asset_sort_keys(row_data):
+    """Return (ctime, name key, type code, path key, search text) for a row.
+
+    TableBuilderWorker calls this on its thread and stores the result in
+    row_data['sort_keys'], so the GUI thread only appends precomputed values.
+    """
+    name = str(row_data['name'])
+    path = str(row_data['path'])
+    text = row_data.get('search_text') or f"{name}\n{path}".lower()
+    return (float(row_data.get('ctime') or 0.0),
+            natural_key(name),
+            TYPE_CODES.get(str(row_data['type']).lower(), len(TYPE_CODES)),
+            natural_key(path),
+            text)
+
+
+class AssetModel(QAbstractTableModel):
+    """Flat model over the asset rows produced by TableBuilderWorker.
+
+    Shared by the table view and the grid view, so each asset is stored once
+    and only the rows a view actually shows are ever painted.
+
+    Version stacks: a head row carries 'versions' (how many older versions
+    it hides) and the older versions, added later when the stack is first
+    expanded, carry 'stack_head' (the head's file id).
+    """
+
+    THUMBNAIL, NAME, TYPE, INFO, PATH = range(5)
+    COLUMNS = ["Thumbnail", "Name", "Type", "Info", "Path"]
+    FileIdRole = Qt.UserRole
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+        self.row_for_id = {}
+        # Precomputed per row when it is added, so sorting and filtering
+        # never have to look at the row dicts again
+        self.sort_keys = {column: [] for column in range(len(self.COLUMNS))}
+        self.search_text = []
+        self.stack_parent = []  # row -> head row for older versions, else None
+        self.version_counts = []  # row -> number of older versions (heads only)
+        self.children = {}  # head row -> older version rows, newest first
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row_data = self.rows[index.row()]
+        column = index.column()
+
+        if role == Qt.DisplayRole:
+            if column == self.THUMBNAIL:
+                return row_data['thumbnail']
+            if column == self.NAME:
+                return str(row_data['name'])
+            if column == self.TYPE:
+                return str(row_data['type'])
+            if column == self.INFO:
+                return row_data['extra_info']
+            if column == self.PATH:
+                return str(row_data['path'])
+        elif role == self.FileIdRole:
+            return row_data['file_id']
+        elif role == Qt.ToolTipRole and column in (self.NAME, self.PATH):
+            return str(row_data['path'])
+        elif role == Qt.TextAlignmentRole and column == self.INFO:
+            return int(Qt.AlignLeft | Qt.AlignTop)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal and 0 <= section < len(self.COLUMNS):
+            return self.COLUMNS[section]
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+
+    def clear(self):
+        self.beginResetModel()
+        self.rows = []
+        self.row_for_id = {}
+        self.sort_keys = {column: [] for column in range(len(self.COLUMNS))}
+        self.search_text = []
+        self.stack_parent = []
+        self.version_counts = []
+        self.children = {}
+        self.endResetModel()
+
+    def add_rows(self, rows_batch):
+        """Append a batch of row dicts (as emitted by TableBuilderWorker)"""
+        if not rows_batch:
+            return
+        first = len(self.rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows_batch) - 1)
+        keys = self.sort_keys
+        for offset, row_data in enumerate(rows_batch):
+            self.row_for_id[row_data['file_id']] = first + offset
+            head = self.row_for_id.get(row_data.get('stack_head'))
+            self.stack_parent.append(head)
+            self.version_counts.append(row_data.get('versions', 0))
+            if head is not None:
+                self.children.setdefault(head, []).append(first + offset)
+            ctime, name_key, type_code, path_key, text = row_data.pop('sort_keys', None) or asset_sort_keys(row_data)
+            row_data.pop('search_text', None)
+            # Thumbnail and Info columns sort by date, like the scanner does
+            keys[self.THUMBNAIL].append(ctime)
+            keys[self.NAME].append(name_key)
+            keys[self.TYPE].append(type_code)
+            keys[self.INFO].append(ctime)
+            keys[self.PATH].append(path_key)
+            self.search_text.append(text)
+        self.rows.extend(rows_batch)
+        self.endInsertRows()
+
+    def set_thumbnail(self, file_id, thumbnail_path):
+        """Update the thumbnail of a single asset and notify the views"""
+        row = self.row_for_id.get(file_id)
+        if row is None:
+            return
+        self.rows[row]['thumbnail'] = thumbnail_path
+        index = self.index(row, self.THUMBNAIL)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole])
+
+    def has_children_built(self, file_id):
+        """True once the older versions of a stack head have rows"""
+        return self.row_for_id.get(file_id) in self.children
+
+    def set_info(self, file_id, extra_info):
+        """Replace the Info column text of one asset (e.g. after metadata extraction)"""
+        row = self.row_for_id.get(file_id)
+        if row is None:
+            return
+        self.rows[row]['extra_info'] = extra_info
+        index = self.index(row, self.INFO)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole])
+
+    def drag_path(self, row):
+        """Return the path to drag for a row.
+
+        Sequences and UDIM tile sets drag their containing folder, everything else the file itself.
+        """
+        row_data = self.rows[row]
+        path = str(row_data['path'])
+        if str(row_data['type']).lower() in ('sequence', 'udim'):
+            return os.path.dirname(path)
+        return path
+
+    def mimeTypes(self):
+        return ['text/uri-list', 'text/plain']
+
+    def mimeData(self, indexes):
+        # Collect unique paths (preserve order)
+        paths = []
+        seen = set()
+        for row in sorted({index.row() for index in indexes}):
+            p = self.drag_path(row)
+            if p and p not in seen:
+                seen.add(p)
+                paths.append(p)
+        return build_drag_mime(paths)
+
+
+class AssetProxyModel(QAbstractProxyModel):
+    """Sorted and filtered view of an AssetModel.
+
+    Keeps a plain list of source rows in display order. Sorting uses the
+    source model's precomputed keys (one key lookup per row, no Python
+    lessThan per comparison) and the full sorted order is cached per
+    column. Filtering is incremental: when the new query contains the
+    previous one, only the rows that matched before are re-tested. Above
+    `async_filter_rows` candidates it waits for a pause in the typing and
+    runs as a job (TextFilterJob), off the GUI thread; `filtered` is sent
+    once the rows shown match the query.
+
+    With a SearchIndex the rows come from set_filter_ids() instead. Rows
+    added after such a query ran can't be tested here (field filters, fuzzy
+    and similar: matches only the index knows): they stay hidden and
+    `query_outdated` asks for the query to be run again.
+
+    Only stack heads (and plain assets) are sorted and filtered. The older
+    versions of an expanded stack are shown right below their head, newest
+    first, whatever the sort order.
+    """
+
+    query_outdated = pyqtSignal()
+    filtered = pyqtSignal()
+
+    async_filter_rows = 20000
+    filter_delay = 150  # ms
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.sort_column = -1  # -1 keeps the source (scan) order
+        self.sort_order = Qt.AscendingOrder
+        self.query = ''
+        self.ranked = False  # rows come best match first (fuzzy search)
+        self.from_index = False  # rows shown were picked by a SearchIndex query (set_filter_ids)
+        self._order = []  # top level source rows currently shown, in display order
+        self._rows = []  # _order with the rows of expanded stacks inserted
+        self.expanded = set()  # head source rows
+        self._sorted = {}  # (column, order) -> every source row in that order
+        self._inverse = None  # source row -> proxy row, built on demand
+        self._resort_timer = QTimer(self)
+        self._resort_timer.setSingleShot(True)
+        self._resort_timer.setInterval(300)
+        self._resort_timer.timeout.connect(self._resort)
+        # Text filter jobs: only the latest one's rows are shown
+        self._filter_job = None
+        self._filter_generation = 0
+        self._filtered_query = ''  # query the rows in _order were all tested with, None if mixed
+        self._filter_candidates = None  # (rows, sort) a pending job will test
+        self._added_while_filtering = []
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(self.filter_delay)
+        self._filter_timer.timeout.connect(self._start_filter_job)
+
+    def setSourceModel(self, model):
+        super().setSourceModel(model)
+        model.modelReset.connect(self._on_source_reset)
+        model.rowsInserted.connect(self._on_rows_inserted)
+        model.dataChanged.connect(self._on_source_data_changed)
+        self._on_source_reset()
+
+    # ---- QAbstractItemModel interface ----
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.sourceModel() is None:
+            return 0
+        return self.sourceModel().columnCount()
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not (0 <= row < len(self._rows)) or not (0 <= column < self.columnCount()):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=None):
+        return QModelIndex()
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid() or proxy_index.row() >= len(self._rows):
+            return QModelIndex()
+        return self.sourceModel().index(self._rows[proxy_index.row()], proxy_index.column())
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        row = self._proxy_row(source_index.row())
+        if row < 0:
+            return QModelIndex()
+        return self.createIndex(row, source_index.column())
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        # Columns are never remapped, so ask the source directly (works with 0 rows)
+        return self.sourceModel().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        value = super().data(index, role)
+        if role == Qt.DisplayRole and index.column() == AssetModel.NAME and index.isValid():
+            model = self.sourceModel()
+            row = self._rows[index.row()]
+            if model.stack_parent[row] is not None:
+                return f"    {value}"
+            count = model.version_counts[row]
+            if count:
+                return f"{'▾' if row in self.expanded else '▸'} {value}  (+{count} versions)"
+        return value
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self.beginResetModel()
+        if self.query:
+            # Only the rows shown need sorting, no need to filter again
+            self._order = self._sort_rows(self._order)
+        else:
+            self._order = list(self._sorted_rows())
+        self._flatten()
+        self.endResetModel()
+
+    # ---- filtering ----
+
+    def set_filter_text(self, text):
+        """Show only rows whose name or path contains `text` (case-insensitive)"""
+        query = text.strip().lower()
+        if query == self.query:
+            if not self.filtering():
+                self.filtered.emit()
+            return
+        self._cancel_filter()
+        if self.query and self._filtered_query is not None and self._filtered_query in query:
+            # Narrowing: the new matches are a subset of what is shown now
+            candidates = self._order
+        else:
+            candidates = self._sorted_rows()
+        self.query = query
+        self.ranked = False
+        self.from_index = False
+        if query and len(candidates) > self.async_filter_rows:
+            # Copied: rows added meanwhile are tested with the new query as
+            # they come, and appended to _order
+            self._filter_candidates = list(candidates), (self.sort_column, self.sort_order)
+            self._filtered_query = None
+            self._filter_timer.start()
+            return
+        self._show_filtered(filter_rows(self.sourceModel().search_text, candidates, query), query)
+
+    def filtering(self):
+        """Whether a text filter is waiting for its job"""
+        return self._filter_timer.isActive() or self._filter_job is not None
+
+    def _start_filter_job(self):
+        self._filter_generation += 1
+        candidates, sort = self._filter_candidates
+        self._filter_candidates = None
+        job = TextFilterJob(self.sourceModel().search_text, candidates, self.query, self._filter_generation, sort)
+        job.matched.connect(self._on_filter_matched)
+        self._filter_job = job
+        job_scheduler().submit(job, HIGH)
+
+    def _on_filter_matched(self, generation, rows):
+        job = self._filter_job
+        if job is None or generation != self._filter_generation:
+            return  # replaced by a newer query
+        self._filter_job = None
+        if job.sort != (self.sort_column, self.sort_order):
+            rows = self._sort_rows(rows)
+        added = self._added_while_filtering
+        self._show_filtered(rows + added, job.query)
+        if added and self.sort_column >= 0 and not self._resort_timer.isActive():
+            self._resort_timer.start()
+
+    def _show_filtered(self, rows, query):
+        self.beginResetModel()
+        self._order = rows
+        self._flatten()
+        self.endResetModel()
+        self._filtered_query = query
+        self._added_while_filtering = []
+        self.filtered.emit()
+
+    def _cancel_filter(self):
+        self._filter_timer.stop()
+        self._filter_candidates = None
+        self._added_while_filtering = []
+        self._filter_generation += 1
+        if self._filter_job is not None:
+            self._filter_job.cancel()
+            self._filter_job = None
+
+    def set_filter_ids(self, text, asset_ids, append=False, ranked=False):
+        """Show the assets found by a SearchIndex query for `text`.
+
+        Results may arrive in several chunks: the first one replaces the
+        current rows, the following ones are appended (append=True).
+        Ranked results keep their order until a sort column is picked.
+        """
+        row_for_id = self.sourceModel().row_for_id
+        parents = self.sourceModel().stack_parent
+        if not append:
+            self.ranked = ranked
+        rows = self._sort_rows([row_for_id[i] for i in asset_ids
+                                if i in row_for_id and parents[row_for_id[i]] is None])
+        if not append:
+            self._cancel_filter()
+            self.query = text.strip().lower()
+            self.from_index = True
+            self._filtered_query = None
+            self.beginResetModel()
+            self._order = rows
+            self._flatten()
+            self.endResetModel()
+        elif rows:
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+            self._order.extend(rows)
+            self._rows.extend(rows)
+            self._inverse = None
+            self.endInsertRows()
+            if self.sort_column >= 0 and not self._resort_timer.isActive():
+                self._resort_timer.start()
+
+    def _sort_rows(self, rows):
+        """Sort a subset of source rows by the current sort column"""
+        if self.sort_column < 0 or self.sort_column not in self.sourceModel().sort_keys:
+            return list(rows) if self.ranked else sorted(rows)
+        keys = self.sourceModel().sort_keys[self.sort_column]
+        return sorted(rows, key=keys.__getitem__, reverse=self.sort_order == Qt.DescendingOrder)
+
+    # ---- version stacks ----
+
+    def stack_state(self, proxy_row):
+        """(older version count, expanded) of the row, (0, False) if it is no stack head"""
+        if not 0 <= proxy_row < len(self._rows):
+            return 0, False
+        row = self._rows[proxy_row]
+        if self.sourceModel().stack_parent[row] is not None:
+            return 0, False
+        return self.sourceModel().version_counts[row], row in self.expanded
+
+    def set_expanded(self, proxy_row, expanded):
+        """Show or hide the older versions of a stack head.
+
+        Versions without rows yet appear as soon as they are added to the
+        source model (see _on_rows_inserted).
+        """
+        count, is_expanded = self.stack_state(proxy_row)
+        if not count or expanded == is_expanded:
+            return
+        row = self._rows[proxy_row]
+        children = self.sourceModel().children.get(row, [])
+        if expanded:
+            self.expanded.add(row)
+            self._insert_rows(proxy_row + 1, children)
+        else:
+            self.expanded.discard(row)
+            if children:
+                self.beginRemoveRows(QModelIndex(), proxy_row + 1, proxy_row + len(children))
+                del self._rows[proxy_row + 1:proxy_row + 1 + len(children)]
+                self._inverse = None
+                self.endRemoveRows()
+        name = self.index(proxy_row, AssetModel.NAME)
+        self.dataChanged.emit(name, name, [Qt.DisplayRole])
+
+    def _insert_rows(self, position, rows):
+        if not rows:
+            return
+        self.beginInsertRows(QModelIndex(), position, position + len(rows) - 1)
+        self._rows[position:position] = rows
+        self._inverse = None
+        self.endInsertRows()
+
+    # ---- internals ----
+
+    def _flatten(self):
+        """Rebuild _rows from _order and the expanded stacks"""
+        if self.expanded:
+            children = self.sourceModel().children
+            rows = []
+            for row in self._order:
+                rows.append(row)
+                if row in self.expanded:
+                    rows.extend(children.get(row, ()))
+            self._rows = rows
+        else:
+            self._rows = list(self._order)
+        self._inverse = None
+
+    def _sorted_rows(self):
+        """All source rows in the current sort order (cached until rows change)"""
+        top = self._sorted.get(None)
+        if top is None:
+            # Older versions only ever show under their head
+            parents = self.sourceModel().stack_parent
+            top = self._sorted[None] = [row for row, parent in enumerate(parents) if parent is None]
+        if self.sort_column < 0 or self.sort_column not in self.sourceModel().sort_keys:
+            return top
+        cache_key = (self.sort_column, self.sort_order)
+        rows = self._sorted.get(cache_key)
+        if rows is None:
+            keys = self.sourceModel().sort_keys[self.sort_column]
+            # sorted() is stable, so equal keys keep the scan order
+            rows = sorted(top, key=keys.__getitem__,
+                          reverse=self.sort_order == Qt.DescendingOrder)
+            self._sorted[cache_key] = rows
+        return rows
+
+    def _proxy_row(self, source_row):
+        if self._inverse is None:
+            inverse = [-1] * self.sourceModel().rowCount()
+            for proxy_row, row in enumerate(self._rows):
+                inverse[row] = proxy_row
+            self._inverse = inverse
+        if source_row >= len(self._inverse):
+            return -1
+        return self._inverse[source_row]
+
+    def _on_source_reset(self):
+        self._cancel_filter()
+        self._filtered_query = self.query
+        self.beginResetModel()
+        self._sorted = {}
+        self._order = []
+        self._rows = []
+        self.expanded = set()
+        self._inverse = None
+        self.endResetModel()
+
+    def _on_rows_inserted(self, parent, first, last):
+        # New rows are appended; matching ones go at the end for now and a
+        # (coalesced) re-sort puts them in place if a sort column is active
+        self._sorted = {}
+        parents = self.sourceModel().stack_parent
+        versions = {}
+        top_rows = []
+        for row in range(first, last + 1):
+            if parents[row] is None:
+                top_rows.append(row)
+            elif parents[row] in self.expanded:
+                versions.setdefault(parents[row], []).append(row)
+        if self.from_index:
+            new_rows = []
+            if top_rows:
+                self.query_outdated.emit()
+        else:
+            new_rows = filter_rows(self.sourceModel().search_text, top_rows, self.query)
+            if self.filtering():
+                self._added_while_filtering.extend(new_rows)
+        if self._inverse is not None:
+            self._inverse.extend([-1] * (last + 1 - len(self._inverse)))
+        if new_rows:
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(new_rows) - 1)
+            self._order.extend(new_rows)
+            self._rows.extend(new_rows)
+            if self._inverse is not None:
+                for offset, row in enumerate(new_rows):
+                    self._inverse[row] = start + offset
+            self.endInsertRows()
+        for head, rows in versions.items():
+            # Versions built for an expanded stack go under their head
+            head_row = self._proxy_row(head)
+            if head_row >= 0:
+                shown = len(self.sourceModel().children[head]) - len(rows)
+                self._insert_rows(head_row + 1 + shown, rows)
+        if self.sort_column >= 0 and not self._resort_timer.isActive():
+            self._resort_timer.start()
+
+    def _resort(self):
+        self.sort(self.sort_column, self.sort_order)
+
+    def _on_source_data_changed(self, top_left, bottom_right, roles=None):
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            proxy_row = self._proxy_row(row)
+            if proxy_row >= 0:
+                first = self.index(proxy_row, top_left.column())
+                last = self.index(proxy_row, bottom_right.column())
+                self.dataChanged.emit(first, last, roles or [])
+
+
+class TextFilterJob(Job):
+    """Text filter of a large model (see AssetProxyModel.set_filter_text)"""
+    pool = 'cpu'
+    matched = pyqtSignal(int, list)  # generation, source rows in the order given
+
+    def __init__(self, texts, rows, query, generation, sort):
+        super().__init__()
+        # The model's list: only appended to while the job runs
+        self.texts = texts
+        self.rows = rows
+        self.query = query
+        self.generation = generation
+        self.sort = sort
+
+    def run(self):
+        rows = filter_rows(self.texts, self.rows, self.query)
+        if not self.cancelled():
+            self.post(self.matched, self.generation, rows)
+
+
+def build_drag_mime(paths):
+    """Build mime data for dragging files/folders into other applications."""
+    mime = QMimeData()
+    urls = [QUrl.fromLocalFile(p) for p in paths]
+    mime.setUrls(urls)
+    mime.setText(';'.join(paths))
+
+    # Also provide several additional formats to increase compatibility with Windows apps
+    try:
+        # 1) text/uri-list (UTF-8) — common URI list format
+        uri_list = '\r\n'.join([u.toString() for u in urls])
+        mime.setData('text/uri-list', QByteArray(uri_list.encode('utf-8')))
+
+        # 2) plain text with local paths (newline separated)
+        mime.setData('text/plain', QByteArray('\r\n'.join(paths).encode('utf-8')))
+
+        # 3) FileNameW (UTF-16LE Windows native)
+        fnw = b''.join([p.encode('utf-16le') + b'\x00\x00' for p in paths]) + b'\x00\x00'
+        mime.setData('application/x-qt-windows-mime;value="FileNameW"', QByteArray(fnw))
+
+        # 4) FileName (ANSI) — some older apps expect ANSI null-terminated strings
+        try:
+            ansi = b''.join([p.encode('mbcs', errors='replace') + b'\x00' for p in paths]) + b'\x00'
+            mime.setData('application/x-qt-windows-mime;value="FileName"', QByteArray(ansi))
+        except Exception:
+            pass
+
+        # 5) CF_HDROP (DROPFILES wide) — construct DROPFILES struct + UTF-16LE filenames
+        try:
+            # DROPFILES struct: DWORD pFiles; LONG pt.x; LONG pt.y; BOOL fNC; BOOL fWide;
+            # We set pFiles to size of header (20) and fWide=1
+            pFiles = 20
+            drop_header = struct.pack('<IiiII', pFiles, 0, 0, 0, 1)
+            drop_buf = drop_header + fnw
+            mime.setData('application/x-qt-windows-mime;value="CF_HDROP"', QByteArray(drop_buf))
+        except Exception:
+            pass
+    except Exception:
+        pass
+
+    return mime
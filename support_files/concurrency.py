@@ -0,0 +1,115 @@
+import os
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: no CPU accounting of child processes
+    resource = None
+
+from support_files.diagnostics import metrics
+
+
+def cpu_seconds():
+    """CPU time used so far by the finished child processes, the encoders (None if unknown).
+
+    The GUI's own work (table, search, hashing) is not counted.
+    """
+    if resource is None:
+        return None
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return children.ru_utime + children.ru_stime
+
+
+class AdaptiveConcurrency:
+    """AIMD control of how many jobs run at once, between `minimum` and `maximum`.
+
+    Finished jobs report the bytes they read. Once per window (at least as
+    many completions as the current limit, and `min_window` seconds) the
+    read throughput and the CPU use of the window are compared with the
+    previous window:
+
+    - throughput fell by more than `tolerance` (unless the limit was just
+      lowered, which explains it): the storage is congested (a NAS link
+      thrashing), cut the limit by `backoff`;
+    - the encoders saturate the CPU: more jobs would only wait for cores,
+      cut the limit by `backoff` too;
+    - otherwise raise the limit, doubling until the first congestion or
+      saturation (slow start), then one at a time.
+
+    Without CPU accounting (Windows) the CPU can't be seen: a raise that
+    brought less than `tolerance` more throughput counts as saturation
+    and is taken back.
+
+    The limit and the measurements are published as gauges under `name`.
+    """
+
+    def __init__(self, minimum=1, maximum=None, name='concurrency', cpus=None, tolerance=0.1,
+                 saturation=0.9, min_window=0.5, backoff=0.5):
+        self.cpus = cpus or os.cpu_count() or 1
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum or self.cpus)
+        self.limit = min(self.maximum, max(self.minimum, 2))
+        self.name = name
+        self.tolerance = tolerance
+        self.saturation = saturation
+        self.min_window = min_window
+        self.backoff = backoff
+        self.slow_start = True
+        self.throughput = 0.0  # bytes/s of the last window
+        self.cpu_load = None  # share of all cores used in the last window
+        self._previous = None  # (limit, throughput) of the window before
+        self._start_window()
+        self._publish()
+
+    def record(self, read_bytes):
+        """A job finished after reading `read_bytes`"""
+        self._bytes += read_bytes
+        self._count += 1
+        elapsed = time.perf_counter() - self._started
+        if self._count >= self.limit and elapsed >= self.min_window:
+            self._end_window(elapsed)
+
+    def _start_window(self):
+        self._bytes = 0
+        self._count = 0
+        self._started = time.perf_counter()
+        self._cpu = cpu_seconds()
+
+    def _end_window(self, elapsed):
+        self.throughput = self._bytes / elapsed
+        cpu = cpu_seconds()
+        self.cpu_load = (cpu - self._cpu) / (elapsed * self.cpus) if cpu is not None else None
+
+        limit = self.limit
+        previous_limit, previous_throughput = self._previous or (limit, 0.0)
+        dropped = limit >= previous_limit and self.throughput < previous_throughput * (1 - self.tolerance)
+        if self.cpu_load is not None:
+            saturated = self.cpu_load >= self.saturation
+        else:
+            saturated = limit > previous_limit and self.throughput < previous_throughput * (1 + self.tolerance)
+        if dropped or (saturated and self.cpu_load is not None):
+            self.slow_start = False
+            self.limit = max(self.minimum, min(limit - 1, int(limit * self.backoff)))
+            metrics.count(self.name + '.decreases')
+        elif saturated:
+            # The last raise bought nothing
+            self.slow_start = False
+            self.limit = previous_limit
+        elif limit < self.maximum:
+            self.limit = min(self.maximum, limit * 2 if self.slow_start else limit + 1)
+        self._previous = (limit, self.throughput)
+        self._publish()
+        self._start_window()
+
+    def _publish(self):
+        metrics.gauge(self.name + '.limit', self.limit)
+        metrics.gauge(self.name + '.read_mb_s', round(self.throughput / 1e6, 1))
+        if self.cpu_load is not None:
+            metrics.gauge(self.name + '.cpu_load', round(self.cpu_load, 2))
+
+    def describe(self):
+        """Short text for status messages"""
+        text = f"{self.limit} workers, {self.throughput / 1e6:.1f} MB/s"
+        if self.cpu_load is not None:
+            text += f", CPU {self.cpu_load:.0%}"
+        return text
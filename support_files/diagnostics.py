@@ -0,0 +1,190 @@
+import os
+import io
+import json
+import time
+import threading
+import functools
+from collections import deque
+
+
+# Qt-free, so the scanner, thumbnail and metadata passes can report too
+
+class _Span:
+    __slots__ = ('metrics', 'name', 'args', 'start')
+
+    def __init__(self, metrics, name, args):
+        self.metrics = metrics
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, self.start, time.perf_counter(), **self.args)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Instrumentation:
+    """Named timers and counters, cheap enough to leave on.
+
+    Timers keep count/total/min/max per name plus the most recent spans,
+    which export as a Chrome trace (chrome://tracing or Perfetto). Counters
+    are plain totals; 'x.hit' and 'x.miss' pairs also report a hit rate.
+    Gauges hold the latest value of something (a concurrency limit).
+    Names are dotted, the part before the first dot is the trace category.
+    """
+
+    def __init__(self, max_events=100000):
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._timers = {}  # name -> [count, total, min, max] in seconds
+        self._counters = {}
+        self._gauges = {}
+        self._events = deque(maxlen=max_events)  # (name, start, duration, thread id, args)
+        self._origin = time.perf_counter()
+        self._profiler = None
+
+    def timer(self, name, **args):
+        """Context manager timing its block under `name`"""
+        return _Span(self, name, args) if self.enabled else _NULL_SPAN
+
+    def timed(self, name):
+        """Decorator timing every call of a function under `name`"""
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def record(self, name, start, end, **args):
+        """Add a span measured elsewhere (perf_counter() seconds), e.g. a queue wait"""
+        if not self.enabled:
+            return
+        duration = end - start
+        with self._lock:
+            stat = self._timers.get(name)
+            if stat is None:
+                self._timers[name] = [1, duration, duration, duration]
+            else:
+                stat[0] += 1
+                stat[1] += duration
+                if duration < stat[2]:
+                    stat[2] = duration
+                if duration > stat[3]:
+                    stat[3] = duration
+            self._events.append((name, start, duration, threading.get_ident(), args or None))
+
+    def count(self, name, value=1):
+        if self.enabled:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        if self.enabled:
+            with self._lock:
+                self._gauges[name] = value
+
+    def reset(self):
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+            self._gauges.clear()
+            self._events.clear()
+
+    def snapshot(self):
+        """{'timers': {name: {count, total_ms, mean_ms, min_ms, max_ms}}, 'counters': {...}, 'gauges': {...},
+        'rates': {...}}"""
+        with self._lock:
+            timers = {name: list(stat) for name, stat in self._timers.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        rates = {}
+        for name, hits in counters.items():
+            if name.endswith('.hit'):
+                prefix = name[:-len('.hit')]
+                total = hits + counters.get(prefix + '.miss', 0)
+                rates[prefix] = hits / total if total else 0.0
+        return {
+            'timers': {name: {'count': count, 'total_ms': total * 1000, 'mean_ms': total / count * 1000,
+                              'min_ms': low * 1000, 'max_ms': high * 1000}
+                       for name, (count, total, low, high) in sorted(timers.items())},
+            'counters': dict(sorted(counters.items())),
+            'gauges': dict(sorted(gauges.items())),
+            'rates': rates,
+        }
+
+    def chrome_trace(self):
+        """Recorded spans in the Chrome trace event format"""
+        with self._lock:
+            events = list(self._events)
+            counters = dict(self._counters)
+        pid = os.getpid()
+        threads = {thread.ident: thread.name for thread in threading.enumerate()}
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': ident, 'args': {'name': name}}
+                 for ident, name in threads.items()]
+        end = 0
+        for name, start, duration, ident, args in events:
+            event = {'name': name, 'cat': name.split('.')[0], 'ph': 'X', 'pid': pid, 'tid': ident,
+                     'ts': round((start - self._origin) * 1e6, 3), 'dur': round(duration * 1e6, 3)}
+            if args:
+                event['args'] = {key: str(value) for key, value in args.items()}
+            trace.append(event)
+            end = max(end, event['ts'] + event['dur'])
+        # Counter totals at the end of the trace
+        trace.extend({'name': name, 'ph': 'C', 'pid': pid, 'ts': end, 'args': {'value': value}}
+                     for name, value in counters.items())
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+    # ---- cProfile ----
+
+    @property
+    def profiling(self):
+        return self._profiler is not None
+
+    def start_profile(self):
+        """cProfile the calling thread (the GUI thread, where freezes show) until stop_profile()"""
+        if self._profiler is None:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop_profile(self):
+        """pstats.Stats of the profiled window, None if no profile was running"""
+        profiler, self._profiler = self._profiler, None
+        if profiler is None:
+            return None
+        profiler.disable()
+        import pstats
+        return pstats.Stats(profiler)
+
+
+def profile_report(stats, limit=40, sort='cumulative'):
+    """Top `limit` functions of a pstats.Stats as text"""
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+# Global instance, every subsystem reports here
+metrics = Instrumentation()
@@ -0,0 +1,154 @@
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QFontDatabase
+
+from support_files.diagnostics import metrics, profile_report
+
+
+class DiagnosticsDialog(QtWidgets.QDialog):
+    """Live view of the instrumentation (timers, counters, gauges, cache hit rates),
+    Chrome trace export and a cProfile window of the GUI thread"""
+
+    TIMER_COLUMNS = ["Name", "Count", "Total (ms)", "Mean (ms)", "Max (ms)"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Diagnostics")
+        self.resize(820, 640)
+        self.profile_stats = None
+
+        layout = QtWidgets.QVBoxLayout(self)
+
+        controls = QtWidgets.QHBoxLayout()
+        self.enabled_check = QtWidgets.QCheckBox("Record timings")
+        self.enabled_check.setChecked(metrics.enabled)
+        self.enabled_check.toggled.connect(self.set_enabled)
+        reset_button = QtWidgets.QPushButton("Reset")
+        reset_button.clicked.connect(self.reset)
+        export_button = QtWidgets.QPushButton("Export Chrome Trace...")
+        export_button.clicked.connect(self.export_trace)
+        controls.addWidget(self.enabled_check)
+        controls.addStretch()
+        controls.addWidget(reset_button)
+        controls.addWidget(export_button)
+        layout.addLayout(controls)
+
+        self.tree = QtWidgets.QTreeWidget()
+        self.tree.setColumnCount(len(self.TIMER_COLUMNS))
+        self.tree.setHeaderLabels(self.TIMER_COLUMNS)
+        self.tree.setRootIsDecorated(True)
+        self.tree.setUniformRowHeights(True)
+        self.tree.header().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        self.tree.setSortingEnabled(True)
+        self.tree.sortByColumn(0, Qt.AscendingOrder)
+        self.groups = {}
+        for group in ("Timers", "Counters", "Gauges"):
+            self.groups[group] = QtWidgets.QTreeWidgetItem(self.tree, [group])
+            self.groups[group].setExpanded(True)
+        self.items = {}  # (group, name) -> tree item
+        layout.addWidget(self.tree, 3)
+
+        profile_controls = QtWidgets.QHBoxLayout()
+        self.profile_seconds = QtWidgets.QSpinBox()
+        self.profile_seconds.setRange(1, 600)
+        self.profile_seconds.setValue(10)
+        self.profile_seconds.setSuffix(" s")
+        self.profile_button = QtWidgets.QPushButton("Profile GUI Thread")
+        self.profile_button.clicked.connect(self.start_profile)
+        self.save_profile_button = QtWidgets.QPushButton("Save Profile...")
+        self.save_profile_button.setEnabled(False)
+        self.save_profile_button.clicked.connect(self.save_profile)
+        profile_controls.addWidget(QtWidgets.QLabel("cProfile for"))
+        profile_controls.addWidget(self.profile_seconds)
+        profile_controls.addWidget(self.profile_button)
+        profile_controls.addStretch()
+        profile_controls.addWidget(self.save_profile_button)
+        layout.addLayout(profile_controls)
+
+        self.profile_text = QtWidgets.QPlainTextEdit()
+        self.profile_text.setReadOnly(True)
+        self.profile_text.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
+        self.profile_text.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.profile_text.setPlaceholderText("Profile the GUI thread while reproducing a slowdown")
+        layout.addWidget(self.profile_text, 2)
+
+        # Only refreshed while the dialog is shown
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.profile_timer = QTimer(self)
+        self.profile_timer.setSingleShot(True)
+        self.profile_timer.timeout.connect(self.stop_profile)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.refresh_timer.start()
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def set_enabled(self, enabled):
+        metrics.enabled = enabled
+
+    def reset(self):
+        metrics.reset()
+        self.refresh()
+
+    def refresh(self):
+        snapshot = metrics.snapshot()
+        rows = {('Timers', name): (stat['count'], f"{stat['total_ms']:.1f}", f"{stat['mean_ms']:.3f}",
+                                   f"{stat['max_ms']:.3f}")
+                for name, stat in snapshot['timers'].items()}
+        rows.update({('Counters', name): (value,) for name, value in snapshot['counters'].items()})
+        rows.update({('Counters', f"{prefix} hit rate"): (f"{rate:.1%}",)
+                     for prefix, rate in snapshot['rates'].items()})
+        rows.update({('Gauges', name): (value,) for name, value in snapshot['gauges'].items()})
+
+        # Updated in place, so the scroll position and expanded groups stay
+        for key in set(self.items) - set(rows):
+            item = self.items.pop(key)
+            item.parent().removeChild(item)
+        for (group, name), values in rows.items():
+            item = self.items.get((group, name))
+            if item is None:
+                item = self.items[(group, name)] = QtWidgets.QTreeWidgetItem([name])
+                for column in range(1, len(self.TIMER_COLUMNS)):
+                    item.setTextAlignment(column, Qt.AlignRight | Qt.AlignVCenter)
+                self.groups[group].addChild(item)
+            for column, value in enumerate(values, 1):
+                item.setText(column, str(value))
+
+    def export_trace(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Export Chrome Trace", "trace.json",
+                                                        "Chrome trace (*.json)")
+        if not path:
+            return
+        try:
+            metrics.export_chrome_trace(path)
+        except OSError as e:
+            QtWidgets.QMessageBox.warning(self, "Export Failed", str(e))
+            return
+        print(f"Chrome trace written to {path} (open it in chrome://tracing or ui.perfetto.dev)")
+
+    def start_profile(self):
+        seconds = self.profile_seconds.value()
+        metrics.start_profile()
+        self.profile_button.setEnabled(False)
+        self.profile_text.setPlainText(f"Profiling the GUI thread for {seconds} s...")
+        self.profile_timer.start(seconds * 1000)
+
+    def stop_profile(self):
+        self.profile_stats = metrics.stop_profile()
+        self.profile_button.setEnabled(True)
+        if self.profile_stats is None:
+            return
+        self.profile_text.setPlainText(profile_report(self.profile_stats))
+        self.save_profile_button.setEnabled(True)
+
+    def save_profile(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Save Profile", "profile.prof",
+                                                        "cProfile stats (*.prof)")
+        if path and self.profile_stats is not None:
+            self.profile_stats.dump_stats(path)
@@ -0,0 +1,155 @@
+import os
+import hashlib
+import concurrent.futures
+
+
+PARTIAL_BYTES = 64 * 1024
+CHUNK_BYTES = 1024 * 1024
+# Sequences are folders of frames, only single files are compared
+DUPLICATE_TYPES = {"video", "image"}
+# Fields DuplicateFinder writes into the asset dicts
+DUPLICATE_KEYS = ("file_size", "hash_stat", "partial_hash", "content_hash", "duplicate_of")
+
+
+def partial_hash(path, size):
+    """sha1 of the first and last 64 KB of a file"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        digest.update(f.read(PARTIAL_BYTES))
+        if size > PARTIAL_BYTES:
+            f.seek(max(PARTIAL_BYTES, size - PARTIAL_BYTES))
+            digest.update(f.read(PARTIAL_BYTES))
+    return digest.hexdigest()
+
+
+def full_hash(path):
+    """Streaming sha1 of a whole file"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def bounded_map(executor, fn, items, max_in_flight):
+    """Like executor.map, but never more than `max_in_flight` submitted jobs.
+
+    Yields (item, result) in completion order; result is the exception if fn raised.
+    """
+    items = iter(items)
+    pending = {}
+    while True:
+        for item in items:
+            pending[executor.submit(fn, item)] = item
+            if len(pending) >= max_in_flight:
+                break
+        if not pending:
+            return
+        done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            item = pending.pop(future)
+            try:
+                yield item, future.result()
+            except Exception as e:
+                yield item, e
+
+
+class DuplicateFinder:
+    """Staged content-hash duplicate detection.
+
+    1. group files by size (a stat per file),
+    2. hash the first/last 64 KB of files that share a size,
+    3. fully hash only what still collides.
+
+    Every stage runs on a small bounded I/O pool. Results are written into
+    the asset dicts: 'file_size', the hashes (kept with the size/mtime they
+    were computed for, so unchanged files are never read again) and
+    'duplicate_of' = id of the copy that owns the thumbnail and metadata.
+    """
+
+    def __init__(self, max_workers=4, status=None, cancelled=None):
+        self.max_workers = max_workers
+        self.status = status or (lambda text, percent: None)
+        self.cancelled = cancelled or (lambda: False)
+
+    def run(self, assets):
+        """Find duplicates among `assets` (id -> info), returns {original id: [duplicate ids]}"""
+        candidates = [asset_id for asset_id, info in assets.items()
+                      if str(info.get("type", "")).lower() in DUPLICATE_TYPES and info.get("path")]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # Stage 1: size
+            by_size = {}
+            for asset_id, stat in self._map(executor, lambda i: os.stat(assets[i]["path"]), candidates, "Checking sizes"):
+                if isinstance(stat, Exception) or stat.st_size == 0:
+                    continue
+                info = assets[asset_id]
+                hash_stat = [stat.st_size, stat.st_mtime]
+                if info.get("hash_stat") != hash_stat:
+                    # Changed (or new) file: cached hashes are stale
+                    info.pop("partial_hash", None)
+                    info.pop("content_hash", None)
+                    info["hash_stat"] = hash_stat
+                info["file_size"] = stat.st_size
+                by_size.setdefault(stat.st_size, []).append(asset_id)
+
+            # Stage 2: first/last 64 KB
+            groups = self._refine(executor, assets, self._collisions(by_size), "partial_hash",
+                                  lambda i: partial_hash(assets[i]["path"], assets[i]["file_size"]),
+                                  "Hashing file ends")
+            for group in groups:
+                for asset_id in group:
+                    info = assets[asset_id]
+                    if info["file_size"] <= 2 * PARTIAL_BYTES and info.get("partial_hash"):
+                        # The ends were the whole file
+                        info["content_hash"] = info["partial_hash"]
+            # Stage 3: full content
+            groups = self._refine(executor, assets, groups, "content_hash",
+                                  lambda i: full_hash(assets[i]["path"]), "Hashing duplicates")
+
+        if self.cancelled():
+            return {}
+
+        duplicates = {}
+        for group in groups:
+            # The oldest copy is the original
+            original, *copies = sorted(group, key=lambda i: (assets[i].get("ctime", 0), i))
+            duplicates[original] = copies
+        self._mark(assets, duplicates)
+        return duplicates
+
+    def _refine(self, executor, assets, groups, key, hash_fn, status):
+        """Split each group by a hash (cached in the asset under `key`)"""
+        todo = [asset_id for group in groups for asset_id in group if not assets[asset_id].get(key)]
+        for asset_id, value in self._map(executor, hash_fn, todo, status):
+            if not isinstance(value, Exception):
+                assets[asset_id][key] = value
+        by_hash = {}
+        for group in groups:
+            for asset_id in group:
+                value = assets[asset_id].get(key)
+                if value:
+                    # Files of different sizes can share their first/last 64 KB
+                    by_hash.setdefault((assets[asset_id]["file_size"], value), []).append(asset_id)
+        return self._collisions(by_hash)
+
+    def _map(self, executor, fn, items, status):
+        total = len(items) or 1
+        for count, (item, result) in enumerate(bounded_map(executor, fn, items, self.max_workers * 4), 1):
+            if self.cancelled():
+                return
+            if count % 500 == 0 or count == total:
+                self.status(f"{status} {count}/{total}", int(count / total * 100))
+            yield item, result
+
+    @staticmethod
+    def _collisions(buckets):
+        return [group for group in buckets.values() if len(group) > 1]
+
+    @staticmethod
+    def _mark(assets, duplicates):
+        for info in assets.values():
+            info.pop("duplicate_of", None)
+        for original, copies in duplicates.items():
+            for asset_id in copies:
+                assets[asset_id]["duplicate_of"] = original
@@ -1,10 +1,277 @@
-import OpenEXR
+import os
+import re
+import struct
+from fractions import Fraction
 
-class EXR_UTILS:
-    def __init__(self, path):
-        self.path = path
-    def run(self):
-        #exr_file = OpenEXR.InputFile(self.path)
-        print(self.path)
-        #return None
 
+# Pure Python OpenEXR header reader: only the header bytes are read and
+# parsed with struct, no OpenEXR/OpenImageIO needed and no subprocess.
+
+MAGIC = b'\x76\x2f\x31\x01'
+FLAG_TILED = 0x200
+FLAG_LONG_NAMES = 0x400
+FLAG_DEEP = 0x800
+FLAG_MULTIPART = 0x1000
+
+# Enough for any header without a preview image
+HEADER_READ = 64 * 1024
+MAX_HEADER = 16 * 1024 * 1024
+
+COMPRESSIONS = ['none', 'rle', 'zips', 'zip', 'piz', 'pxr24', 'b44', 'b44a', 'dwaa', 'dwab', 'htj2k']
+PIXEL_TYPES = ['uint', 'half', 'float']
+LINE_ORDERS = ['increasing_y', 'decreasing_y', 'random_y']
+
+# Attributes every EXR has (or that describe the file layout), not shown as custom metadata
+STANDARD_ATTRIBUTES = {
+    'channels', 'compression', 'dataWindow', 'displayWindow', 'lineOrder', 'pixelAspectRatio',
+    'screenWindowCenter', 'screenWindowWidth', 'tiles', 'type', 'name', 'version', 'chunkCount',
+    'view', 'preview', 'maxSamplesPerPixel',
+}
+# Well known custom attributes -> asset fields
+CUSTOM_FIELDS = {
+    'framesPerSecond': 'fps',
+    'timeCode': 'timecode',
+    'owner': 'owner',
+    'comments': 'comments',
+    'capDate': 'capture_date',
+}
+_MAX_STRING = 256
+
+
+class ExrError(ValueError):
+    pass
+
+
+class _Buffer:
+    """Header bytes of an open file, read in one go and grown only if a header is bigger"""
+
+    def __init__(self, f):
+        self.f = f
+        self.data = f.read(HEADER_READ)
+        self.pos = 0
+
+    def need(self, size):
+        end = self.pos + size
+        if end > len(self.data):
+            if end > MAX_HEADER:
+                raise ExrError("header too large")
+            more = self.f.read(max(end - len(self.data), len(self.data)))
+            if not more:
+                raise ExrError("truncated header")
+            self.data += more
+            if end > len(self.data):
+                raise ExrError("truncated header")
+
+    def take(self, size):
+        self.need(size)
+        value = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return value
+
+    def unpack(self, fmt):
+        return struct.unpack('<' + fmt, self.take(struct.calcsize('<' + fmt)))
+
+    def cstring(self):
+        while True:
+            end = self.data.find(b'\0', self.pos)
+            if end >= 0:
+                value = self.data[self.pos:end].decode('latin-1')
+                self.pos = end + 1
+                return value
+            self.need(len(self.data) - self.pos + 1)
+
+
+def read_header(path):
+    """Parse the header of an EXR file.
+
+    Returns {'version', 'flags', 'parts': [{attribute: value}], 'header_size'}.
+    Multi-part files list every part, single-part files have one.
+    """
+    with open(path, 'rb') as f:
+        buffer = _Buffer(f)
+        if buffer.take(4) != MAGIC:
+            raise ExrError(f"not an EXR file: {path}")
+        version, = buffer.unpack('i')
+        flags = version & ~0xff
+        parts = []
+        while True:
+            part = _read_attributes(buffer)
+            if part is None:
+                # Empty header: end of the multi-part header list
+                break
+            parts.append(part)
+            if not flags & FLAG_MULTIPART:
+                break
+    if not parts:
+        raise ExrError(f"no header in {path}")
+    return {'version': version & 0xff, 'flags': flags, 'parts': parts, 'header_size': buffer.pos}
+
+
+def _read_attributes(buffer):
+    attributes = {}
+    while True:
+        name = buffer.cstring()
+        if not name:
+            return attributes or None
+        type_name = buffer.cstring()
+        size, = buffer.unpack('i')
+        if size < 0:
+            raise ExrError(f"bad size for attribute {name}")
+        if type_name == 'preview':
+            # Thumbnail pixels, possibly large: skip without keeping them
+            buffer.take(size)
+            continue
+        attributes[name] = _decode(type_name, buffer.take(size))
+
+
+def _decode(type_name, data):
+    """Value of an attribute, None for types that are not decoded"""
+    try:
+        if type_name == 'chlist':
+            return _decode_channels(data)
+        if type_name == 'box2i':
+            return struct.unpack('<4i', data)
+        if type_name == 'box2f':
+            return struct.unpack('<4f', data)
+        if type_name == 'compression':
+            return COMPRESSIONS[data[0]] if data[0] < len(COMPRESSIONS) else str(data[0])
+        if type_name == 'lineOrder':
+            return LINE_ORDERS[data[0]] if data[0] < len(LINE_ORDERS) else str(data[0])
+        if type_name in ('envmap', 'deepImageState'):
+            return data[0]
+        if type_name == 'int':
+            return struct.unpack('<i', data)[0]
+        if type_name == 'float':
+            return struct.unpack('<f', data)[0]
+        if type_name == 'double':
+            return struct.unpack('<d', data)[0]
+        if type_name == 'string':
+            return data.decode('utf-8', 'replace')
+        if type_name == 'stringvector':
+            strings = []
+            pos = 0
+            while pos + 4 <= len(data):
+                length, = struct.unpack_from('<i', data, pos)
+                strings.append(data[pos + 4:pos + 4 + length].decode('utf-8', 'replace'))
+                pos += 4 + length
+            return strings
+        if type_name == 'rational':
+            numerator, denominator = struct.unpack('<iI', data)
+            return Fraction(numerator, denominator) if denominator else None
+        if type_name == 'timecode':
+            return _decode_timecode(struct.unpack('<2I', data)[0])
+        if type_name in ('v2i', 'v3i'):
+            return struct.unpack(f'<{len(data) // 4}i', data)
+        if type_name in ('v2f', 'v3f', 'm33f', 'm44f', 'chromaticities'):
+            return struct.unpack(f'<{len(data) // 4}f', data)
+        if type_name in ('v2d', 'v3d', 'm33d', 'm44d'):
+            return struct.unpack(f'<{len(data) // 8}d', data)
+        if type_name == 'tiledesc':
+            width, height, mode = struct.unpack('<IIB', data)
+            return (width, height, mode)
+    except (struct.error, IndexError, ValueError):
+        return None
+    return None
+
+
+def _decode_channels(data):
+    """[(name, pixel type, x sampling, y sampling)] in file (alphabetical) order"""
+    channels = []
+    pos = 0
+    while pos < len(data) and data[pos] != 0:
+        end = data.index(b'\0', pos)
+        name = data[pos:end].decode('latin-1')
+        pixel_type, _, x_sampling, y_sampling = struct.unpack_from('<iB3xii', data, end + 1)
+        channels.append((name, PIXEL_TYPES[pixel_type] if 0 <= pixel_type < 3 else str(pixel_type),
+                         x_sampling, y_sampling))
+        pos = end + 1 + 16
+    return channels
+
+
+def _decode_timecode(value):
+    """SMPTE 'HH:MM:SS:FF' from the packed BCD time-and-flags word"""
+    def bcd(shift, tens_bits):
+        return ((value >> (shift + 4)) & ((1 << tens_bits) - 1)) * 10 + ((value >> shift) & 0xf)
+    drop_frame = ';' if value & (1 << 6) else ':'
+    return f"{bcd(24, 2):02d}:{bcd(16, 3):02d}:{bcd(8, 3):02d}{drop_frame}{bcd(0, 2):02d}"
+
+
+def _channel_order(name):
+    # Like iinfo: R, G, B, A first, then the rest as stored
+    layer, _, base = name.rpartition('.')
+    return (layer, {'R': 0, 'G': 1, 'B': 2, 'A': 3}.get(base, 4))
+
+
+def header_metadata(header):
+    """Asset fields from a parsed header (first part, plus the part count)"""
+    part = header['parts'][0]
+    fields = {'format': 'openexr'}
+
+    data_window = part.get('dataWindow')
+    if data_window:
+        x_min, y_min, x_max, y_max = data_window
+        fields['resolution'] = f"{x_max - x_min + 1}x{y_max - y_min + 1}"
+    display_window = part.get('displayWindow')
+    if display_window and display_window != data_window:
+        x_min, y_min, x_max, y_max = display_window
+        fields['display_resolution'] = f"{x_max - x_min + 1}x{y_max - y_min + 1}"
+
+    channels = sorted(part.get('channels') or [], key=lambda channel: _channel_order(channel[0]))
+    if channels:
+        fields['channels'] = ", ".join(channel[0] for channel in channels)
+        fields['channel_count'] = len(channels)
+        fields['bit_depth'] = "/".join(dict.fromkeys(channel[1] for channel in channels))
+    if part.get('compression'):
+        fields['compression'] = part['compression']
+    if part.get('pixelAspectRatio') is not None:
+        fields['pixel_aspect'] = round(part['pixelAspectRatio'], 4)
+    if part.get('tiles') or header['flags'] & FLAG_TILED:
+        fields['tiled'] = True
+    if header['flags'] & FLAG_DEEP:
+        fields['deep'] = True
+    if len(header['parts']) > 1:
+        fields['parts'] = len(header['parts'])
+
+    for name, value in part.items():
+        if name in STANDARD_ATTRIBUTES or value is None:
+            continue
+        if isinstance(value, Fraction):
+            value = round(float(value), 3)
+        elif isinstance(value, list):
+            value = ", ".join(value)
+        elif not isinstance(value, (str, int, float)):
+            # Vectors and matrices (camera transforms...) are not useful as text
+            continue
+        if isinstance(value, str):
+            value = value[:_MAX_STRING]
+        fields[CUSTOM_FIELDS.get(name) or 'exr_' + _snake_case(name)] = value
+    return fields
+
+
+def _snake_case(name):
+    name = re.sub(r'(?<=[a-z0-9])(?=[A-Z])', '_', name)
+    return re.sub(r'\W+', '_', name).strip('_').lower()
+
+
+def validate_frame(path, reference):
+    """Cheap check of a later frame against the first one's parsed header:
+    same magic and version, and more than a header's worth of bytes."""
+    try:
+        with open(path, 'rb') as f:
+            start = f.read(8)
+            size = os.fstat(f.fileno()).st_size
+    except OSError:
+        return False
+    if len(start) < 8 or start[:4] != MAGIC:
+        return False
+    version, = struct.unpack('<i', start[4:])
+    return (version & 0xff == reference['version'] and version & ~0xff == reference['flags']
+            and size > reference['header_size'])
+
+
+def read_sequence(paths):
+    """Metadata of a frame sequence: the first frame is parsed fully, the
+    others only validated. Returns (fields, invalid frame paths)."""
+    header = read_header(paths[0])
+    invalid = [path for path in paths[1:] if not validate_frame(path, header)]
+    return header_metadata(header), invalid
@@ -0,0 +1,362 @@
+import os
+import time
+import socket
+import threading
+import traceback
+
+from support_files.diagnostics import metrics
+from support_files.library import db_path, load_json, save_json, share_time, without_older_versions
+
+
+# Render farm mode: the browser or the headless indexer queues jobs (a batch
+# of assets each) under .db/farm, worker processes on any host sharing the
+# library claim them, write the thumbnails into .db/thumbnails and commit
+# the thumbnail names, hashes and metadata back as result files, which the
+# browser/indexer merges into the database.
+#
+#   pending/<job>~<attempt>.json            waiting for a worker
+#   claimed/<job>~<attempt>@<worker>.json   leased, mtime = last heartbeat
+#   done/<job>.json                         results, until collected
+#   failed/<job>.json                       gave up after max_attempts
+#
+# Claiming is a rename from pending/ to claimed/, which exactly one worker
+# wins, also on network shares. Workers touch their claim while they work;
+# a claim not touched for `lease` seconds belongs to a dead worker and goes
+# back to pending/ with the next attempt number. Jobs are idempotent (same
+# thumbnail names, same metadata), so a worker that lost its lease still
+# commits and at worst a job runs twice.
+
+FARM_FOLDER = 'farm'
+STATES = ('pending', 'claimed', 'done', 'failed')
+# Asset fields jobs don't carry: results, and duplicates (found per library, a job converts every asset it gets)
+LOCAL_KEYS = ('thumbnail', 'phash', 'duplicate_of')
+
+
+def worker_name():
+    """host-pid, unique across the machines sharing a library"""
+    host = socket.gethostname().split('.')[0] or 'host'
+    return ''.join(c if c.isalnum() or c in '-_' else '-' for c in f"{host}-{os.getpid()}")
+
+
+def relative_path(root, path):
+    """Asset path as stored in jobs: relative to the library, '/' separated
+    (hosts mount the library in different places)"""
+    return os.path.relpath(path, root).replace(os.sep, '/')
+
+
+def local_path(root, relative):
+    return os.path.join(root, *relative.split('/'))
+
+
+def farm_candidates(database):
+    """Assets worth sending to the farm: the heads of version stacks without a thumbnail"""
+    return {asset_id: info for asset_id, info in without_older_versions(database).items()
+            if not info.get('thumbnail')}
+
+
+def collect_results(root, database):
+    """Merge the committed farm results into `database`, returns {id: fields} of what changed"""
+    updates = FarmQueue(root).collect(db_path(root, 'thumbnails'))
+    updates = {asset_id: fields for asset_id, fields in updates.items() if asset_id in database}
+    for asset_id, fields in updates.items():
+        database[asset_id].update(fields)
+    return updates
+
+
+def _parse(filename):
+    """(job id, attempt, worker) of a queue file name"""
+    stem = filename[:-len('.json')]
+    stem, _, worker = stem.partition('@')
+    job_id, _, attempt = stem.rpartition('~')
+    return job_id, int(attempt or 0), worker or None
+
+
+class FarmLease:
+    """A claimed job: keep it alive with renew(), end it with commit() or release()"""
+
+    def __init__(self, queue, path, job):
+        self.queue = queue
+        self.path = path
+        self.job = job
+        self.id, self.attempt, self.worker = _parse(os.path.basename(path))
+
+    def renew(self):
+        """Heartbeat, False if the lease expired and was taken back"""
+        try:
+            os.utime(self.path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def commit(self, results):
+        """Store the results of the job and drop the claim"""
+        save_json(self.queue.path('done', self.id + '.json'),
+                  {'id': self.id, 'worker': self.worker, 'finished': time.time(), 'results': results})
+        self._drop()
+        metrics.count('farm.committed')
+
+    def release(self, error=None):
+        """Give the job back: as is when interrupted, as a failed attempt with an `error`"""
+        attempt = self.attempt + 1 if error else self.attempt
+        if error:
+            print(f"Farm job {self.id} failed (attempt {attempt}/{self.queue.max_attempts}): {error}")
+        self.queue.requeue(self.path, attempt, error)
+
+    def _drop(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass  # lease lost meanwhile, the requeued copy is dropped by collect()
+
+
+class FarmQueue:
+    """The job queue of a library's .db/farm folder, see the layout above"""
+
+    # Seconds without heartbeat before a claim is considered dead
+    lease = 300
+    # Claims (dead workers or errors) before a job goes to failed/
+    max_attempts = 3
+
+    def __init__(self, root, lease=None):
+        self.root = root
+        self.folder = db_path(root, FARM_FOLDER)
+        if lease:
+            self.lease = lease
+        for state in STATES:
+            os.makedirs(os.path.join(self.folder, state), exist_ok=True)
+
+    def path(self, state, filename=''):
+        return os.path.join(self.folder, state, filename)
+
+    def files(self, state):
+        try:
+            return sorted(name for name in os.listdir(self.path(state)) if name.endswith('.json'))
+        except FileNotFoundError:
+            return []
+
+    def counts(self):
+        return {state: len(self.files(state)) for state in STATES}
+
+    def queued_ids(self):
+        """Asset ids of the jobs waiting or running"""
+        ids = set()
+        for state in ('pending', 'claimed'):
+            for name in self.files(state):
+                job = load_json(self.path(state, name))
+                if job:
+                    ids.update(job.get('assets', {}))
+        return ids
+
+    def submit(self, assets, batch_size=32):
+        """Queue {id: info} in jobs of `batch_size` assets, skipping the ones
+        already queued. Returns the number of jobs written."""
+        queued = self.queued_ids()
+        items = [(asset_id, info) for asset_id, info in assets.items()
+                 if asset_id not in queued and info.get('path')]
+        prefix = f"{time.strftime('%Y%m%d-%H%M%S')}-{worker_name()}"
+        count = 0
+        for start in range(0, len(items), batch_size):
+            job_id = f"{prefix}-{start // batch_size:05d}"
+            job = {'id': job_id, 'created': time.time(), 'assets': {}}
+            for asset_id, info in items[start:start + batch_size]:
+                fields = {key: value for key, value in info.items() if key not in LOCAL_KEYS}
+                fields['path'] = relative_path(self.root, info['path'])
+                job['assets'][asset_id] = fields
+            # Written next to the queue, then renamed in: workers never see half a job
+            save_json(self.path('pending', f"{job_id}~0.json"), job)
+            count += 1
+        metrics.count('farm.submitted', count)
+        return count
+
+    def claim(self, worker):
+        """Lease the oldest pending job, None if there is none"""
+        for name in self.files('pending'):
+            job_id, attempt, _ = _parse(name)
+            claimed = self.path('claimed', f"{job_id}~{attempt}@{worker}.json")
+            try:
+                os.rename(self.path('pending', name), claimed)
+                # The rename keeps the mtime of the submission: the lease starts now
+                os.utime(claimed)
+            except FileNotFoundError:
+                continue  # another worker was faster (or took it back as expired right away)
+            job = load_json(claimed)
+            if job is None:
+                FarmLease(self, claimed, None).release('unreadable job file')
+                continue
+            metrics.count('farm.claimed')
+            return FarmLease(self, claimed, job)
+        return None
+
+    def requeue(self, claimed_path, attempt, error=None):
+        """Move a claim back to pending/ (failed/ once out of attempts); False if it was gone"""
+        job_id, _, _ = _parse(os.path.basename(claimed_path))
+        if attempt >= self.max_attempts:
+            target = self.path('failed', job_id + '.json')
+        else:
+            target = self.path('pending', f"{job_id}~{attempt}.json")
+        try:
+            os.rename(claimed_path, target)
+        except FileNotFoundError:
+            return False
+        if error and attempt >= self.max_attempts:
+            job = load_json(target, {})
+            job['error'] = error
+            save_json(target, job)
+            metrics.count('farm.failed')
+        return True
+
+    def requeue_expired(self):
+        """Claims without heartbeat for `lease` seconds go back to pending/. Returns how many."""
+        # Compared with mtimes the share wrote, not this host's (possibly skewed) clock
+        now = share_time(self.folder)
+        count = 0
+        for name in self.files('claimed'):
+            path = self.path('claimed', name)
+            try:
+                expired = now - os.stat(path).st_mtime > self.lease
+            except FileNotFoundError:
+                continue
+            if expired:
+                job_id, attempt, worker = _parse(name)
+                print(f"Farm lease of {job_id} by {worker} expired, requeued")
+                if self.requeue(path, attempt + 1, f"lease of {worker} expired"):
+                    count += 1
+        metrics.count('farm.expired', count)
+        return count
+
+    def collect(self, thumbnails_folder):
+        """{asset id: fields} of the committed jobs, removed from the queue.
+
+        Thumbnail names are resolved to `thumbnails_folder`; thumbnails this
+        host can't see (yet) are left out.
+        """
+        updates = {}
+        finished = set()
+        for name in self.files('done'):
+            path = self.path('done', name)
+            job = load_json(path)
+            if job is None:
+                continue
+            for asset_id, fields in job.get('results', {}).items():
+                fields = dict(fields)
+                thumbnail = fields.pop('thumbnail', None)
+                if thumbnail:
+                    thumbnail = os.path.join(thumbnails_folder, thumbnail)
+                    if os.path.exists(thumbnail):
+                        fields['thumbnail'] = thumbnail
+                if fields:
+                    updates[asset_id] = fields
+            finished.add(job.get('id'))
+            os.remove(path)
+        # Copies requeued after a lost lease have nothing left to do
+        for name in self.files('pending'):
+            if _parse(name)[0] in finished:
+                try:
+                    os.remove(self.path('pending', name))
+                except FileNotFoundError:
+                    pass
+        metrics.count('farm.collected', len(updates))
+        return updates
+
+
+class FarmWorker:
+    """Works through a library's farm queue: claim a job, thumbnails and
+    metadata of its assets, commit, next. Any number of them may run, on
+    any host that mounts the library (at whatever path).
+    """
+
+    def __init__(self, root, name=None, max_workers=None, hasher=None, lease=None, poll=5.0,
+                 status=None, cancelled=None):
+        self.queue = FarmQueue(root, lease)
+        self.root = root
+        self.name = name or worker_name()
+        self.max_workers = max_workers
+        # Perceptual hash of thumbnail files: paths -> ints, skipped if None
+        self.hasher = hasher
+        # Seconds between looks at an empty queue
+        self.poll = poll
+        self.status = status or (lambda text, percent: None)
+        self.cancelled = cancelled or (lambda: False)
+
+    def run(self, drain=False):
+        """Process jobs until cancelled, or with `drain` until nothing is
+        pending or claimed any more. Returns the number of jobs done."""
+        done = 0
+        while not self.cancelled():
+            self.queue.requeue_expired()
+            lease = self.queue.claim(self.name)
+            if lease is None:
+                counts = self.queue.counts()
+                if drain and not counts['pending'] and not counts['claimed']:
+                    break
+                # Others' claims finish or expire meanwhile
+                time.sleep(min(self.poll, self.queue.lease / 3))
+                continue
+            if self._work(lease):
+                done += 1
+        return done
+
+    def _work(self, lease):
+        """Run one leased job with a heartbeat, True if it was committed"""
+        print(f"{self.name}: job {lease.id} ({len(lease.job.get('assets', {}))} assets, attempt {lease.attempt + 1})")
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(self.queue.lease / 3):
+                if not lease.renew():
+                    print(f"{self.name}: lease of {lease.id} expired, finishing it anyway")
+                    return
+
+        beat = threading.Thread(target=heartbeat, daemon=True)
+        beat.start()
+        try:
+            with metrics.timer('farm.job'):
+                results = self.process(lease.job)
+        except KeyboardInterrupt:
+            lease.release()
+            raise
+        except Exception as e:
+            traceback.print_exc()
+            lease.release(str(e) or type(e).__name__)
+            return False
+        finally:
+            stop.set()
+            beat.join()
+        if self.cancelled():
+            lease.release()
+            return False
+        lease.commit(results)
+        return True
+
+    def process(self, job):
+        """{asset id: fields} for the assets of a job: thumbnail file name, phash and metadata"""
+        # Imported here: a worker host only needs them once it has a job
+        from support_files.metadata import MetadataExtractor
+        from support_files.thumbnails import ThumbnailGenerator
+
+        assets = {asset_id: dict(info, path=local_path(self.root, info['path']))
+                  for asset_id, info in job.get('assets', {}).items()}
+        thumbnails_folder = db_path(self.root, 'thumbnails')
+        os.makedirs(thumbnails_folder, exist_ok=True)
+        # Duplicates are found across the whole library by the browser, not per job
+        ThumbnailGenerator(thumbnails_folder, assets, self.max_workers, find_duplicates=False,
+                           hasher=self.hasher, status=self.status, cancelled=self.cancelled).run()
+
+        metadata = {}
+
+        def merge(updates):
+            for asset_id, fields in updates.items():
+                metadata.setdefault(asset_id, {}).update(fields)
+        # No cache: every host would rewrite the shared one
+        MetadataExtractor(assets, None, self.max_workers, status=self.status, cancelled=self.cancelled,
+                          on_batch=merge).run()
+
+        results = {}
+        for asset_id, info in assets.items():
+            fields = metadata.get(asset_id, {})
+            if info.get('thumbnail'):
+                fields['thumbnail'] = os.path.basename(info['thumbnail'])
+            if info.get('phash'):
+                fields['phash'] = info['phash']
+            results[asset_id] = fields
+        return results
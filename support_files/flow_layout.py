@@ -1,79 +0,0 @@
-# flow_layout.py
-from PyQt5.QtWidgets import QLayout, QSizePolicy
-from PyQt5.QtCore import Qt, QRect, QPoint, QSize
-
-class FlowLayout(QLayout):
-    def __init__(self, parent=None, margin=0, spacing=10):
-        super(FlowLayout, self).__init__(parent)
-        self.itemList = []
-        self.setContentsMargins(margin, margin, margin, margin)
-        self.setSpacing(spacing)
-
-    def clear(self):
-        """Remove and delete all widgets from the layout."""
-        while self.count():
-            item = self.takeAt(0)
-            widget = item.widget()
-            if widget is not None:
-                widget.setParent(None)  # remove from layout
-                widget.deleteLater()
-            elif item.layout() is not None:
-                item.layout().clear()
-
-    def addItem(self, item):
-        self.itemList.append(item)
-
-    def count(self):
-        return len(self.itemList)
-
-    def itemAt(self, index):
-        return self.itemList[index] if 0 <= index < len(self.itemList) else None
-
-    def takeAt(self, index):
-        return self.itemList.pop(index) if 0 <= index < len(self.itemList) else None
-
-    def expandingDirections(self):
-        return Qt.Orientations(Qt.Orientation(0))
-
-    def hasHeightForWidth(self):
-        return True
-
-    def heightForWidth(self, width):
-        return self.doLayout(QRect(0, 0, width, 0), True)
-
-    def setGeometry(self, rect):
-        super(FlowLayout, self).setGeometry(rect)
-        self.doLayout(rect, False)
-
-    def sizeHint(self):
-        return self.minimumSize()
-
-    def minimumSize(self):
-        size = QSize()
-        for item in self.itemList:
-            size = size.expandedTo(item.minimumSize())
-        size += QSize(2 * self.contentsMargins().top(), 2 * self.contentsMargins().top())
-        return size
-
-    def doLayout(self, rect, testOnly):
-        x, y = rect.x(), rect.y()
-        lineHeight = 0
-
-        for item in self.itemList:
-            wid = item.widget()
-            spaceX = self.spacing()
-            spaceY = self.spacing()
-            nextX = x + item.sizeHint().width() + spaceX
-            if nextX - spaceX > rect.right() and lineHeight > 0:
-                x = rect.x()
-                y = y + lineHeight + spaceY
-                nextX = x + item.sizeHint().width() + spaceX
-                lineHeight = 0
-
-            if not testOnly:
-                item.setGeometry(QRect(QPoint(x, y), item.sizeHint()))
-
-            x = nextX
-            lineHeight = max(lineHeight, item.sizeHint().height())
-
-        return y + lineHeight - rect.y()
@@ -0,0 +1,135 @@
+import string
+
+
+# Fuzzy matching for the `~` search mode, used by SearchIndex.fuzzy_search.
+# fzf v1 style scoring:
+SCORE_MATCH = 16
+PENALTY_GAP_START = -3
+PENALTY_GAP_EXTENSION = -1
+BONUS_BOUNDARY = 8
+BONUS_TRANSITION = 6  # letter <-> digit, e.g. the 0 in 'v012'
+BONUS_CONSECUTIVE = 4
+BONUS_FIRST_CHAR_MULTIPLIER = 2
+
+_NON_WORD, _LETTER, _DIGIT = range(3)
+_SIGNATURE_BITS = {c: 1 << i for i, c in enumerate(string.ascii_lowercase + string.digits)}
+
+
+def _char_class(ch):
+    if ch.isdigit():
+        return _DIGIT
+    if ch.isalpha():
+        return _LETTER
+    return _NON_WORD
+
+
+def _bonus(prev_class, char_class):
+    if char_class == _NON_WORD:
+        return 0
+    if prev_class == _NON_WORD:
+        return BONUS_BOUNDARY
+    if prev_class != char_class:
+        return BONUS_TRANSITION
+    return 0
+
+
+def fuzzy_score(pattern, text):
+    """Score `pattern` as a subsequence of `text` (both lowercase), None if it is not one.
+
+    Like fzf's v1 algorithm: find the leftmost match, shrink it backwards to
+    the shortest window ending there, then score that window. Matches at
+    word starts and consecutive runs score higher, gaps cost a little.
+    """
+    if not pattern:
+        return 0
+    # Forward pass: leftmost end of a full match
+    pi = 0
+    start = end = -1
+    for i, ch in enumerate(text):
+        if ch == pattern[pi]:
+            if start < 0:
+                start = i
+            pi += 1
+            if pi == len(pattern):
+                end = i + 1
+                break
+    if end < 0:
+        return None
+
+    # Backward pass: shortest window ending at `end`
+    pi = len(pattern) - 1
+    for i in range(end - 1, start - 1, -1):
+        if text[i] == pattern[pi]:
+            pi -= 1
+            if pi < 0:
+                start = i
+                break
+
+    score = 0
+    pi = 0
+    in_gap = False
+    consecutive = 0
+    first_bonus = 0
+    prev_class = _char_class(text[start - 1]) if start > 0 else _NON_WORD
+    for i in range(start, end):
+        ch = text[i]
+        char_class = _char_class(ch)
+        if ch == pattern[pi]:
+            score += SCORE_MATCH
+            bonus = _bonus(prev_class, char_class)
+            if consecutive == 0:
+                first_bonus = bonus
+            else:
+                # A run keeps the bonus of the boundary it started on
+                if bonus >= BONUS_BOUNDARY and bonus > first_bonus:
+                    first_bonus = bonus
+                bonus = max(bonus, first_bonus, BONUS_CONSECUTIVE)
+            score += bonus * BONUS_FIRST_CHAR_MULTIPLIER if pi == 0 else bonus
+            in_gap = False
+            consecutive += 1
+            pi += 1
+        else:
+            score += PENALTY_GAP_EXTENSION if in_gap else PENALTY_GAP_START
+            in_gap = True
+            consecutive = 0
+            first_bonus = 0
+        prev_class = char_class
+    return score
+
+
+def edit_distance(a, b, max_distance):
+    """Edit distance with transpositions (optimal string alignment).
+
+    Returns max_distance + 1 as soon as the distance is known to exceed it.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    before = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before[j - 2] + 1)
+            current[j] = value
+        if min(current) > max_distance:
+            return max_distance + 1
+        before, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+def typo_budget(word):
+    """How many edits the fallback allows for a query word (none for short ones)"""
+    if len(word) < 4:
+        return 0
+    return 1 if len(word) < 8 else 2
+
+
+def char_signature(text):
+    """Bit per letter/digit present in `text`, for vectorized candidate pruning"""
+    signature = 0
+    for ch in set(text):
+        signature |= _SIGNATURE_BITS.get(ch, 0)
+    return signature
@@ -0,0 +1,125 @@
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import Qt, QSize, QRect
+from PyQt5.QtGui import QColor, QPainter
+
+from support_files.asset_model import AssetModel
+from support_files.diagnostics import metrics
+from support_files.workers import thumbnail_loader, rounded_tile_path
+
+
+class AssetGridDelegate(QtWidgets.QStyledItemDelegate):
+    """Paints one grid tile (rounded thumbnail + name) straight from the model"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tile_width = 160
+        self.tile_height = 90
+        self.text_height = 22
+        # Same meaning as OptimizedTableDelegate.resizing
+        self.resizing = False
+        self._outline = None
+
+    def tile_size(self):
+        return QSize(self.tile_width, self.tile_height)
+
+    def tile_outline(self):
+        """Rounded outline for the current tile size (placeholder and selection)"""
+        if self._outline is None or self._outline[0] != (self.tile_width, self.tile_height):
+            self._outline = ((self.tile_width, self.tile_height),
+                             rounded_tile_path(self.tile_width, self.tile_height))
+        return self._outline[1]
+
+    def sizeHint(self, option, index):
+        return QSize(self.tile_width, self.tile_height + self.text_height)
+
+    def paint(self, painter, option, index):
+        with metrics.timer('paint.grid_tile'):
+            self._paint(painter, option, index)
+
+    def _paint(self, painter, option, index):
+        painter.save()
+
+        tile = QRect(option.rect.x(), option.rect.y(), self.tile_width, self.tile_height)
+
+        thumbnail_path = index.sibling(index.row(), AssetModel.THUMBNAIL).data(Qt.DisplayRole)
+        pixmap = None
+        if thumbnail_path:
+            # Finished tiles (scaled, cropped, rounded off-thread) come from the cache
+            pixmap = thumbnail_loader().request(thumbnail_path, self.tile_size(), tile=True,
+                                                reload=not self.resizing)
+
+        if pixmap is not None and not pixmap.isNull():
+            if pixmap.size() == tile.size():
+                painter.drawPixmap(tile.topLeft(), pixmap)
+            else:
+                # Tile size is still settling, let the painter scale the cached tile
+                painter.drawPixmap(tile, pixmap)
+        else:
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.translate(tile.topLeft())
+            painter.fillPath(self.tile_outline(), QColor('#000'))
+            painter.translate(-tile.topLeft())
+            painter.setPen(QColor('white'))
+            text = "Loading..." if thumbnail_path and not thumbnail_loader().failed(thumbnail_path) else "No Image"
+            painter.drawText(tile, Qt.AlignCenter, text)
+
+        if option.state & QtWidgets.QStyle.State_Selected:
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(option.palette.highlight().color())
+            painter.translate(tile.topLeft())
+            painter.drawPath(self.tile_outline())
+            painter.translate(-tile.topLeft())
+
+        # Info text
+        text_rect = QRect(tile.x(), tile.bottom() + 1, self.tile_width, self.text_height)
+        name = index.data(Qt.DisplayRole) or ''
+        painter.setPen(option.palette.text().color())
+        elided = option.fontMetrics.elidedText(name, Qt.ElideMiddle, text_rect.width() - 4)
+        painter.drawText(text_rect, Qt.AlignCenter, elided)
+
+        painter.restore()
+
+
+class AssetGridView(QtWidgets.QListView):
+    """Grid of asset tiles backed by the same AssetModel as the table.
+
+    Every tile has the same size, so QListView lays the grid out from the
+    grid size alone and only the tiles inside the viewport get painted.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.spacing = 10
+
+        self.setViewMode(QtWidgets.QListView.IconMode)
+        self.setMovement(QtWidgets.QListView.Static)
+        self.setResizeMode(QtWidgets.QListView.Adjust)
+        self.setFlow(QtWidgets.QListView.LeftToRight)
+        self.setWrapping(True)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QtWidgets.QListView.Batched)
+        self.setBatchSize(1000)
+        self.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        self.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollPerPixel)
+        self.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.setDragEnabled(True)
+        self.setDragDropMode(QtWidgets.QAbstractItemView.DragOnly)
+
+        self.delegate = AssetGridDelegate(self)
+        self.setItemDelegate(self.delegate)
+        self.set_tile_size(self.delegate.tile_width, self.delegate.tile_height)
+
+        thumbnail_loader().thumbnail_ready.connect(self.viewport().update)
+
+    def setModel(self, model):
+        super().setModel(model)
+        # Tiles show the name column, the thumbnail is read from its sibling
+        self.setModelColumn(AssetModel.NAME)
+
+    def set_tile_size(self, width, height):
+        """Resize every tile at once (one grid size, no per-item work)"""
+        self.delegate.tile_width = max(16, int(width))
+        self.delegate.tile_height = max(9, int(height))
+        hint = self.delegate.sizeHint(None, None)
+        self.setGridSize(QSize(hint.width() + self.spacing, hint.height() + self.spacing))
+        self.viewport().update()
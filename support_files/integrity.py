@@ -0,0 +1,49 @@
+# A frame smaller than this fraction of its sequence's median size is
+# flagged as short (render node crashed mid-write). Black or empty frames
+# legitimately compress a lot, so only far-off outliers count.
+SHORT_FRAME_RATIO = 0.1
+# Asset fields written by the integrity pass ('' when the sequence is clean)
+INTEGRITY_KEYS = ('missing_frames', 'short_frames')
+# Everything that points at broken frames, 'corrupt_frames' comes from the EXR header check
+FRAME_PROBLEM_KEYS = INTEGRITY_KEYS + ('corrupt_frames',)
+
+
+def frame_ranges(frames):
+    """Compact text for a set of frame numbers: [1, 2, 3, 7, 9, 10] -> '1-3,7,9-10'"""
+    # Imported here: the scanner and the browser load this module at startup, numpy isn't needed yet
+    import numpy as np
+    frames = np.unique(np.asarray(frames, dtype=np.int64))
+    if not len(frames):
+        return ''
+    breaks = np.flatnonzero(np.diff(frames) > 1)
+    starts = frames[np.concatenate(([0], breaks + 1))]
+    ends = frames[np.concatenate((breaks, [len(frames) - 1]))]
+    return _range_text(starts, ends)
+
+
+def _range_text(starts, ends):
+    return ','.join(str(start) if start == end else f"{start}-{end}"
+                    for start, end in zip(starts.tolist(), ends.tolist()))
+
+
+def sequence_integrity(frames, sizes):
+    """Missing and short frames of a sequence from its frame numbers and file sizes.
+
+    Only uses sizes the scanner already stat'ed, no frame data is read.
+    Returns {'missing_frames': ranges, 'short_frames': ranges}.
+    """
+    import numpy as np
+    frames = np.asarray(frames, dtype=np.int64)
+    sizes = np.asarray(sizes, dtype=np.int64)
+    order = np.argsort(frames, kind='stable')
+    frames, sizes = frames[order], sizes[order]
+
+    # Gaps between consecutive frames, kept as ranges so huge gaps stay cheap
+    gaps = np.flatnonzero(np.diff(frames) > 1)
+    missing = _range_text(frames[gaps] + 1, frames[gaps + 1] - 1) if len(gaps) else ''
+
+    short = ''
+    if len(sizes):
+        median = np.median(sizes)
+        short = frame_ranges(frames[(sizes < median * SHORT_FRAME_RATIO) | (sizes == 0)])
+    return {'missing_frames': missing, 'short_frames': short}
@@ -0,0 +1,190 @@
+import os
+import time
+import threading
+import traceback
+
+from PyQt5.QtCore import QObject, QRunnable, QThread, QThreadPool, Qt, pyqtSignal
+
+from support_files.diagnostics import metrics
+
+
+# QThreadPool priorities: higher starts first
+LOW, NORMAL, HIGH = -1, 0, 1
+
+
+class CancelToken:
+    """Cooperative cancellation flag, cancelled as well when its parent is.
+
+    Calling the token tells whether it is cancelled, so it can be handed
+    directly as the `cancelled` callback of the Qt-free classes
+    (LibraryScanner, ThumbnailGenerator, MetadataExtractor...).
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def cancelled(self):
+        return self._event.is_set() or (self.parent is not None and self.parent.cancelled())
+
+    __call__ = cancelled
+
+
+class Job(QObject):
+    """A unit of background work run by JobScheduler.
+
+    Subclasses implement run() and declare their own result signals. `pool`
+    picks the shared pool ('cpu' for Python work, 'io' for disk scans and
+    jobs waiting on external processes), `priority` the order among queued
+    jobs. run() checks `self.cancelled()` between steps; `finished` is
+    always sent, also for jobs cancelled or failed.
+    """
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+    _drained = pyqtSignal()
+    # Sent after `finished`, the scheduler lets go of the job once its slots have run
+    _released = pyqtSignal(object)
+
+    pool = 'io'
+    priority = NORMAL
+    # Streamed results (see post) allowed to wait for the GUI thread at once
+    max_backlog = 64
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.token = CancelToken()
+        self.done = False
+        self._backlog = 0
+        self._backlog_changed = threading.Condition()
+        self._drained.connect(self._on_drained, Qt.QueuedConnection)
+
+    def run(self):
+        raise NotImplementedError
+
+    def cancel(self):
+        self.token.cancel()
+
+    def cancelled(self):
+        return self.token.cancelled()
+
+    def post(self, signal, *args):
+        """Emit a result signal with backpressure.
+
+        Blocks while `max_backlog` earlier posts are still queued for the
+        GUI thread, so a fast job can't flood its event loop. Run on the
+        job's own thread (a direct run() call) it is a plain emit.
+        """
+        if QThread.currentThread() is self.thread():
+            signal.emit(*args)
+            return
+        with self._backlog_changed:
+            while self._backlog >= self.max_backlog and not self.cancelled():
+                self._backlog_changed.wait(0.05)
+            self._backlog += 1
+        signal.emit(*args)
+        # Queued behind the signal: delivered once its slots have run
+        self._drained.emit()
+
+    def _on_drained(self):
+        with self._backlog_changed:
+            self._backlog -= 1
+            self._backlog_changed.notify()
+
+
+class _JobRunnable(QRunnable):
+    def __init__(self, job, queued):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.job = job
+        self.queued = queued
+
+    def run(self):
+        job = self.job
+        name = type(job).__name__
+        started = time.perf_counter()
+        metrics.record('jobs.queue_wait', self.queued, started, job=name)
+        try:
+            # Cancelled while queued: nothing to do
+            if not job.cancelled():
+                job.run()
+        except Exception as e:
+            # Errors of a cancelled job (e.g. at exit) don't matter
+            if not job.cancelled():
+                traceback.print_exc()
+                job.failed.emit(f"{name}: {e}")
+        metrics.record('jobs.run', started, time.perf_counter(), job=name)
+        job.done = True
+        try:
+            job.finished.emit()
+            job._released.emit(job)
+        except RuntimeError:
+            pass  # the interpreter is exiting and already deleted the job
+
+
+class JobScheduler(QObject):
+    """Runs Jobs on two shared pools, 'cpu' sized to the cores and 'io' for
+    disk and process bound work. Cancelling never blocks: jobs notice their
+    token at their next check and finish on their own."""
+
+    def __init__(self, cpu_threads=None, io_threads=None, parent=None):
+        super().__init__(parent)
+        cpus = os.cpu_count() or 2
+        self.pools = {'cpu': QThreadPool(self), 'io': QThreadPool(self)}
+        self.pools['cpu'].setMaxThreadCount(cpu_threads or cpus)
+        self.pools['io'].setMaxThreadCount(io_threads or max(4, min(16, cpus * 2)))
+        # Parent of every job token: cancelled at shutdown
+        self.token = CancelToken()
+        self._lock = threading.Lock()
+        self._jobs = {}  # job -> runnable, until finished
+
+    def threads(self, pool):
+        return self.pools[pool].maxThreadCount()
+
+    def submit(self, job, priority=None):
+        """Queue a job and return it"""
+        job.token.parent = self.token
+        runnable = _JobRunnable(job, time.perf_counter())
+        with self._lock:
+            self._jobs[job] = runnable
+        job._released.connect(self._forget)
+        self.pools[job.pool].start(runnable, job.priority if priority is None else priority)
+        return job
+
+    def jobs(self, job_type=Job):
+        with self._lock:
+            return [job for job in self._jobs if isinstance(job, job_type) and not job.done]
+
+    def cancel_all(self, job_type=Job):
+        for job in self.jobs(job_type):
+            job.cancel()
+
+    def shutdown(self):
+        """Cancel everything and drop queued jobs, without waiting for running ones"""
+        self.token.cancel()
+        for pool in self.pools.values():
+            pool.clear()
+
+    def wait(self, msecs):
+        """Let running jobs finish, after shutdown() only a moment as they are all cancelled"""
+        deadline = time.perf_counter() + msecs / 1000
+        for pool in self.pools.values():
+            pool.waitForDone(max(0, int((deadline - time.perf_counter()) * 1000)))
+
+    def _forget(self, job):
+        with self._lock:
+            self._jobs.pop(job, None)
+
+
+# Global scheduler, shared by every background job of the GUI
+_job_scheduler = None
+
+
+def job_scheduler():
+    """Return the shared JobScheduler (created lazily)"""
+    global _job_scheduler
+    if _job_scheduler is None:
+        _job_scheduler = JobScheduler()
+    return _job_scheduler
@@ -0,0 +1,336 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+from support_files.diagnostics import metrics
+from support_files.integrity import INTEGRITY_KEYS
+from support_files.patterns import PatternEngine, version_stacks
+
+
+# Qt-free indexing core: the GUI workers and the headless indexer
+# (LocalAssetIndexer.py) both run these.
+
+# Fields measured by the scan itself, a rescan overwrites the stored ones
+SCAN_KEYS = ('name', 'type', 'frame_count', 'first_frame', 'last_frame', 'views', 'version', 'version_stack',
+             'tile_count', 'tiles') + INTEGRITY_KEYS
+DB_FOLDER = '.db'
+SCAN_STATE_FILE = 'scan_state.json'
+# Read once at import (os.umask can only be read by setting it): mkstemp files
+# are private, saved files get the permissions of a plain open() instead
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def db_path(root, *parts):
+    """Path inside a library's .db folder"""
+    return os.path.join(root, DB_FOLDER, *parts)
+
+
+def load_json(path, default=None):
+    """Contents of a JSON file, `default` if it is missing or unreadable"""
+    if os.path.exists(path):
+        try:
+            with metrics.timer('db.load', file=os.path.basename(path)), open(path, 'r') as f:
+                return json.load(f)
+        except (ValueError, OSError) as e:
+            print(f"Could not load {path}: {e}")
+    return default
+
+
+def save_json(path, data, indent=None):
+    """Write through a temporary file, so a crash never leaves half a file behind.
+
+    The temporary file is unique: several processes (browsers, indexers,
+    farm workers) may save the same file at once, the last rename wins.
+    """
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    with metrics.timer('db.save', file=os.path.basename(path)):
+        fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=os.path.basename(path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                # Other users of a shared library read these files too
+                os.chmod(tmp_path, 0o666 & ~_UMASK)
+                json.dump(data, f, indent=indent)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+def share_time(folder):
+    """Current time of the file system holding `folder`, for comparing with
+    the mtimes it wrote (hosts sharing a library can have skewed clocks)"""
+    clock = os.path.join(folder, '.clock')
+    try:
+        with open(clock, 'a'):
+            pass
+        os.utime(clock)
+        return os.stat(clock).st_mtime
+    except OSError:
+        return time.time()
+
+
+def load_database(root):
+    """The stored database, read only (SharedDatabase to save changes)"""
+    from support_files.shared_db import SharedDatabase
+    return SharedDatabase(root).load()
+
+
+def merge_dicts(dict1, dict2):
+    """
+    Merge dict2 into dict1.
+    - For overlapping keys:
+        * If both values are dicts, merge recursively.
+        * Otherwise, keep dict1's value.
+    - Add keys missing in dict1 from dict2.
+    """
+    result = dict1.copy()
+    for key, value in dict2.items():
+        if key not in result:
+            result[key] = value
+        elif isinstance(result[key], dict) and isinstance(value, dict):
+            result[key] = merge_dicts(result[key], value)
+    return result
+
+
+@metrics.timed('db.merge')
+def merge_scan(database, results):
+    """Database updated with a scan: new assets added, stored fields kept
+    (thumbnails, metadata, hashes) except the ones the scan measures"""
+    merged = merge_dicts(database, results)
+    for asset_id, info in results.items():
+        merged[asset_id].update({key: info[key] for key in SCAN_KEYS if key in info})
+    return merged
+
+
+def changed_assets(database, results):
+    """Ids of a scan that are new to the database or whose scanned fields differ"""
+    changed = set()
+    for asset_id, info in results.items():
+        stored = database.get(asset_id)
+        if stored is None or any(stored.get(key) != info.get(key) for key in SCAN_KEYS if key in info):
+            changed.add(asset_id)
+    return changed
+
+
+def copy_assets(assets):
+    """{id: info} with copies of the asset dicts, for a job working on them
+    while the GUI thread keeps changing the originals"""
+    return {asset_id: dict(info) for asset_id, info in assets.items()}
+
+
+def without_older_versions(database):
+    """Assets minus the older versions of version stacks (those are processed on demand)"""
+    older = {asset_id for ids in version_stacks(database).values() for asset_id in ids}
+    if not older:
+        return database
+    return {asset_id: info for asset_id, info in database.items() if asset_id not in older}
+
+
+class LibraryScanner:
+    """Walks a library and groups every directory into assets (see PatternEngine).
+
+    Image sequences, UDIM tile sets and stereo views become one entry each,
+    videos are always individual files. Assets are keyed by the sha1 of
+    their path. With `incremental`, directories whose modification time is
+    unchanged since the last scan (.db/scan_state.json) reuse the assets the
+    database already holds for them instead of being listed and grouped again.
+    """
+
+    def __init__(self, root, check_integrity=False, search_index=None, status=None, cancelled=None):
+        self.root = root
+        # Flag missing/short sequence frames (reads the size of every frame)
+        self.check_integrity = check_integrity
+        # Optional SearchIndex, fed directory by directory while scanning
+        self.search_index = search_index
+        self.status = status or (lambda text, percent: None)
+        self.cancelled = cancelled or (lambda: False)
+        self.state_path = db_path(root, SCAN_STATE_FILE)
+
+    def run(self, database=None, incremental=False):
+        """{id: info} sorted by creation time (newest first), None if cancelled.
+
+        An incremental scan loads the stored database unless one is given.
+        """
+        engine = PatternEngine.for_library(self.root)
+        # A different grouping setup invalidates every directory
+        settings = {'patterns': engine.config, 'check_integrity': self.check_integrity}
+        previous = {}
+        if incremental and database is None:
+            database = load_database(self.root)
+        if incremental and database:
+            state = load_json(self.state_path, {})
+            if state.get('settings') == settings:
+                previous = state.get('folders', {})
+
+        # Gather all directories (and their files) for progress, the .db folder is never entered
+        started = time.perf_counter()
+        with metrics.timer('scan.walk'):
+            all_dirs = list(_walk(self.root, entries=self.check_integrity))
+        total = len(all_dirs) or 1
+        self.status(f"Processing 0/{total}", 0)
+
+        all_files = {}
+        folders = {}  # directory -> {'mtime', 'ids'} for the next incremental scan
+        indexed = 0
+        reused = 0
+        for counter, (full_path, files) in enumerate(all_dirs, 1):
+            if self.cancelled():
+                print("⏹ Scan interrupted")
+                return None
+
+            try:
+                mtime = os.stat(full_path).st_mtime
+            except OSError:
+                continue
+            known = previous.get(full_path)
+            if known and known['mtime'] == mtime and all(i in database for i in known['ids']):
+                for asset_id in known['ids']:
+                    all_files[asset_id] = database[asset_id]
+                folders[full_path] = known
+                reused += 1
+            else:
+                assets = self._scan_directory(engine, full_path, files)
+                if assets is None:
+                    continue
+                for file_path, info in assets:
+                    asset_id = hashlib.sha1(file_path.encode('utf-8')).hexdigest()
+                    info['id'] = asset_id
+                    all_files[asset_id] = info
+                folders[full_path] = {'mtime': mtime, 'ids': [info['id'] for _, info in assets]}
+
+            if self.search_index is not None and len(all_files) > indexed:
+                # all_files only grows, so the new assets are the last ones inserted
+                new_ids = list(all_files)[indexed:]
+                self.search_index.add_many({i: all_files[i] for i in new_ids})
+                indexed = len(all_files)
+
+            self.status(f"Scanning {counter}/{total} Folders", int(counter / total * 100))
+
+        if reused:
+            print(f"{reused}/{len(all_dirs)} folders unchanged since the last scan")
+        metrics.count('scan.folders', len(all_dirs))
+        metrics.count('scan.folders_reused', reused)
+        metrics.count('scan.assets', len(all_files))
+        metrics.record('scan.total', started, time.perf_counter(), folders=len(all_dirs))
+        save_json(self.state_path, {'settings': settings, 'folders': folders})
+        # Sort by creation time (descending)
+        return dict(sorted(all_files.items(), key=lambda item: item[1].get("ctime", 0), reverse=True))
+
+    def _scan_directory(self, engine, full_path, files):
+        with metrics.timer('scan.directory'):
+            return self._group_directory(engine, full_path, files)
+
+    def _group_directory(self, engine, full_path, files):
+        sizes = None
+        if self.check_integrity:
+            # The walk's scandir entries: only sequence frames get their size
+            # read, free on Windows, one stat each elsewhere
+            sizes = _EntrySizes(files)
+            files = list(sizes.entries)
+        try:
+            return engine.group_directory(full_path, files, sizes)
+        except OSError as e:
+            print(f"Skipping {full_path}: {e}")
+            return None
+
+
+class _EntrySizes:
+    """File name -> size of scandir entries, stat'ed on first use"""
+
+    def __init__(self, entries):
+        self.entries = {entry.name: entry for entry in entries}
+
+    def get(self, filename, default=0):
+        entry = self.entries.get(filename)
+        if entry is None:
+            return default
+        try:
+            return entry.stat().st_size
+        except OSError:
+            return default
+
+
+def _walk(root, entries=False):
+    """(directory, files) top-down like os.walk, skipping the .db folder.
+
+    `files` are the scandir entries with `entries`, else the file names.
+    Unreadable directories are skipped.
+    """
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        files, subdirs = [], []
+        try:
+            with os.scandir(path) as listing:
+                for entry in listing:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if not is_dir:
+                        files.append(entry if entries else entry.name)
+                    elif entry.name != DB_FOLDER and not entry.is_symlink():
+                        subdirs.append(entry.path)
+        except OSError:
+            continue
+        yield path, files
+        stack.extend(reversed(subdirs))
+
+
+def scan_library(root, incremental=False, check_integrity=True, status=None, shared=None):
+    """Stored database updated with a scan of the library, and saved.
+
+    `shared` is the SharedDatabase to go through, a new one if None.
+    """
+    from support_files.shared_db import SharedDatabase
+    shared = shared or SharedDatabase(root)
+    database = shared.load()
+    results = LibraryScanner(root, check_integrity, status=status).run(database, incremental)
+    database = merge_scan(database, results)
+    shared.save(database)
+    return database
+
+
+def index_library(root, jobs=None, incremental=False, only_thumbnails=False, check_integrity=True,
+                  hasher=None, status=None):
+    """Scan, thumbnails and metadata of a library, the same passes the GUI runs.
+
+    The database is saved after every stage, so an interrupted run keeps
+    what was done. `only_thumbnails` skips the scan and metadata and works
+    on the stored database. Returns the database.
+    """
+    # The GUI only needs the scan and database functions above at startup
+    from support_files.metadata import MetadataExtractor
+    from support_files.shared_db import SharedDatabase
+    from support_files.thumbnails import QUEUE_FILE, ThumbnailGenerator, ThumbnailQueue
+
+    # Only what changed is saved: browsers and other indexers may be working on the library too
+    shared = SharedDatabase(root)
+    if only_thumbnails:
+        database = shared.load()
+    else:
+        database = scan_library(root, incremental, check_integrity, status, shared)
+    # Shares the asset dicts with the database, so results land in both
+    heads = without_older_versions(database)
+
+    thumbnails_folder = db_path(root, 'thumbnails')
+    os.makedirs(thumbnails_folder, exist_ok=True)
+    ThumbnailGenerator(thumbnails_folder, heads, max_workers=jobs, hasher=hasher, status=status,
+                       queue=ThumbnailQueue(db_path(root, QUEUE_FILE))).run()
+    shared.save(database)
+
+    if not only_thumbnails:
+        def merge(updates):
+            for asset_id, fields in updates.items():
+                database[asset_id].update(fields)
+        MetadataExtractor(heads, db_path(root, 'metadata_cache.json'), max_workers=jobs, status=status,
+                          on_batch=merge).run()
+        shared.save(database)
+    return database
@@ -0,0 +1,332 @@
+import os
+import re
+import json
+import shutil
+import time
+import subprocess
+import concurrent.futures
+from fractions import Fraction
+
+from support_files import exr_utils
+from support_files.diagnostics import metrics
+from support_files.integrity import frame_ranges
+from support_files.library import load_json, save_json
+
+
+# Kept free of Qt imports: probe_batch() runs in worker processes and
+# MetadataExtractor in the headless indexer
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+BUNDLED_TOOLS = {
+    'iinfo': os.path.join(_HERE, 'OpenImageIO', 'iinfo.exe'),
+    'ffprobe': os.path.join(_HERE, 'ffmpeg', 'ffprobe.exe'),
+    'ffmpeg': os.path.join(_HERE, 'ffmpeg', 'ffmpeg.exe'),
+    'oiiotool': os.path.join(_HERE, 'OpenImageIO', 'oiiotool.exe'),
+}
+VIDEO_TYPES = {'video'}
+IMAGE_TYPES = {'image', 'sequence', 'udim'}
+
+# Files per iinfo invocation (also keeps the Windows command line short)
+IINFO_BATCH = 64
+# Frames of one sequence (per view): name.0001.ext or name_0001.ext (3-6 digits)
+SEQUENCE_PATTERN = re.compile(r'^(.+?)[\._](\d{3,6})(\.[^\.]+)$', re.IGNORECASE)
+
+_iinfo_header = re.compile(r'^ *(\d+) x +(\d+), (\d+) channel, (\S+) (\S+)')
+_iinfo_field = re.compile(r'^\s+([\w ]+?):\s*(.*)$')
+
+
+def find_tool(name):
+    """Bundled executable if present, else the one on PATH (None if neither)"""
+    bundled = BUNDLED_TOOLS.get(name)
+    if bundled and os.access(bundled, os.X_OK):
+        return bundled
+    return shutil.which(name)
+
+
+def file_stat(path):
+    """(size, mtime) used as the metadata cache key, None if the file is gone"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime]
+
+
+def probe_kind(info):
+    """Which probe reads an asset's metadata: 'exr', 'iinfo', 'ffprobe' or None"""
+    type_ = str(info.get('type', '')).lower()
+    if type_ in VIDEO_TYPES:
+        return 'ffprobe'
+    if type_ in IMAGE_TYPES:
+        return 'exr' if str(info.get('path', '')).lower().endswith('.exr') else 'iinfo'
+    return None
+
+
+def sequence_frames(first_path, listing=None):
+    """Every frame of the sequence starting at `first_path`, in frame order"""
+    folder, filename = os.path.split(first_path)
+    match = SEQUENCE_PATTERN.match(filename)
+    if not match:
+        return [first_path]
+    base_name, ext = match.group(1), match.group(3)
+    frames = []
+    for other in listing if listing is not None else os.listdir(folder):
+        m = SEQUENCE_PATTERN.match(other)
+        if m and m.group(1) == base_name and m.group(3) == ext:
+            frames.append((int(m.group(2)), os.path.join(folder, other)))
+    frames.sort()
+    return [path for _, path in frames] or [first_path]
+
+
+def probe_batch(kind, paths):
+    """Read metadata for a batch of files: {path: fields}. Runs in a worker process."""
+    if kind == 'exr':
+        return _probe_exr(paths)
+    if kind == 'iinfo':
+        return _probe_iinfo(paths)
+    return _probe_ffprobe(paths)
+
+
+def _run(command):
+    # No console window per call on Windows
+    flags = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+    return subprocess.run(command, capture_output=True, text=True, errors='replace', creationflags=flags).stdout
+
+
+def _probe_iinfo(paths):
+    """One `iinfo -v` call for the whole batch, then split its output per file"""
+    tool = find_tool('iinfo')
+    if not tool:
+        return {}
+    output = _run([tool, '-v'] + list(paths))
+
+    results = {}
+    current = None
+    remaining = set(paths)
+    for line in output.splitlines():
+        header = None
+        for path in remaining:
+            if line.startswith(path + ' :'):
+                header = path
+                break
+        if header:
+            remaining.discard(header)
+            current = results[header] = {}
+            match = _iinfo_header.match(line[len(header) + 2:])
+            if match:
+                width, height, channels, data_format, file_format = match.groups()
+                current.update({'resolution': f"{width}x{height}", 'channel_count': int(channels),
+                                'bit_depth': data_format, 'format': file_format})
+            continue
+        match = _iinfo_field.match(line)
+        if current is not None and match:
+            key, value = match.group(1).strip().lower(), match.group(2).strip().strip('"')
+            if key == 'channel list':
+                current['channels'] = value
+            elif key == 'compression':
+                current['compression'] = value
+    return results
+
+
+def _probe_exr(paths):
+    """Headers read in Python, no subprocess; later sequence frames are only validated"""
+    results = {}
+    listings = {}  # a batch often holds several sequences of the same folder
+    for path in paths:
+        folder = os.path.dirname(path)
+        try:
+            if folder not in listings:
+                listings[folder] = os.listdir(folder)
+            fields, invalid = exr_utils.read_sequence(sequence_frames(path, listings[folder]))
+        except (OSError, exr_utils.ExrError) as e:
+            print(f"Could not read EXR header {path}: {e}")
+            continue
+        # Always set, so a sequence that was fixed loses its old value
+        fields['corrupt_frames'] = frame_ranges(
+            [int(m.group(2)) for m in map(SEQUENCE_PATTERN.match, map(os.path.basename, invalid)) if m])
+        results[path] = fields
+    return results
+
+
+def _probe_ffprobe(paths):
+    """ffprobe reads one input per call: the batch is one task, one call per file"""
+    tool = find_tool('ffprobe')
+    if not tool:
+        return {}
+    results = {}
+    for path in paths:
+        output = _run([tool, '-v', 'error', '-select_streams', 'v:0',
+                       '-show_entries', 'stream=width,height,codec_name,r_frame_rate,nb_frames,duration'
+                       ':format=duration', '-of', 'json', path])
+        try:
+            data = json.loads(output or '{}')
+        except ValueError:
+            continue
+        stream = (data.get('streams') or [{}])[0]
+        fields = {}
+        if stream.get('width') and stream.get('height'):
+            fields['resolution'] = f"{stream['width']}x{stream['height']}"
+        if stream.get('codec_name'):
+            fields['codec'] = stream['codec_name']
+        try:
+            fps = Fraction(stream.get('r_frame_rate', '0/1'))
+            if fps:
+                fields['fps'] = round(float(fps), 3)
+        except (ValueError, ZeroDivisionError):
+            pass
+        duration = stream.get('duration') or (data.get('format') or {}).get('duration')
+        try:
+            if duration:
+                fields['duration'] = round(float(duration), 3)
+        except ValueError:
+            pass
+        if str(stream.get('nb_frames', '')).isdigit():
+            fields['frame_count'] = int(stream['nb_frames'])
+        elif 'fps' in fields and 'duration' in fields:
+            fields['frame_count'] = int(round(fields['fps'] * fields['duration']))
+        results[path] = fields
+    return results
+
+
+class MetadataCache:
+    """{path: {"stat": [size, mtime], "meta": fields}} in .db/metadata_cache.json"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = load_json(path, {}) if path else {}
+        self.dirty = False
+
+    def get(self, path, stat):
+        entry = self.entries.get(path)
+        if entry and entry.get('stat') == stat:
+            return entry['meta']
+        return None
+
+    def put(self, path, stat, meta):
+        self.entries[path] = {'stat': stat, 'meta': meta}
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty or not self.path:
+            return
+        save_json(self.path, self.entries)
+        self.dirty = False
+
+
+class MetadataExtractor:
+    """Metadata extraction: resolution, duration, fps, codec, channels...
+
+    EXR files and sequences have their header parsed in Python (later
+    frames only validated), other images go through iinfo, many files per
+    call, and videos through ffprobe. Batches run in a process pool
+    and every finished batch is passed to `on_batch` right away, so the
+    database fills in incrementally. Results are cached by path with the
+    file's (size, mtime), and duplicates reuse the metadata of their original.
+    """
+
+    batch_sizes = {'exr': 32, 'iinfo': IINFO_BATCH, 'ffprobe': 16}
+    # External executables, the EXR reader needs none
+    tools = ('iinfo', 'ffprobe')
+
+    def __init__(self, database, cache_path, max_workers=None, status=None, cancelled=None, on_batch=None):
+        self.database = database
+        self.cache_path = cache_path
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.status = status or (lambda text, percent: None)
+        self.cancelled = cancelled or (lambda: False)
+        # asset id -> new fields, one batch at a time
+        self.on_batch = on_batch or (lambda updates: None)
+
+    def run(self):
+        cache = MetadataCache(self.cache_path)
+        available = {kind: kind not in self.tools or find_tool(kind) for kind in self.batch_sizes}
+        for kind, tool in available.items():
+            if not tool:
+                print(f"{kind} not found, skipping that part of the metadata extraction")
+
+        assets = list(self.database.items())
+        copies = {}  # original id -> duplicate ids
+        for asset_id, info in assets:
+            if info.get('duplicate_of') in self.database:
+                copies.setdefault(info['duplicate_of'], []).append(asset_id)
+
+        jobs = {kind: [] for kind in self.batch_sizes}
+        cached = {}
+        hits = 0
+        for asset_id, info in assets:
+            if info.get('duplicate_of') in self.database:
+                continue
+            kind = probe_kind(info)
+            if kind is None or not available[kind] or not info.get('path'):
+                continue
+            stat = file_stat(info['path'])
+            if stat is None:
+                continue
+            if str(info.get('type', '')).lower() == 'sequence':
+                # Frames added or removed change the sequence's metadata too
+                stat.append(info.get('frame_count'))
+            meta = cache.get(info['path'], stat)
+            if meta is None:
+                jobs[kind].append((asset_id, info['path'], stat))
+                continue
+            hits += 1
+            if any(self.database[i].get(key) != value
+                   for i in [asset_id] + copies.get(asset_id, []) for key, value in meta.items()):
+                cached[asset_id] = meta
+
+        metrics.count('metadata.cache.hit', hits)
+        metrics.count('metadata.cache.miss', sum(len(items) for items in jobs.values()))
+        if cached:
+            self.on_batch(self._with_copies(cached, copies))
+
+        batches = [(kind, items[i:i + self.batch_sizes[kind]])
+                   for kind, items in jobs.items() for i in range(0, len(items), self.batch_sizes[kind])]
+        if not batches:
+            return
+        total = sum(len(batch) for _, batch in batches)
+        done = 0
+        self.status(f"Reading metadata 0/{total}", 0)
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers)
+        try:
+            submitted = time.perf_counter()
+            futures = {executor.submit(probe_batch, kind, [path for _, path, _ in batch]): (kind, batch)
+                       for kind, batch in batches}
+            for number, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                if self.cancelled():
+                    break
+                kind, batch = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    print(f"Metadata batch failed: {e}")
+                    metrics.count('metadata.failed_batches')
+                    continue
+                # Runs in another process: time from submission to result, queue included
+                metrics.record('metadata.batch', submitted, time.perf_counter(), kind=kind, files=len(batch))
+                updates = {}
+                for asset_id, path, stat in batch:
+                    # Unreadable files are cached too (empty), so they are not probed again
+                    meta = results.get(path, {})
+                    cache.put(path, stat, meta)
+                    if meta:
+                        updates[asset_id] = meta
+                if updates:
+                    self.on_batch(self._with_copies(updates, copies))
+                done += len(batch)
+                self.status(f"Reading metadata {done}/{total}", int(done / total * 100))
+                if number % 50 == 0:
+                    cache.save()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            cache.save()
+        if self.cancelled():
+            self.status(f"Metadata interrupted at {done}/{total}", int(done / total * 100))
+            return
+        self.status("Metadata up to date", 100)
+
+    @staticmethod
+    def _with_copies(updates, copies):
+        for asset_id, meta in list(updates.items()):
+            for copy_id in copies.get(asset_id, ()):
+                updates[copy_id] = meta
+        return updates
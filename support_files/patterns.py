@@ -0,0 +1,203 @@
+import os
+import re
+import json
+
+from support_files.integrity import frame_ranges, sequence_integrity
+
+
+# File naming conventions the scanner groups on. Overridable per library
+# with a .db/patterns.json holding any of these keys.
+DEFAULT_CONFIG = {
+    'image_extensions': ['.exr', '.dpx', '.tif', '.tiff', '.tga', '.png', '.jpg', '.jpeg', '.bmp', '.webp',
+                         '.tx', '.tex'],
+    'video_extensions': ['.mov', '.mp4', '.mkv', '.avi', '.flv', '.wmv', '.webm', '.m4v', '.mts', '.m2ts'],
+    # Numbered files with these extensions are texture tiles (name.1001.tx), not frames
+    'udim_extensions': ['.tx', '.tex', '.rat'],
+    # %V / %v view names, e.g. name_left.0001.exr, name_r.0001.exr
+    'views': ['left', 'right', 'l', 'r'],
+    'version_prefix': 'v',
+    'frame_digits': [3, 6],
+}
+CONFIG_FILE = 'patterns.json'
+UDIM_RANGE = (1001, 1999)
+
+
+class PatternEngine:
+    """Groups a directory listing into assets in one pass.
+
+    Every file name goes through a single compiled regex that splits it into
+    stem, version token, view, frame/tile number and extension. Files are
+    bucketed on (stem, extension, view naming) as they come, then each
+    bucket becomes one asset: a frame sequence (stereo views merged), a UDIM
+    tile set, a still image or stereo pair.
+    """
+
+    def __init__(self, config=None):
+        self.config = dict(DEFAULT_CONFIG, **(config or {}))
+        self.image_extensions = {ext.lower() for ext in self.config['image_extensions']}
+        self.video_extensions = {ext.lower() for ext in self.config['video_extensions']}
+        self.udim_extensions = {ext.lower() for ext in self.config['udim_extensions']}
+        views = '|'.join(sorted(map(re.escape, self.config['views']), key=len, reverse=True)) or '(?!)'
+        version = re.escape(self.config['version_prefix'])
+        low, high = self.config['frame_digits']
+        self.pattern = re.compile(
+            r'^(?P<head>.*?)'
+            rf'(?P<version>[._-]{version}(?P<version_number>\d+))?'
+            # The rest of the stem never crosses a version token, so `head` stops at it
+            rf'(?P<tail>[._-](?:(?![._-]{version}\d).)*?)??'
+            rf'(?P<view_part>(?P<view_sep>[._])(?P<view>{views}))?'
+            rf'(?P<frame_part>[._](?P<frame>\d{{{low},{high}}}))?'
+            r'(?P<ext>\.[^.]+)$',
+            re.IGNORECASE)
+
+    @classmethod
+    def for_library(cls, root):
+        """Engine with the library's .db/patterns.json overrides, if any"""
+        path = os.path.join(root or '', '.db', CONFIG_FILE)
+        config = None
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    config = json.load(f)
+            except (ValueError, OSError) as e:
+                print(f"Could not load {path}: {e}")
+        return cls(config)
+
+    def group_directory(self, folder, filenames, sizes=None):
+        """Assets of one directory as [(path, info)].
+
+        `sizes` (file name -> bytes, anything with .get), when given, adds the
+        missing/short frame check to sequences. Only their frames are looked up.
+        """
+        assets = []
+        buckets = {}  # (stem, ext, numbered, version, view style) -> {view: [(number, file name)]}
+        stack_stems = {}  # versioned bucket -> its stem without the version token
+        for filename in filenames:
+            dot = filename.rfind('.')
+            ext = filename[dot:].lower() if dot > 0 else ''
+            if ext in self.video_extensions:
+                assets.append(self._asset(folder, filename, 'video'))
+                continue
+            if ext not in self.image_extensions:
+                continue
+            match = self.pattern.match(filename)
+            if not match:
+                continue
+            numbered = match.group('frame') is not None
+            stem_end = match.start('view_part') if match.group('view_part') else \
+                match.start('frame_part') if numbered else match.start('ext')
+            version = match.group('version_number')
+            view = match.group('view')
+            # name_left/name.r never pair up: views merge per separator and per short/long names
+            style = (match.group('view_sep'), len(view) == 1) if view else None
+            key = (filename[:stem_end], match.group('ext'), numbered, int(version) if version else None, style)
+            if version and key not in stack_stems:
+                stack_stems[key] = filename[:match.start('version')] + filename[match.end('version'):stem_end]
+            view_key = (view, match.group('view_sep')) if view else None
+            number = int(match.group('frame')) if numbered else None
+            buckets.setdefault(key, {}).setdefault(view_key, []).append((number, filename))
+
+        for key, views in buckets.items():
+            stem, ext, numbered, version, _ = key
+            named = sorted((view for view in views if view is not None), key=_view_order)
+            if len(named) >= 2:
+                groups = [(named, True)]
+            else:
+                # A lone view is just part of the name
+                groups = [([view], False) for view in named]
+            if None in views:
+                groups.append(([None], False))
+            for group_views, stereo in groups:
+                if numbered:
+                    asset = self._numbered(folder, stem, ext, views, group_views, stereo, sizes)
+                else:
+                    asset = self._stills(folder, stem, views, group_views, stereo)
+                if version is not None:
+                    # Every version of the same file shares this key (see version_stacks)
+                    asset[1]['version'] = version
+                    asset[1]['version_stack'] = os.path.join(
+                        folder, stack_stems[key] + _view_suffix(group_views, stereo) + ext + ('#' if numbered else ''))
+                assets.append(asset)
+        return assets
+
+    def _asset(self, folder, filename, type_, **fields):
+        path = os.path.join(folder, filename)
+        info = {"ctime": os.path.getctime(path), "path": path, "name": filename, "type": type_}
+        info.update(fields)
+        return path, info
+
+    def _stills(self, folder, stem, views, group_views, stereo):
+        files = [filename for view in group_views for _, filename in views[view]]
+        if not stereo:
+            return self._asset(folder, files[0], 'image')
+        ext = os.path.splitext(files[0])[1]
+        return self._asset(folder, files[0], 'image', name=f"{stem}{_view_suffix(group_views, stereo)}{ext}",
+                           views=", ".join(view for view, _ in group_views))
+
+    def _numbered(self, folder, stem, ext, views, group_views, stereo, sizes):
+        frames = {view: sorted(views[view]) for view in group_views}
+        first_view = frames[group_views[0]]
+        numbers = sorted({number for view in group_views for number, _ in frames[view]})
+        first, last = numbers[0], numbers[-1]
+        first_file = first_view[0][1]
+        name_stem = stem + _view_suffix(group_views, stereo)
+
+        if ext.lower() in self.udim_extensions and UDIM_RANGE[0] <= first and last <= UDIM_RANGE[1]:
+            return self._asset(folder, first_file, 'udim', name=f"{name_stem}.<UDIM>{ext}",
+                               tile_count=len(numbers), tiles=frame_ranges(numbers))
+
+        fields = {"name": f"{name_stem}[{first:04d}-{last:04d}]{ext}", "frame_count": len(numbers),
+                  "first_frame": first, "last_frame": last}
+        if stereo:
+            fields['views'] = ", ".join(view for view, _ in group_views)
+        if sizes is not None:
+            fields.update(self._integrity(frames, sizes, stereo))
+        return self._asset(folder, first_file, 'sequence', **fields)
+
+    @staticmethod
+    def _integrity(frames, sizes, stereo):
+        results = {view: sequence_integrity([number for number, _ in files],
+                                            [sizes.get(filename, 0) for _, filename in files])
+                   for view, files in frames.items()}
+        if not stereo:
+            return next(iter(results.values()))
+        # Per eye, e.g. "left: 1004; right: 1010-1012"
+        return {key: "; ".join(f"{view[0]}: {result[key]}" for view, result in results.items() if result[key])
+                for key in next(iter(results.values()))}
+
+
+def _view_order(view):
+    # left before right, then alphabetical
+    name = view[0].lower()
+    return (0 if name in ('left', 'l') else 1 if name in ('right', 'r') else 2, name)
+
+
+def _view_suffix(views, stereo):
+    """View part of an asset name: %V/%v for a stereo group, else the view as written"""
+    if stereo:
+        return _view_token(views)
+    return views[0][1] + views[0][0] if views[0] else ''
+
+
+def _view_token(views):
+    """%V for full view names, %v for single letters (Nuke's convention)"""
+    separator = views[0][1]
+    return separator + ('%v' if all(len(view) == 1 for view, _ in views) else '%V')
+
+
+def version_stacks(database):
+    """{head id: [older version ids, newest first]} for assets found in several versions.
+
+    The head is the highest version, the one a collapsed stack shows.
+    """
+    stacks = {}
+    for asset_id, info in database.items():
+        key = info.get('version_stack')
+        if key is not None and info.get('version') is not None:
+            stacks.setdefault(key, []).append(asset_id)
+    heads = {}
+    for ids in stacks.values():
+        if len(ids) > 1:
+            ids.sort(key=lambda i: (database[i]['version'], database[i].get('ctime', 0)), reverse=True)
+            heads[ids[0]] = ids[1:]
+    return heads
@@ -0,0 +1,135 @@
+import re
+import time
+from collections import namedtuple
+from datetime import datetime
+
+
+# Field filters, e.g. `type:sequence frames>100 ext:exr ctime>2026-01-01 path:/shots/ab*`
+FIELDS = {
+    'type': 'type',
+    'ext': 'ext',
+    'frames': 'frames',
+    'frame_count': 'frames',
+    'ctime': 'ctime',
+    'date': 'ctime',
+    'path': 'path',
+    'name': 'name',
+}
+RANGE_FIELDS = {'frames', 'ctime'}
+
+QUERY_HELP = [
+    ("type:sequence", "Asset type (image, sequence, udim, video), comma separated"),
+    ("ext:exr", "File extension, comma separated"),
+    ("frames>100", "Frame count (>, >=, <, <=, =)"),
+    ("ctime>2026-01-01", "Creation date (YYYY, YYYY-MM, YYYY-MM-DD or 7d / 12h ago)"),
+    ("path:/shots/ab*", "Glob anywhere in the path"),
+    ("name:*_beauty*", "Glob anywhere in the name"),
+    ("-type:video", "A leading - excludes the matches"),
+    ("~", "Fuzzy mode: ~bty v12 finds beauty_v012, best matches first"),
+]
+
+_word_pattern = re.compile(r'[a-z0-9]')
+_filter_pattern = re.compile(r'^(-?)([a-z_]+)(>=|<=|>|<|=|:)(.+)$')
+_relative_pattern = re.compile(r'^(\d+(?:\.\d+)?)([hdwmy])$')
+_relative_units = {'h': 3600, 'd': 86400, 'w': 7 * 86400, 'm': 30 * 86400, 'y': 365 * 86400}
+
+QueryFilter = namedtuple('QueryFilter', 'field op value negate')
+
+
+class QueryError(ValueError):
+    pass
+
+
+class ParsedQuery:
+    """Plain search terms plus field filters.
+
+    Range filters (frames, ctime) carry a half-open (low, high) interval,
+    type/ext carry a tuple of values and path/name a glob pattern. In fuzzy
+    mode (text starting with '~') the terms are ranked fuzzy words instead
+    of substrings.
+    """
+
+    def __init__(self, terms=None, filters=None, fuzzy=False):
+        self.terms = terms or []
+        self.filters = filters or []
+        self.fuzzy = fuzzy
+
+    def __bool__(self):
+        return bool(self.terms or self.filters)
+
+
+def parse_query(text):
+    """Parse the search box text, raises QueryError on a malformed filter value"""
+    terms = []
+    filters = []
+    text = text.strip().lower()
+    fuzzy = text.startswith('~')
+    if fuzzy:
+        text = text[1:]
+    for word in text.split():
+        match = _filter_pattern.match(word)
+        if not match or match.group(2) not in FIELDS:
+            # Not a filter (e.g. 'c:/shots' or 'plate_v01'), search it as text. Fuzzy
+            # words are matched on their letters and digits, a bare '~' or '_' is no query
+            if not fuzzy or _word_pattern.search(word):
+                terms.append(word)
+            continue
+        negate, field, op, value = match.groups()
+        field = FIELDS[field]
+        if op == ':':
+            op = '='
+        if field in RANGE_FIELDS:
+            value = _range(field, op, value)
+        elif op != '=':
+            raise QueryError(f"{field} only supports ':' (got '{op}')")
+        elif field in ('type', 'ext'):
+            value = tuple(v.lstrip('.') for v in value.split(',') if v.lstrip('.'))
+        else:
+            value = value.replace('\\', '/')
+        filters.append(QueryFilter(field, op, value, bool(negate)))
+    return ParsedQuery(terms, filters, fuzzy)
+
+
+def _range(field, op, value):
+    """Turn `field op value` into a half-open (low, high) interval"""
+    if field == 'frames':
+        try:
+            low = int(value)
+        except ValueError:
+            raise QueryError(f"frames needs a number (got '{value}')")
+        high = low + 1
+    else:
+        low, high = _date_interval(value)
+
+    inf = float('inf')
+    if op == '>':
+        return (high, inf)
+    if op == '>=':
+        return (low, inf)
+    if op == '<':
+        return (-inf, low)
+    if op == '<=':
+        return (-inf, high)
+    return (low, high)
+
+
+def _date_interval(value):
+    """Timestamps covering `value`: a year, month or day, or a point N units ago"""
+    match = _relative_pattern.match(value)
+    if match:
+        point = time.time() - float(match.group(1)) * _relative_units[match.group(2)]
+        return point, point
+
+    for fmt in ("%Y-%m-%d", "%Y-%m", "%Y"):
+        try:
+            start = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if fmt == "%Y-%m-%d":
+            end = datetime.fromordinal(start.toordinal() + 1)
+        elif fmt == "%Y-%m":
+            end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+        else:
+            end = start.replace(year=start.year + 1)
+        return start.timestamp(), end.timestamp()
+    raise QueryError(f"ctime needs a date like 2026-01-31 or 7d (got '{value}')")
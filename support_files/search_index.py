@@ -0,0 +1,649 @@
+import os
+import re
+import base64
+import heapq
+import fnmatch
+import itertools
+import threading
+from array import array
+
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from support_files.asset_model import asset_search_text
+from support_files.query import ParsedQuery, QueryError, parse_query
+from support_files.fuzzy import SCORE_MATCH, char_signature, edit_distance, fuzzy_score, typo_budget
+from support_files.library import load_json, save_json
+
+
+_token_pattern = re.compile(r'[a-z0-9]+')
+# fnmatch character class: [abc], [!abc], []abc] or [!]abc]
+_glob_class = re.compile(r'\[!?\]?[^\]]*\]')
+
+
+def asset_frame_count(info):
+    """Frame count of an asset (1 for still images, 0 when unknown)"""
+    frames = info.get("frame_count") or info.get("frames")
+    if frames:
+        try:
+            return int(frames)
+        except (TypeError, ValueError):
+            return 0
+    return 1 if str(info.get("type", "")).lower() == "image" else 0
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _text_fields(text):
+    """(name, path, type, extension) back from a search text"""
+    name, path, type_ = (text.split("\n", 3) + ["", ""])[:3]
+    path = path.replace("\\", "/")
+    ext = os.path.splitext(path)[1].lstrip(".")
+    return name, path, type_, ext
+
+
+def _encode_array(values):
+    return base64.b64encode(values.tobytes()).decode('ascii')
+
+
+def _decode_array(typecode, encoded):
+    values = array(typecode)
+    values.frombytes(base64.b64decode(encoded))
+    return values
+
+
+def _encode_postings(postings):
+    return {key: _encode_array(docs) for key, docs in postings.items()}
+
+
+def _decode_postings(data):
+    return {key: _decode_array('I', encoded) for key, encoded in data.items()}
+
+
+def _popcount(values):
+    return np.unpackbits(values.view(np.uint8)).reshape(len(values), 64).sum(axis=1)
+
+
+def _to_numpy(values, dtype):
+    # Copy: a numpy view would pin the array and block further appends
+    return np.frombuffer(values, dtype=dtype).copy() if len(values) else np.zeros(0, dtype=dtype)
+
+
+class SearchIndex:
+    """Inverted token index over the asset database, with a trigram index
+    over the token vocabulary for substring queries, and per-field indexes
+    for structured filters (see support_files/query.py).
+
+    Every asset gets a dense document number and its text is split into
+    alphanumeric tokens (name, path components, type, metadata values).
+    Posting lists are append-only arrays of document numbers. A query term
+    is looked up in the trigram index to find the (few) vocabulary tokens
+    that contain it, and the union of their posting lists is the exact set
+    of matching assets; terms with separators ('plate_v01', '/shots/ab')
+    intersect their pieces and verify the survivors by substring. No query
+    ever scans every asset.
+
+    Field filters never test rows one by one either: ctime and frame count
+    are binary searched in a sorted copy, type and extension come from
+    per-value buckets, and every filter becomes a numpy bitmap over the
+    documents that is ANDed with the others.
+
+    Thread safe: the scanner and table builder add to it while the query
+    thread reads from it.
+    """
+
+    VERSION = 2
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.dirty = False
+        self._reset()
+
+    def _reset(self):
+        self.doc_ids = []  # doc number -> asset id
+        self.texts = []  # doc number -> search text (None once superseded)
+        self.live = bytearray()  # doc number -> 1 unless superseded
+        self.doc_for_id = {}  # asset id -> live doc number
+        self.superseded = 0
+        self.tokens = {}  # token -> array of doc numbers
+        self.token_trigrams = {}  # trigram -> set of tokens containing it
+        # Field indexes
+        self.ctimes = array('d')  # doc number -> ctime
+        self.frames = array('I')  # doc number -> frame count
+        self.types = {}  # type -> array of doc numbers
+        self.exts = {}  # extension -> array of doc numbers
+        self._sorted_fields = {}  # field -> (doc count, doc order, sorted values)
+        # Fuzzy mode
+        self._vocabulary = ([], [], [], None)  # tokens, lengths, signatures, numpy copies
+        self._fuzzy_cache = {}  # query word -> (vocabulary size, subsequence matches)
+        self._names = ([], [], None)  # doc number -> name, its signature, numpy copy of the signatures
+        self._fuzzy_name_cache = {}  # query word -> (doc count, docs whose name has it as a subsequence)
+
+    def __len__(self):
+        return len(self.doc_for_id)
+
+    # ---- building ----
+
+    def add(self, asset_id, info, text=None):
+        """Index (or re-index) one asset. No-op if nothing searchable changed.
+
+        `text` can be passed by callers that already built asset_search_text().
+        """
+        if text is None:
+            text = asset_search_text(info)
+        with self.lock:
+            self._add(asset_id, text, float(info.get("ctime") or 0.0), asset_frame_count(info))
+
+    def add_many(self, assets):
+        """Index a dict of asset id -> info (one lock round-trip per batch)"""
+        entries = [(asset_id, asset_search_text(info), float(info.get("ctime") or 0.0), asset_frame_count(info))
+                   for asset_id, info in assets.items()]
+        with self.lock:
+            for entry in entries:
+                self._add(*entry)
+
+    def _add(self, asset_id, text, ctime, frames):
+        old = self.doc_for_id.get(asset_id)
+        if old is not None:
+            if self.texts[old] == text and self.ctimes[old] == ctime and self.frames[old] == frames:
+                return
+            self._supersede(old)
+
+        doc = len(self.doc_ids)
+        self.doc_ids.append(asset_id)
+        self.texts.append(text)
+        self.live.append(1)
+        self.doc_for_id[asset_id] = doc
+
+        for token in set(_token_pattern.findall(text)):
+            postings = self.tokens.get(token)
+            if postings is None:
+                postings = self.tokens[token] = array('I')
+                self._index_token(token)
+            postings.append(doc)
+
+        _, _, type_, ext = _text_fields(text)
+        self.ctimes.append(ctime)
+        self.frames.append(max(0, frames))
+        self.types.setdefault(type_, array('I')).append(doc)
+        self.exts.setdefault(ext, array('I')).append(doc)
+        self.dirty = True
+
+    def remove(self, asset_id):
+        """Drop an asset that left the library"""
+        with self.lock:
+            doc = self.doc_for_id.pop(asset_id, None)
+            if doc is not None:
+                self._supersede(doc)
+                self.dirty = True
+
+    def _supersede(self, doc):
+        # Superseded documents stay in the posting lists but are skipped
+        self.texts[doc] = None
+        self.live[doc] = 0
+        self.superseded += 1
+
+    def _index_token(self, token):
+        for gram in trigrams(token):
+            self.token_trigrams.setdefault(gram, set()).add(token)
+
+    def clear(self):
+        with self.lock:
+            self._reset()
+            self.dirty = True
+
+    def _compact(self):
+        """Rebuild without superseded documents (caller holds the lock)"""
+        live = [(self.doc_ids[doc], text, self.ctimes[doc], self.frames[doc])
+                for doc, text in enumerate(self.texts) if text is not None]
+        self._reset()
+        for entry in live:
+            self._add(*entry)
+
+    # ---- querying ----
+
+    def search(self, query, limit=None):
+        """Return the ids of assets matching `query`.
+
+        `query` is the search box text or a ParsedQuery: every plain term
+        must be contained in the asset text and every field filter must hold.
+        """
+        if not isinstance(query, ParsedQuery):
+            query = parse_query(query)
+        if not query:
+            return []
+        with self.lock:
+            mask = self._filter_mask(query.filters)
+            candidates, verify = self._text_candidates(query.terms)
+
+            if mask is not None:
+                if candidates is None:
+                    candidates = np.flatnonzero(mask).tolist()
+                else:
+                    docs = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+                    candidates = docs[mask[docs]].tolist()
+            elif candidates is None:
+                candidates = range(len(self.doc_ids))
+
+            texts = self.texts
+            doc_ids = self.doc_ids
+            if len(verify) == 1:
+                term = verify[0]
+                matches = [doc_ids[doc] for doc in candidates
+                           if texts[doc] is not None and term in texts[doc]]
+            elif verify:
+                matches = [doc_ids[doc] for doc in candidates
+                           if texts[doc] is not None and all(term in texts[doc] for term in verify)]
+            elif self.superseded and mask is None:
+                matches = [doc_ids[doc] for doc in candidates if texts[doc] is not None]
+            else:
+                # The filter mask already excludes superseded documents
+                matches = [doc_ids[doc] for doc in candidates]
+            if limit is not None:
+                matches = matches[:limit]
+            return matches
+
+    def _text_candidates(self, terms):
+        """Plan the plain terms: returns (candidate docs or None for all, terms to verify).
+
+        Each alphanumeric piece of each term maps to the vocabulary tokens
+        containing it. Only the cheapest lookups are materialized, everything
+        else is checked by substring on the survivors.
+        """
+        lookups = []
+        verify = []
+        for term in terms:
+            pieces = _token_pattern.findall(term)
+            if not (len(pieces) == 1 and pieces[0] == term):
+                verify.append(term)
+            for tokens in self._piece_lookups(pieces):
+                lookups.append((sum(len(self.tokens[token]) for token in tokens), term, tokens))
+
+        if not lookups:
+            return None, verify
+        lookups.sort(key=lambda lookup: lookup[0])
+        candidates = self._docs(lookups[0][2])
+        for cost, term, tokens in lookups[1:]:
+            if not candidates:
+                break
+            if cost < len(candidates):
+                # Cheaper to intersect than to check every candidate by substring
+                candidates = candidates.intersection(self._docs(tokens))
+            elif term not in verify:
+                verify.append(term)
+        return candidates, verify
+
+    def _piece_lookups(self, pieces):
+        if any(len(piece) >= 3 for piece in pieces):
+            # Short pieces match most of the vocabulary, the term is verified anyway
+            pieces = [piece for piece in pieces if len(piece) >= 3]
+        return [self.tokens_containing(piece) for piece in pieces]
+
+    def tokens_containing(self, fragment):
+        """Vocabulary tokens that contain `fragment` (via the trigram index)"""
+        if len(fragment) < 3:
+            return [token for token in self.tokens if fragment in token]
+        token_sets = [self.token_trigrams.get(gram) for gram in trigrams(fragment)]
+        if any(tokens is None for tokens in token_sets):
+            return []
+        candidates = min(token_sets, key=len)
+        return [token for token in candidates if fragment in token]
+
+    def _docs(self, tokens):
+        """Union of the posting lists of `tokens`"""
+        docs = set()
+        for token in tokens:
+            docs.update(self.tokens[token])
+        return docs
+
+    def _filter_mask(self, filters):
+        """AND of the filter bitmaps (live documents only), None without filters"""
+        if not filters:
+            return None
+        mask = np.frombuffer(bytes(self.live), dtype=np.bool_).copy()
+        # Globs test documents one by one, run them last on what is left
+        for query_filter in sorted(filters, key=lambda f: f.field in ('path', 'name')):
+            field_mask = self._field_mask(query_filter, mask)
+            if query_filter.negate:
+                mask &= ~field_mask
+            else:
+                mask &= field_mask
+        return mask
+
+    def _field_mask(self, query_filter, within):
+        """Bitmap of the documents matching one filter (only exact inside `within`)"""
+        field, value = query_filter.field, query_filter.value
+        mask = np.zeros(len(self.doc_ids), dtype=np.bool_)
+
+        if field in ('ctime', 'frames'):
+            order, values = self._sorted_field(field)
+            low, high = value
+            first = np.searchsorted(values, low, side='left')
+            last = np.searchsorted(values, high, side='left')
+            mask[order[first:last]] = True
+
+        elif field in ('type', 'ext'):
+            buckets = self.types if field == 'type' else self.exts
+            for bucket_value in value:
+                docs = buckets.get(bucket_value)
+                if docs:
+                    mask[_to_numpy(docs, np.uint32)] = True
+
+        else:
+            # Glob on the name or path: prune with the token index, then match
+            matcher = re.compile(fnmatch.translate('*' + value + '*'), re.DOTALL).match
+            # Only literal text prunes: a class like [!a] says nothing about 'a'
+            lookups = self._piece_lookups(_token_pattern.findall(_glob_class.sub('*', value)))
+            if lookups:
+                tokens = min(lookups, key=lambda tokens: sum(len(self.tokens[t]) for t in tokens))
+                candidates = np.fromiter(self._docs(tokens), dtype=np.int64)
+                candidates = candidates[within[candidates]]
+            else:
+                candidates = np.flatnonzero(within)
+            texts = self.texts
+            if field == 'name':
+                docs = [doc for doc in candidates.tolist() if matcher(texts[doc].split("\n", 1)[0])]
+            else:
+                docs = [doc for doc in candidates.tolist()
+                        if matcher(texts[doc].split("\n", 2)[1].replace("\\", "/"))]
+            mask[docs] = True
+        return mask
+
+    def _sorted_field(self, field):
+        """(doc order, sorted values) for a range field, cached until documents are added"""
+        cached = self._sorted_fields.get(field)
+        if cached is not None and cached[0] == len(self.doc_ids):
+            return cached[1], cached[2]
+        values = _to_numpy(self.ctimes, np.float64) if field == 'ctime' else _to_numpy(self.frames, np.uint32)
+        order = np.argsort(values, kind='stable')
+        sorted_values = values[order]
+        self._sorted_fields[field] = (len(self.doc_ids), order, sorted_values)
+        return order, sorted_values
+
+    # ---- fuzzy mode ----
+
+    def fuzzy_search(self, query, limit=1000, cancelled=None):
+        """Return the ids of the `limit` best fuzzy matches for `query`, best first.
+
+        Each query word is matched against the token vocabulary, as an fzf
+        style subsequence or, when that finds nothing, within a small edit
+        distance, and against the whole names, where the subsequence may
+        cross separators ('pltcmp' finds plate_comp). Only the documents of
+        the matched tokens and names get a score, and the best of them are
+        re-ranked on their name with a bounded heap. Returns None as soon as
+        `cancelled()` is true.
+        """
+        if not isinstance(query, ParsedQuery):
+            query = parse_query(query)
+        words = [piece for term in query.terms for piece in _token_pattern.findall(term)]
+        if not words:
+            return self.search(ParsedQuery([], query.filters), limit=limit)
+        with self.lock:
+            mask = self._filter_mask(query.filters)
+            if mask is None:
+                mask = np.frombuffer(bytes(self.live), dtype=np.bool_).copy()
+            total = np.zeros(len(self.doc_ids), dtype=np.float32)
+            for word in words:
+                matches = self._fuzzy_tokens(word, cancelled)
+                if matches is None:
+                    return None
+                scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+                # Ascending, so a document keeps the score of its best token
+                for token, score in sorted(matches.items(), key=lambda item: item[1]):
+                    scores[_to_numpy(self.tokens[token], np.uint32)] = score
+                docs = self._fuzzy_names(word, cancelled)
+                if docs is None:
+                    return None
+                # Matches across separators, only scored here where no token matched
+                docs = docs[mask[docs] & (scores[docs] == 0)]
+                names = self._names[0]
+                scores[docs] = [max(1, fuzzy_score(word, names[doc])) for doc in docs.tolist()]
+                mask &= scores > 0
+                total += scores
+
+            candidates = np.flatnonzero(mask)
+            pool = limit * 4
+            if len(candidates) > pool:
+                best = np.argpartition(-total[candidates], pool)[:pool]
+                candidates = candidates[best]
+            if cancelled is not None and cancelled():
+                return None
+
+            # Final ranking: token scores plus how well the words match the name itself
+            texts = self.texts
+            ranked = []
+            for doc in candidates.tolist():
+                name = texts[doc].split("\n", 1)[0]
+                score = float(total[doc])
+                for word in words:
+                    score += fuzzy_score(word, name) or 0
+                ranked.append((score, -len(name), -doc))
+            best = heapq.nlargest(limit, ranked)
+            return [self.doc_ids[-doc] for _, _, doc in best]
+
+    def _fuzzy_tokens(self, word, cancelled=None):
+        """{vocabulary token: score} for one fuzzy query word, None if cancelled"""
+        tokens, lengths, signatures = self._vocabulary_arrays()
+        signature = char_signature(word)
+
+        # Typing extends the word: tokens matching 'bea' are the only ones that can match 'beau'
+        pool = None
+        for length in range(len(word) - 1, 0, -1):
+            cached = self._fuzzy_cache.get(word[:length])
+            if cached is not None and cached[0] == len(tokens):
+                pool = cached[1]
+                break
+        if pool is None:
+            # A subsequence needs every character of the word and enough length
+            keep = ((signatures & np.uint64(signature)) == np.uint64(signature)) & (lengths >= len(word))
+            pool = [tokens[i] for i in np.flatnonzero(keep).tolist()]
+
+        matcher = re.compile('.*?'.join(map(re.escape, word))).search
+        matches = {}
+        for number, token in enumerate(pool):
+            if number % 4096 == 0 and cancelled is not None and cancelled():
+                return None
+            if matcher(token):
+                matches[token] = max(1, fuzzy_score(word, token))
+        if len(self._fuzzy_cache) > 64:
+            self._fuzzy_cache.clear()
+        self._fuzzy_cache[word] = (len(tokens), list(matches))
+
+        budget = typo_budget(word)
+        if not matches and budget:
+            # Fallback for typos: each edit flips at most two letter bits
+            keep = (np.abs(lengths - len(word)) <= budget) & \
+                   (_popcount(signatures ^ np.uint64(signature)) <= 2 * budget)
+            for i in np.flatnonzero(keep).tolist():
+                distance = edit_distance(word, tokens[i], budget)
+                if distance <= budget:
+                    matches[tokens[i]] = max(1, SCORE_MATCH * (len(word) - distance) // 2)
+        return matches
+
+    def _fuzzy_names(self, word, cancelled=None):
+        """Documents whose name has `word` as a subsequence, None if cancelled"""
+        names, signatures = self._name_arrays()
+        docs = None
+        # As for tokens: the names matching 'bea' are the only ones that can match 'beau'
+        for length in range(len(word) - 1, 0, -1):
+            cached = self._fuzzy_name_cache.get(word[:length])
+            if cached is not None and cached[0] == len(names):
+                docs = cached[1]
+                break
+        if docs is None:
+            signature = np.uint64(char_signature(word))
+            docs = np.flatnonzero((signatures & signature) == signature)
+
+        matcher = re.compile('.*?'.join(map(re.escape, word))).search
+        matched = []
+        for number, doc in enumerate(docs.tolist()):
+            if number % 4096 == 0 and cancelled is not None and cancelled():
+                return None
+            if matcher(names[doc]):
+                matched.append(doc)
+        matched = np.array(matched, dtype=np.int64)
+        if len(self._fuzzy_name_cache) > 16:
+            self._fuzzy_name_cache.clear()
+        self._fuzzy_name_cache[word] = (len(names), matched)
+        return matched
+
+    def _name_arrays(self):
+        """Names of the documents and their character signatures as a numpy array.
+
+        Documents are only ever added, so new ones are appended to the lists.
+        """
+        names, signatures, array_ = self._names
+        if array_ is None or len(names) != len(self.doc_ids):
+            for text in itertools.islice(self.texts, len(names), None):
+                name = text.split("\n", 1)[0] if text is not None else ''
+                names.append(name)
+                signatures.append(char_signature(name))
+            array_ = np.array(signatures, dtype=np.uint64)
+            self._names = (names, signatures, array_)
+        return names, array_
+
+    def _vocabulary_arrays(self):
+        """Tokens with their lengths and character signatures as numpy arrays.
+
+        Tokens are only ever added, so new ones are appended to the lists.
+        """
+        tokens, lengths, signatures, arrays = self._vocabulary
+        if arrays is None or len(tokens) != len(self.tokens):
+            for token in itertools.islice(self.tokens, len(tokens), None):
+                tokens.append(token)
+                lengths.append(len(token))
+                signatures.append(char_signature(token))
+            arrays = (np.array(lengths, dtype=np.int64), np.array(signatures, dtype=np.uint64))
+            self._vocabulary = (tokens, lengths, signatures, arrays)
+        return (tokens,) + arrays
+
+    # ---- persistence (.db/search_index.json) ----
+
+    def save(self, path=None):
+        path = path or self.path
+        if not path:
+            return
+        with self.lock:
+            if len(self.doc_ids) > 2 * len(self.doc_for_id):
+                # Mostly superseded documents after many rescans
+                self._compact()
+            data = {
+                "version": self.VERSION,
+                "doc_ids": self.doc_ids,
+                "texts": self.texts,
+                "tokens": _encode_postings(self.tokens),
+                "ctimes": _encode_array(self.ctimes),
+                "frames": _encode_array(self.frames),
+                "types": _encode_postings(self.types),
+                "exts": _encode_postings(self.exts),
+            }
+            self.dirty = False
+        save_json(path, data)
+
+    def load(self, path=None):
+        """Load a saved index, returns False if there is none (or it is unreadable)"""
+        path = path or self.path
+        data = load_json(path) if path else None
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            return False
+        try:
+            tokens = _decode_postings(data["tokens"])
+            ctimes = _decode_array('d', data["ctimes"])
+            frames = _decode_array('I', data["frames"])
+            types = _decode_postings(data["types"])
+            exts = _decode_postings(data["exts"])
+        except (ValueError, KeyError) as e:
+            print(f"Could not load search index {path}: {e}")
+            return False
+
+        with self.lock:
+            if self.doc_ids:
+                # Assets were indexed while the file loaded, they are newer
+                return False
+            self._reset()
+            self.doc_ids = data["doc_ids"]
+            self.texts = data["texts"]
+            self.live = bytearray(text is not None for text in self.texts)
+            self.doc_for_id = {asset_id: doc for doc, asset_id in enumerate(self.doc_ids)
+                               if self.texts[doc] is not None}
+            self.superseded = len(self.doc_ids) - len(self.doc_for_id)
+            self.tokens = tokens
+            # The vocabulary trigram index is small, rebuild it instead of storing it
+            for token in tokens:
+                self._index_token(token)
+            self.ctimes = ctimes
+            self.frames = frames
+            self.types = types
+            self.exts = exts
+            self.dirty = False
+        return True
+
+
+class SearchQueryWorker(QThread):
+    """Runs index queries off the GUI thread.
+
+    Only the latest submitted query matters: older ones still waiting are
+    skipped. Results are streamed back in chunks, each tagged with the
+    query generation so the receiver can ignore stale ones.
+    """
+
+    # generation, asset ids, first chunk of this query, last chunk of this query
+    results_ready = pyqtSignal(int, list, bool, bool)
+
+    def __init__(self, index, chunk_size=20000, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.chunk_size = chunk_size
+        self.generation = 0
+        self._query = None
+        self._condition = threading.Condition()
+        self.is_stopped = False
+
+    def submit(self, query):
+        """Queue a query, returns its generation number"""
+        with self._condition:
+            self.generation += 1
+            self._query = (self.generation, query)
+            self._condition.notify()
+            return self.generation
+
+    def stop(self):
+        with self._condition:
+            self.is_stopped = True
+            self._condition.notify()
+
+    def run(self):
+        # Loading a saved index can take a moment on big libraries, do it here
+        if self.index.path:
+            self.index.load()
+
+        while True:
+            with self._condition:
+                while self._query is None and not self.is_stopped:
+                    self._condition.wait()
+                if self.is_stopped:
+                    return
+                generation, query = self._query
+                self._query = None
+
+            try:
+                if not isinstance(query, ParsedQuery):
+                    query = parse_query(query)
+                if query.fuzzy:
+                    ids = self.index.fuzzy_search(query, cancelled=lambda: generation != self.generation)
+                    if ids is None:
+                        continue  # a newer keystroke arrived
+                else:
+                    ids = self.index.search(query)
+            except QueryError as e:
+                print(f"Invalid search query: {e}")
+                ids = []
+
+            chunks = [ids[i:i + self.chunk_size] for i in range(0, len(ids), self.chunk_size)] or [[]]
+            for number, chunk in enumerate(chunks):
+                if generation != self.generation:
+                    break  # a newer query arrived, stop streaming this one
+                self.results_ready.emit(generation, chunk, number == 0, number == len(chunks) - 1)
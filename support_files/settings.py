@@ -3,7 +3,7 @@ import os
 from PyQt5 import QtWidgets, QtGui, QtCore
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QIcon
-from PyQt5 import uic
+from support_files.ui_loader import load_ui
 import getpass
 from appdirs import user_config_dir
 import json
@@ -37,6 +37,10 @@ class LocalAssetBrowserSettings(QtWidgets.QWidget):
                     settings = json.load(f)
                     self.ui.root_dir.setText(settings.get("root_directory", ""))
                     self.ui.external_player.setText(settings.get("external_player", ""))
+                    self.ui.check_sequences.setChecked(settings.get("check_sequences", True))
+                    self.ui.farm_thumbnails.setChecked(settings.get("farm_thumbnails", False))
+                    self.ui.thumbnail_workers_min.setValue(settings.get("thumbnail_workers_min", 1))
+                    self.ui.thumbnail_workers_max.setValue(settings.get("thumbnail_workers_max", os.cpu_count() or 1))
             except json.JSONDecodeError:
                 # create an empty one if corrupted
                 with open(config_file, 'w') as f:
@@ -49,7 +53,12 @@ class LocalAssetBrowserSettings(QtWidgets.QWidget):
             external_player = self.ui.external_player.text()
             settings = {
                 "root_directory": root_dir,
-                "external_player": external_player
+                "external_player": external_player,
+                "check_sequences": self.ui.check_sequences.isChecked(),
+                "farm_thumbnails": self.ui.farm_thumbnails.isChecked(),
+                "thumbnail_workers_min": self.ui.thumbnail_workers_min.value(),
+                "thumbnail_workers_max": max(self.ui.thumbnail_workers_min.value(),
+                                             self.ui.thumbnail_workers_max.value())
             }
             f.write(json.dumps(settings, indent=4))
 
@@ -72,12 +81,13 @@ class LocalAssetBrowserSettings(QtWidgets.QWidget):
         return config_file  
         
     def setup_ui(self):
-        uic_path = os.path.join(os.path.dirname(__file__), '..', 'ui', 'settings.ui')
-        self.ui = uic.loadUi(uic_path, self)
+        self.ui = load_ui('settings', self)
         self.ui.save_button.clicked.connect(self.save_settings)
         self.ui.cancel_button.clicked.connect(self.close)
         self.ui.set_player_button.clicked.connect(self.set_external_player)
         self.ui.set_root_button.clicked.connect(self.set_root)
+        # Default upper bound of the adaptive thumbnail concurrency: the cores
+        self.ui.thumbnail_workers_max.setValue(os.cpu_count() or 1)
         self.setWindowFlags(Qt.Window | Qt.WindowTitleHint | Qt.CustomizeWindowHint)
 
 
@@ -0,0 +1,355 @@
+import os
+import time
+import socket
+import uuid
+
+from support_files.diagnostics import metrics
+from support_files.library import db_path, load_json, save_json, share_time
+
+
+# Several browsers and indexers can work on one library at once. The
+# database stays a plain {id: info} snapshot in .db/database.json, but
+# nobody rewrites it wholesale any more:
+#
+#   database_state.json   {"generation": g, "snapshot": s}
+#   journal/<g>.json      the changes of one save: per asset the fields set
+#                         and removed, a full entry for new assets, None
+#                         for removed ones
+#   database.lock         the writer lease, held for the length of one save
+#
+# A save diffs the database against what the writer last synced, appends
+# the difference as the next generation and every `compact_every`
+# generations folds the journal into a new snapshot. Readers poll the
+# (tiny) state file and replay the journal entries they miss, so two
+# users' edits of different fields or assets never clobber each other;
+# the same field edited twice keeps the last save. Replaying in order is
+# idempotent, which makes a snapshot newer than the generation a reader
+# started from harmless.
+#
+# SQLite (WAL) would give the same guarantees on a local disk, but WAL needs
+# shared memory between the processes and is not safe on the network shares
+# libraries live on, while renames and exclusive creates are.
+
+STATE_FILE = 'database_state.json'
+JOURNAL_FOLDER = 'journal'
+_MISSING = object()
+
+
+class LockTimeout(Exception):
+    """The writer lease could not be acquired in time"""
+
+
+class WriterLock:
+    """Exclusive lock file, broken once it is older than `lease` seconds
+    (its holder crashed). Held for a save only, so waits are short."""
+
+    def __init__(self, path, lease=60, timeout=30):
+        self.path = path
+        self.lease = lease
+        self.timeout = timeout
+        # Unique per lock taken: threads of one process lock too
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def __enter__(self):
+        started = time.perf_counter()
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                self._break_if_stale()
+            else:
+                os.write(fd, self.owner.encode('utf-8'))
+                os.close(fd)
+                metrics.record('db.lock_wait', started, time.perf_counter())
+                return self
+            if time.perf_counter() - started > self.timeout:
+                raise LockTimeout(f"{self.path} is held by {self._holder()}")
+            time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        # Not if it was broken meanwhile and someone else holds it now
+        if self._holder() != self.owner:
+            return
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _holder(self, path=None):
+        try:
+            with open(path or self.path, 'r') as f:
+                return f.read().strip() or 'unknown'
+        except OSError:
+            return 'unknown'
+
+    def _break_if_stale(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return
+        holder = self._holder()
+        age = share_time(os.path.dirname(self.path)) - mtime
+        if age <= self.lease:
+            return
+        # Renamed away first: of several processes breaking it, one wins
+        stale = f"{self.path}.{self.owner}.stale"
+        try:
+            os.rename(self.path, stale)
+        except OSError:
+            return
+        # The lock may have been released and taken again since the stat:
+        # only the lease seen stale is removed, a fresh one goes back
+        try:
+            fresh = os.stat(stale).st_mtime != mtime or self._holder(stale) != holder
+        except OSError:
+            return
+        if fresh:
+            self._restore(stale)
+            return
+        print(f"Breaking stale lock {os.path.basename(self.path)} of {holder} ({age:.0f}s old)")
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
+
+    def _restore(self, stale):
+        try:
+            # Unlike a rename, never replaces a lock taken meanwhile
+            os.link(stale, self.path)
+        except FileExistsError:
+            print(f"Lock {os.path.basename(self.path)} of {self._holder(stale)} was taken over by {self._holder()}")
+        except OSError:
+            # No hard links on this file system
+            try:
+                if not os.path.exists(self.path):
+                    os.rename(stale, self.path)
+                    return
+            except OSError:
+                pass
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
+
+
+def diff(old, new):
+    """Journal changes turning the {id: info} `old` into `new`"""
+    changes = {}
+    for asset_id, info in new.items():
+        previous = old.get(asset_id)
+        if previous is None:
+            changes[asset_id] = {'add': info}
+        elif info != previous:
+            changes[asset_id] = {'set': {key: value for key, value in info.items()
+                                         if key not in previous or previous[key] != value},
+                                 'unset': [key for key in previous if key not in info]}
+    for asset_id in old.keys() - new.keys():
+        changes[asset_id] = None
+    return changes
+
+
+class SharedDatabase:
+    """A library's database, safe to share between processes and hosts (see above).
+
+    load() returns the database, save() stores what changed in it since,
+    poll() (any thread) reads what others saved meanwhile and apply() merges
+    that in. Fields changed here and not saved yet win over those of others.
+    """
+
+    # Journal entries folded into a new snapshot
+    compact_every = 100
+    # Saves of more assets than this (or the first one) write a snapshot right away
+    compact_size = 5000
+
+    def __init__(self, root):
+        self.root = root
+        self.path = db_path(root, 'database.json')
+        self.state_path = db_path(root, STATE_FILE)
+        self.journal_path = db_path(root, JOURNAL_FOLDER)
+        # Generation of the last change merged in
+        self.generation = 0
+        # What the store holds as far as this process knows: {id: copy of info}
+        self.synced = {}
+
+    def lock(self):
+        # The first save of a library can come before anything else created .db
+        os.makedirs(db_path(self.root), exist_ok=True)
+        return WriterLock(db_path(self.root, 'database.lock'))
+
+    def state(self):
+        return load_json(self.state_path, {'generation': 0, 'snapshot': 0})
+
+    def _entry_path(self, generation):
+        return os.path.join(self.journal_path, f"{generation:010d}.json")
+
+    def _read(self):
+        """(generation, database) of the store: snapshot plus journal, None if
+        an entry was compacted away while reading"""
+        start = self.state().get('snapshot', 0)
+        database = load_json(self.path, {})
+        generation = self.state().get('generation', 0)
+        for number in range(start + 1, generation + 1):
+            entry = load_json(self._entry_path(number))
+            if entry is None:
+                return None
+            self._replay(database, entry['changes'])
+        return generation, database
+
+    def _read_retrying(self, attempts=5):
+        for _ in range(attempts):
+            loaded = self._read()
+            if loaded is not None:
+                return loaded
+        return None
+
+    def load(self):
+        """The stored database, and the base of the next save"""
+        with metrics.timer('db.load_shared'):
+            loaded = self._read_retrying()
+        if loaded is None:
+            # Compactions kept outrunning us: the snapshot alone, the rest comes with poll()
+            loaded = 0, load_json(self.path, {})
+        self.generation, database = loaded
+        self.synced = {asset_id: dict(info) for asset_id, info in database.items()}
+        return database
+
+    def save(self, database):
+        """Store the changes made to `database` since it was loaded or last
+        saved. Returns the number of assets changed (LockTimeout if another
+        writer holds the lock too long; nothing is lost, the next save
+        retries)."""
+        changes = diff(self.synced, database)
+        if not changes:
+            return 0
+        with metrics.timer('db.save_shared', assets=len(changes)), self.lock():
+            state = self.state()
+            generation = state.get('generation', 0) + 1
+            save_json(self._entry_path(generation), {'generation': generation, 'time': time.time(),
+                                                     'changes': changes})
+            state['generation'] = generation
+            save_json(self.state_path, state)
+            if self.generation == generation - 1:
+                self.generation = generation  # nobody else saved meanwhile
+            if (generation - state.get('snapshot', 0) >= self.compact_every or len(changes) > self.compact_size
+                    or not os.path.exists(self.path)):
+                self._compact(state)
+        for asset_id, info in database.items():
+            if asset_id in changes:
+                self.synced[asset_id] = dict(info)
+        for asset_id, change in changes.items():
+            if change is None:
+                self.synced.pop(asset_id, None)
+        metrics.count('db.saved_assets', len(changes))
+        return len(changes)
+
+    def compact(self):
+        """Fold the journal into a new database.json"""
+        with self.lock():
+            self._compact(self.state())
+
+    def _compact(self, state):
+        # Under the lock: the store's content, not this process' unsaved one
+        with metrics.timer('db.compact'):
+            database = load_json(self.path, {})
+            for number in range(state.get('snapshot', 0) + 1, state['generation'] + 1):
+                entry = load_json(self._entry_path(number))
+                if entry is not None:
+                    self._replay(database, entry['changes'])
+            save_json(self.path, database, indent=4)
+            state['snapshot'] = state['generation']
+            save_json(self.state_path, state)
+        # The last entries stay, for readers a little behind
+        names = os.listdir(self.journal_path) if os.path.isdir(self.journal_path) else []
+        for name in names:
+            if name.endswith('.json') and int(name[:-len('.json')]) <= state['snapshot'] - self.compact_every:
+                try:
+                    os.remove(os.path.join(self.journal_path, name))
+                except FileNotFoundError:
+                    pass
+
+    def poll(self):
+        """(generation, changes) saved by others since the last merge, None if
+        there are none. Only reads files, safe off the GUI thread."""
+        known = self.generation
+        generation = self.state().get('generation', 0)
+        if generation == known:
+            return None
+        if generation < known:
+            return self._reload()  # the store was recreated
+        changes = []
+        for number in range(known + 1, generation + 1):
+            entry = load_json(self._entry_path(number))
+            if entry is None:
+                return self._reload()  # too far behind, compacted away
+            changes.append(entry['changes'])
+        return generation, changes
+
+    def _reload(self):
+        loaded = self._read_retrying()
+        if loaded is None:
+            return None
+        generation, database = loaded
+        return generation, [{'snapshot': database}]
+
+    def apply(self, database, generation, changes):
+        """Merge what poll() returned into `database`. Returns the sets of
+        (changed, added, removed) asset ids."""
+        changed, added, removed = set(), set(), set()
+        if generation <= self.generation:
+            return changed, added, removed  # merged meanwhile (a save of ours caught up)
+        for entry in changes:
+            if 'snapshot' in entry:
+                entry = diff(self.synced, entry['snapshot'])
+            for asset_id, change in entry.items():
+                if change is None:
+                    self.synced.pop(asset_id, None)
+                    if database.pop(asset_id, None) is not None:
+                        removed.add(asset_id)
+                    continue
+                if 'add' in change and asset_id not in database:
+                    self.synced[asset_id] = dict(change['add'])
+                    database[asset_id] = dict(change['add'])
+                    added.add(asset_id)
+                    continue
+                fields = change.get('add') or change.get('set', {})
+                unset = change.get('unset', ())
+                if self._merge(database, asset_id, fields, unset):
+                    changed.add(asset_id)
+        self.generation = generation
+        metrics.count('db.merged_assets', len(changed) + len(added) + len(removed))
+        return changed - added - removed, added - removed, removed
+
+    def _merge(self, database, asset_id, fields, unset):
+        """One asset's remote change, minus the fields changed here and not saved yet"""
+        info = database.get(asset_id)
+        synced = self.synced.get(asset_id)
+        if info is None or synced is None:
+            return False
+        merged = False
+        for key in list(fields) + list(unset):
+            local = info.get(key, _MISSING) != synced.get(key, _MISSING)
+            if key in fields:
+                synced[key] = fields[key]
+            else:
+                synced.pop(key, None)
+            if local or info.get(key, _MISSING) == synced.get(key, _MISSING):
+                continue
+            if key in synced:
+                info[key] = synced[key]
+            else:
+                del info[key]
+            merged = True
+        return merged
+
+    @staticmethod
+    def _replay(database, changes):
+        for asset_id, change in changes.items():
+            if change is None:
+                database.pop(asset_id, None)
+            elif 'add' in change:
+                database[asset_id] = dict(change['add'])
+            elif asset_id in database:
+                info = database[asset_id]
+                info.update(change['set'])
+                for key in change['unset']:
+                    info.pop(key, None)
@@ -0,0 +1,158 @@
+import threading
+from array import array
+from itertools import combinations
+
+import numpy as np
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage
+
+
+HASH_BITS = 64
+DEFAULT_MAX_DISTANCE = 10
+
+
+def dhash_images(images):
+    """64-bit difference hashes for a batch of QImages (None for null images).
+
+    Each image is reduced to 9x8 grey pixels by Qt, then the whole batch is
+    compared and packed to bits at once with numpy: bit = pixel brighter
+    than its right neighbour.
+    """
+    hashes = [None] * len(images)
+    rows = []
+    pixels = []
+    for row, image in enumerate(images):
+        if image is None or image.isNull():
+            continue
+        small = image.scaled(9, 8, Qt.IgnoreAspectRatio, Qt.SmoothTransformation) \
+            .convertToFormat(QImage.Format_Grayscale8)
+        data = small.constBits()
+        data.setsize(small.byteCount())
+        # Lines are padded to 4 bytes, keep the 9 real pixels
+        pixels.append(np.frombuffer(data, dtype=np.uint8).reshape(8, small.bytesPerLine())[:, :9].copy())
+        rows.append(row)
+    if not pixels:
+        return hashes
+
+    batch = np.stack(pixels).astype(np.int16)
+    bits = batch[:, :, 1:] > batch[:, :, :-1]  # (n, 8, 8)
+    packed = np.packbits(bits.reshape(len(pixels), HASH_BITS), axis=1)  # (n, 8) bytes, big endian
+    values = packed.view('>u8').reshape(-1)
+    for row, value in zip(rows, values.tolist()):
+        hashes[row] = value
+    return hashes
+
+
+def dhash_files(paths):
+    """dhash_images() for image files (thumbnails)"""
+    return dhash_images([QImage(path) if path else None for path in paths])
+
+
+def hash_to_hex(value):
+    return f"{value:016x}"
+
+
+def _popcount(values):
+    return np.unpackbits(values.view(np.uint8)).reshape(len(values), HASH_BITS).sum(axis=1)
+
+
+class SimilarityIndex:
+    """Multi-index hashing over 64-bit perceptual hashes.
+
+    The hash is split into 4 chunks of 16 bits with one lookup table each.
+    Two hashes within distance d share at least one chunk within d // 4
+    (pigeonhole), so a query only probes the table buckets near its own
+    chunks and checks those few candidates, vectorized, instead of
+    comparing against every asset.
+    """
+
+    CHUNKS = 4
+    CHUNK_BITS = HASH_BITS // CHUNKS
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.ids = []  # row -> asset id (None once replaced)
+            self.hashes = array('Q')  # row -> hash
+            self.row_for_id = {}
+            self.tables = [{} for _ in range(self.CHUNKS)]  # chunk value -> rows
+
+    def __len__(self):
+        return len(self.row_for_id)
+
+    def _chunks(self, value):
+        mask = (1 << self.CHUNK_BITS) - 1
+        return [(value >> (self.CHUNK_BITS * i)) & mask for i in range(self.CHUNKS)]
+
+    def add(self, asset_id, value):
+        with self.lock:
+            old = self.row_for_id.get(asset_id)
+            if old is not None:
+                if self.hashes[old] == value:
+                    return
+                self.ids[old] = None
+            row = len(self.ids)
+            self.ids.append(asset_id)
+            self.hashes.append(value)
+            self.row_for_id[asset_id] = row
+            for table, chunk in zip(self.tables, self._chunks(value)):
+                table.setdefault(chunk, []).append(row)
+
+    def remove(self, asset_id):
+        """Forget an asset, its row stays in the tables like a replaced one"""
+        with self.lock:
+            row = self.row_for_id.pop(asset_id, None)
+            if row is not None:
+                self.ids[row] = None
+
+    def hash_of(self, asset_id):
+        row = self.row_for_id.get(asset_id)
+        return None if row is None else self.hashes[row]
+
+    def similar(self, asset_id, max_distance=DEFAULT_MAX_DISTANCE, limit=500):
+        """[(distance, asset id)] of the assets that look like `asset_id`, closest first"""
+        value = self.hash_of(asset_id)
+        if value is None:
+            return []
+        return [(distance, other) for distance, other in self.neighbours(value, max_distance, limit + 1)
+                if other != asset_id][:limit]
+
+    def neighbours(self, value, max_distance=DEFAULT_MAX_DISTANCE, limit=500):
+        """[(distance, asset id)] within `max_distance` bits of `value`, closest first"""
+        chunk_distance = max_distance // self.CHUNKS
+        flips = _flip_masks(self.CHUNK_BITS, chunk_distance)
+        with self.lock:
+            candidates = set()
+            for table, chunk in zip(self.tables, self._chunks(value)):
+                for flip in flips:
+                    rows = table.get(chunk ^ flip)
+                    if rows:
+                        candidates.update(rows)
+            if not candidates:
+                return []
+            rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            hashes = np.frombuffer(self.hashes, dtype=np.uint64)[rows]
+            distances = _popcount(hashes ^ np.uint64(value))
+            keep = distances <= max_distance
+            rows, distances = rows[keep], distances[keep]
+            order = np.lexsort((rows, distances))[:limit]
+            ids = self.ids
+            return [(int(distances[i]), ids[rows[i]]) for i in order.tolist() if ids[rows[i]] is not None]
+
+
+_flip_cache = {}
+
+
+def _flip_masks(bits, distance):
+    """Every `bits`-wide mask with at most `distance` bits set"""
+    key = (bits, distance)
+    if key not in _flip_cache:
+        masks = [0]
+        for count in range(1, distance + 1):
+            for positions in combinations(range(bits), count):
+                masks.append(sum(1 << p for p in positions))
+        _flip_cache[key] = masks
+    return _flip_cache[key]
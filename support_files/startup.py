@@ -0,0 +1,63 @@
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+
+class StartupProgress(QObject):
+    """Progress of the start up, for the splash screen.
+
+    Startup is split into weighted phases; the running phase reports its
+    own 0-100 progress and the overall percent is the weighted sum. Starting
+    a phase completes the ones before it (the scan is skipped when a stored
+    database is shown first). `changed` is only sent when the text or the
+    percent moved, at most once per `interval_ms`. `ready` is sent once,
+    when the first page of assets can be seen.
+    """
+    changed = pyqtSignal(str, int)
+    ready = pyqtSignal()
+
+    # Thumbnails and metadata are generated after the window is shown
+    PHASES = (('database', 10), ('scan', 45), ('view', 45))
+    interval_ms = 33  # ~30 Hz
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.progress = {name: 0.0 for name, _ in self.PHASES}
+        self.phase = self.PHASES[0][0]
+        self.text = 'Initializing...'
+        self.done = False
+        self._sent = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.interval_ms)
+        self._timer.timeout.connect(self._send)
+
+    def begin(self, phase, text=None):
+        names = [name for name, _ in self.PHASES]
+        for name in names[:names.index(phase)]:
+            self.progress[name] = 1.0
+        self.phase = phase
+        self.report(text or self.text, 0)
+
+    def report(self, text, percent=None):
+        """Status of the running phase, percent of that phase (None keeps the last one)"""
+        self.text = text
+        if percent is not None:
+            self.progress[self.phase] = max(0.0, min(1.0, percent / 100))
+        if not self.done and not self._timer.isActive():
+            self._timer.start()
+
+    def percent(self):
+        total = sum(weight for _, weight in self.PHASES)
+        return int(sum(self.progress[name] * weight for name, weight in self.PHASES) / total * 100)
+
+    def finish(self):
+        if self.done:
+            return
+        self.done = True
+        self._timer.stop()
+        self.ready.emit()
+
+    def _send(self):
+        state = (self.text, self.percent())
+        if state != self._sent:
+            self._sent = state
+            self.changed.emit(*state)
@@ -0,0 +1,383 @@
+import os
+import time
+import hashlib
+import threading
+import subprocess
+import concurrent.futures
+import multiprocessing
+
+from support_files.diagnostics import metrics
+from support_files.duplicates import DUPLICATE_KEYS, DuplicateFinder
+from support_files.library import load_json, save_json
+from support_files.metadata import find_tool
+from support_files.shared_db import LockTimeout, WriterLock
+
+
+# Qt-free: BackGroundWorker runs this in the GUI, LocalAssetIndexer.py on its own
+
+QUEUE_FILE = 'thumbnail_queue.json'
+
+
+def input_bytes(file):
+    """Size of what the encoder reads for an asset (its first frame for sequences)"""
+    if not isinstance(file, dict):
+        return 0
+    if file.get('file_size'):
+        return file['file_size']
+    stat = source_stat(file.get('path', ''))
+    return stat[0] if stat else 0
+
+
+def source_stat(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime]
+
+
+class ThumbnailQueue:
+    """{asset id: {"state", "path", "stat", "tries", "thumbnail", "phash", "error"}} in .db/thumbnail_queue.json
+
+    States are 'pending', 'done' or 'failed'. A pass interrupted by a
+    close or a crash resumes from it: done assets get their stored
+    thumbnail back without being looked at again, and inputs that failed
+    `max_tries` times are skipped until the file changes. Saves merge into
+    the file under a lock file, so several passes (a stack expansion, the
+    headless indexer) can share it.
+    """
+
+    max_tries = 3
+    save_interval = 2.0
+
+    _save_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = load_json(path, {})
+        self._changed = {}
+        self._saved = time.monotonic()
+
+    def todo(self, key, path):
+        """True if the asset still needs a conversion (it is then marked pending)"""
+        entry = self.entries.get(key)
+        if entry and entry.get('path') == path:
+            if entry['state'] == 'done' and entry.get('thumbnail') and os.path.exists(entry['thumbnail']):
+                return False
+            if entry['state'] == 'failed' and entry.get('tries', 0) >= self.max_tries:
+                if entry.get('stat') == source_stat(path):
+                    return False
+                entry['tries'] = 0  # changed since: worth another go
+        tries = entry.get('tries', 0) if entry and entry.get('path') == path else 0
+        self._update(key, {'state': 'pending', 'path': path, 'tries': tries})
+        return True
+
+    def done(self, key, thumbnail):
+        self._update(key, dict(self.entries.get(key, {}), state='done', thumbnail=thumbnail, error=None))
+
+    def failed(self, key, error):
+        entry = self.entries.get(key, {})
+        self._update(key, dict(entry, state='failed', tries=entry.get('tries', 0) + 1, error=error,
+                               stat=source_stat(entry.get('path', ''))))
+        metrics.count('thumbnails.failed')
+
+    def set_phash(self, key, phash):
+        if key in self.entries:
+            self._update(key, dict(self.entries[key], phash=phash))
+
+    def _update(self, key, entry):
+        self.entries[key] = entry
+        self._changed[key] = entry
+        if time.monotonic() - self._saved > self.save_interval:
+            self.save()
+
+    def save(self):
+        if not self._changed:
+            return
+        self._saved = time.monotonic()
+        try:
+            # Threads of this process, then the other processes sharing the file
+            with self._save_lock, WriterLock(os.path.splitext(self.path)[0] + '.lock', timeout=10):
+                entries = load_json(self.path, {})
+                entries.update(self._changed)
+                save_json(self.path, entries)
+        except (LockTimeout, OSError) as e:
+            # Kept for the next save, the pass goes on
+            print(f"Could not save the thumbnail queue: {e}")
+            return
+        self._changed = {}
+
+
+class ThumbnailGenerator:
+    """Thumbnails for a set of assets, converted in parallel.
+
+    Copies of the same file (see DuplicateFinder) share the thumbnail of
+    their original. Results are written into the asset dicts ('thumbnail',
+    'phash' and the duplicate hashes) and reported through the callbacks as
+    they come.
+    """
+
+    # Thumbnails are hashed in batches of this many
+    phash_batch_size = 64
+
+    def __init__(self, thumbnail_path, assets, max_workers=None, find_duplicates=True, hasher=None,
+                 status=None, cancelled=None, on_thumbnail=None, on_phash=None, on_fields=None, queue=None,
+                 concurrency=None):
+        self.thumbnail_path = thumbnail_path
+        self.assets = assets
+        self.max_workers = max_workers
+        # Off for partial lists (e.g. the versions of one stack): duplicates
+        # are only meaningful across the whole library
+        self.find_duplicates = find_duplicates
+        # Perceptual hash of thumbnail files: paths -> ints (None when unreadable), skipped if None
+        self.hasher = hasher
+        self.status = status or (lambda text, percent: None)
+        self.cancelled = cancelled or (lambda: False)
+        self.on_thumbnail = on_thumbnail or (lambda key, path: None)
+        self.on_phash = on_phash or (lambda key, value: None)
+        # {key: {field: value, None if removed}} of the duplicate hashes that changed
+        self.on_fields = on_fields or (lambda updates: None)
+        # Optional ThumbnailQueue: what earlier passes did is not redone
+        self.queue = queue
+        # Optional AdaptiveConcurrency: how many conversions run at once follows
+        # the storage and CPU load instead of the fixed max_workers
+        self.concurrency = concurrency
+
+    def run(self):
+        # Copies of the same file share one thumbnail: find them before converting anything
+        duplicates = {}
+        if self.find_duplicates:
+            self.status('Checking for duplicates', 0)
+            before = {key: _duplicate_fields(file) for key, file in self.assets.items()}
+            with metrics.timer('thumbnails.duplicates'):
+                duplicates = DuplicateFinder(max_workers=min(4, self.max_workers or 4), status=self.status,
+                                             cancelled=self.cancelled).run(self.assets)
+            changed = {}
+            for key, file in self.assets.items():
+                fields = _duplicate_fields(file)
+                if fields != before[key]:
+                    changed[key] = fields
+            if changed:
+                self.on_fields(changed)
+        if duplicates:
+            print(f"Found {sum(len(copies) for copies in duplicates.values())} duplicate files")
+        to_convert = {key: file for key, file in self.assets.items() if 'duplicate_of' not in file}
+        to_hash = []
+        if self.queue is not None:
+            to_convert, to_hash = self._resume(to_convert)
+
+        # Run conversions in parallel, up to the CPU cores or as many as the concurrency controller allows
+        self.status('Generating thumbnails', 0)
+        max_workers = self.concurrency.maximum if self.concurrency is not None else self.max_workers
+        if not max_workers:
+            try:
+                max_workers = multiprocessing.cpu_count() or 1
+            except Exception:
+                max_workers = 1
+
+        # Don't create more workers than files
+        total_files = len(to_convert)
+        workers = min(max_workers, total_files) if total_files > 0 else 1
+
+        completed = 0
+        items = iter(to_convert.items())
+        future_to_key = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                # Only as many in flight as the current limit, the rest waits here
+                limit = self.concurrency.limit if self.concurrency is not None else workers
+                while len(future_to_key) < limit:
+                    item = next(items, None)
+                    if item is None:
+                        break
+                    key, file = item
+                    future_to_key[executor.submit(self._convert_one, file, time.perf_counter())] = key
+                if not future_to_key:
+                    break
+                done, _ = concurrent.futures.wait(future_to_key, return_when=concurrent.futures.FIRST_COMPLETED)
+                if self.cancelled():
+                    for pending in future_to_key:
+                        pending.cancel()
+                    break
+                for future in done:
+                    key = future_to_key.pop(future)
+                    file = self.assets.get(key)
+                    missing = None
+                    try:
+                        thumbnail_path = future.result()
+                        error = None if thumbnail_path else 'no thumbnail was written'
+                    except MissingEncoder as e:
+                        # Not the input's fault: stays pending
+                        thumbnail_path = error = None
+                        missing = str(e)
+                    except Exception as e:
+                        thumbnail_path = None
+                        error = str(e)
+                    if self.queue is not None and not self.cancelled():
+                        if thumbnail_path:
+                            self.queue.done(key, thumbnail_path)
+                        elif error:
+                            self.queue.failed(key, error)
+                    if self.concurrency is not None:
+                        self.concurrency.record(input_bytes(file))
+
+                    # attach thumbnail to file metadata if available
+                    if file is not None and thumbnail_path:
+                        file['thumbnail'] = thumbnail_path
+                        self.on_thumbnail(key, thumbnail_path)
+                        if 'phash' not in file:
+                            to_hash.append((key, thumbnail_path))
+                            if len(to_hash) >= self.phash_batch_size:
+                                self._hash_thumbnails(to_hash)
+                                to_hash = []
+
+                    completed += 1
+                    percent = int(completed / total_files * 100) if total_files else 100
+                    name = file.get('name') if isinstance(file, dict) and 'name' in file else str(key)
+                    progress = f'{completed}/{total_files}'
+                    if self.concurrency is not None:
+                        progress += f', {self.concurrency.describe()}'
+                    if thumbnail_path:
+                        self.status(f'Done generating thumbnail for {name} [{progress}]', percent)
+                    elif missing:
+                        self.status(f'Cannot generate thumbnail for {name}: {missing} [{progress}]', percent)
+                    else:
+                        self.status(f'Error generating thumbnail for {name}: {error} [{progress}]', percent)
+
+        if not self.cancelled():
+            self._hash_thumbnails(to_hash)
+            self._share_with_duplicates(duplicates)
+        if self.queue is not None:
+            self.queue.save()
+        if not self.cancelled():
+            self.status('All thumbnails generated', 100)
+        return duplicates
+
+    def _resume(self, to_convert):
+        """(assets the queue has no result for, (key, thumbnail) of done ones still to hash)
+
+        The others get their stored result back.
+        """
+        remaining = {}
+        to_hash = []
+        for key, file in to_convert.items():
+            path = file.get('path') if isinstance(file, dict) else file
+            if self.queue.todo(key, path):
+                remaining[key] = file
+                continue
+            entry = self.queue.entries[key]
+            if entry['state'] != 'done':
+                continue  # gave up on it
+            if file.get('thumbnail') != entry['thumbnail']:
+                file['thumbnail'] = entry['thumbnail']
+                self.on_thumbnail(key, entry['thumbnail'])
+            if entry.get('phash') and 'phash' not in file:
+                file['phash'] = entry['phash']
+                self.on_phash(key, entry['phash'])
+            elif 'phash' not in file:
+                # Interrupted before its batch was hashed
+                to_hash.append((key, entry['thumbnail']))
+        self.queue.save()
+        skipped = len(to_convert) - len(remaining)
+        if skipped:
+            print(f"{skipped} thumbnails already done or given up on in earlier passes")
+        return remaining, to_hash
+
+    def _share_with_duplicates(self, duplicates):
+        """Give every duplicate the thumbnail (and hash) of its original"""
+        for original, copies in duplicates.items():
+            source = self.assets[original]
+            if not source.get('thumbnail'):
+                continue
+            for key in copies:
+                file = self.assets[key]
+                file['thumbnail'] = source['thumbnail']
+                self.on_thumbnail(key, source['thumbnail'])
+                if source.get('phash'):
+                    file['phash'] = source['phash']
+                    self.on_phash(key, source['phash'])
+
+    def _hash_thumbnails(self, items):
+        """Perceptual-hash a batch of (key, thumbnail path) and store the results"""
+        if not items or self.hasher is None:
+            return
+        with metrics.timer('thumbnails.phash', count=len(items)):
+            hashes = self.hasher([path for _, path in items])
+        for (key, _), value in zip(items, hashes):
+            if value is None:
+                continue
+            self.assets[key]['phash'] = f"{value:016x}"
+            if self.queue is not None:
+                self.queue.set_phash(key, self.assets[key]['phash'])
+            self.on_phash(key, self.assets[key]['phash'])
+
+    def _convert_one(self, file, queued):
+        """Run a single conversion and return the thumbnail path"""
+        metrics.record('thumbnails.queue_wait', queued, time.perf_counter())
+        file_path = file.get('path') if isinstance(file, dict) else file
+        with metrics.timer('thumbnails.encode'):
+            return FFMPEGWorker(self.thumbnail_path, file_path, cancelled=self.cancelled).convert_tumbnail()
+
+
+def _duplicate_fields(file):
+    return {key: file.get(key) for key in DUPLICATE_KEYS} if isinstance(file, dict) else {}
+
+
+class MissingEncoder(Exception):
+    """ffmpeg/oiiotool is not installed"""
+
+
+class FFMPEGWorker():
+    def __init__(self, thumbnail_path, file_path, parent=None, cancelled=None):
+        self.parent = parent
+        self.file_path = file_path
+        self.root_path = thumbnail_path
+        # Bundled Windows builds, else whatever is on PATH (render nodes)
+        self.ffmpeg_executable = find_tool('ffmpeg')
+        self.oiiotool_executable = find_tool('oiiotool')
+        self.thumbnail_name = None
+        # The encoder is killed when this turns true
+        self.cancelled = cancelled or (lambda: False)
+
+    def convert_tumbnail(self):
+        """Generate thumbnail using FFMPEG (oiiotool for EXR and textures), None if it failed or was cancelled.
+
+        Raises MissingEncoder if the tool it needs isn't available.
+        """
+
+        #generate unique key for filename
+        hash_object = hashlib.sha1(self.file_path.encode('utf-8'))
+        self.thumbnail_name = hash_object.hexdigest()
+        tumbnail_path = os.path.join(self.root_path, self.thumbnail_name + '.jpeg')
+
+        if os.path.exists(tumbnail_path):
+            return tumbnail_path
+
+        if self.file_path.lower().endswith(('.exr', '.tx', '.tex')):
+            if not self.oiiotool_executable:
+                raise MissingEncoder('oiiotool not found')
+            command = [self.oiiotool_executable, self.file_path, '--ch', 'R,G,B', '--flatten', '-o', tumbnail_path]
+        else:
+            if not self.ffmpeg_executable:
+                raise MissingEncoder('ffmpeg not found')
+            command = [self.ffmpeg_executable, '-y', '-i', self.file_path, '-frames:v', '1', '-vf', 'format=rgb24,scale=-1:1080:force_original_aspect_ratio=decrease','-loglevel', 'error', tumbnail_path]
+
+        if not self._run(command):
+            # Killed: drop whatever it had written
+            if os.path.exists(tumbnail_path):
+                os.remove(tumbnail_path)
+            return None
+        return tumbnail_path if os.path.exists(tumbnail_path) else None
+
+    def _run(self, command):
+        """Run the encoder, False if it was killed on cancellation"""
+        process = subprocess.Popen(command)
+        while True:
+            try:
+                process.wait(timeout=0.1)
+                return True
+            except subprocess.TimeoutExpired:
+                if self.cancelled():
+                    process.kill()
+                    process.wait()
+                    return False
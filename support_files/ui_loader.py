@@ -0,0 +1,56 @@
+import os
+import glob
+import importlib.util
+
+from PyQt5.QtCore import PYQT_VERSION_STR
+from appdirs import user_cache_dir
+
+
+UI_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ui')
+CACHE_FOLDER = os.path.join(user_cache_dir("Local Asset Browser", "Local Asset Browser"), 'ui')
+
+
+def load_ui(name, widget):
+    """uic.loadUi(ui/<name>.ui, widget) without parsing the XML at every start.
+
+    The .ui file is compiled with pyuic once, into the user cache folder
+    under a name holding its mtime and the PyQt version, and later starts
+    only import that module. Like loadUi, every child widget becomes an
+    attribute of `widget`, which is returned.
+    """
+    ui_file = os.path.join(UI_FOLDER, name + '.ui')
+    try:
+        form = _compiled_form(name, ui_file)
+    except Exception as e:
+        print(f"Could not use a compiled {name}.ui, loading it directly: {e}")
+        from PyQt5 import uic
+        return uic.loadUi(ui_file, widget)
+    ui = form()
+    ui.setupUi(widget)
+    for attribute, value in vars(ui).items():
+        setattr(widget, attribute, value)
+    return widget
+
+
+def _compiled_form(name, ui_file):
+    stamp = f"{os.stat(ui_file).st_mtime_ns}_{PYQT_VERSION_STR.replace('.', '_')}"
+    module_path = os.path.join(CACHE_FOLDER, f"ui_{name}_{stamp}.py")
+    if not os.path.exists(module_path):
+        _compile(ui_file, module_path)
+        for stale in glob.glob(os.path.join(CACHE_FOLDER, f"ui_{name}_*.py")):
+            if stale != module_path:
+                os.remove(stale)
+    spec = importlib.util.spec_from_file_location(f"ui_{name}", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return next(getattr(module, attribute) for attribute in dir(module) if attribute.startswith('Ui_'))
+
+
+def _compile(ui_file, module_path):
+    # Only needed when a .ui file changed, uic itself is slow to import
+    from PyQt5 import uic
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    tmp_path = module_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        uic.compileUi(ui_file, f)
+    os.replace(tmp_path, module_path)
@@ -1,44 +1,291 @@
-from PyQt5.QtCore import QThread, pyqtSignal, QObject, Qt, QSize, QRect
+from PyQt5.QtCore import pyqtSignal, QObject, Qt, QSize, QRect, QRunnable, QThreadPool, QTimer
 from datetime import datetime
 from PyQt5 import QtWidgets, QtGui
-from PyQt5.QtGui import QPixmap, QColor, QPainter, QFont
+from PyQt5.QtGui import QPixmap, QColor, QPainter, QFont, QImage, QPainterPath
+from collections import OrderedDict, deque
 from functools import lru_cache
+import threading
+import time
 import os
 
+from support_files.asset_model import INTERNAL_KEYS, asset_search_text, asset_sort_keys
+from support_files.diagnostics import metrics
+from support_files.jobs import HIGH, LOW, Job
+from support_files.library import copy_assets
+
 
 # Simple pixmap cache with LRU eviction
 class PixmapCache:
     def __init__(self, max_size=100):
-        self.cache = {}
+        self.cache = OrderedDict()
         self.max_size = max_size
-        self.access_order = []
     
-    def get(self, path):
-        if path in self.cache:
+    def get(self, key):
+        pixmap = self.cache.get(key)
+        if pixmap is not None:
             # Move to end (most recently used)
-            self.access_order.remove(path)
-            self.access_order.append(path)
-            return self.cache[path]
-        return None
+            self.cache.move_to_end(key)
+            metrics.count('pixmap_cache.hit')
+        else:
+            metrics.count('pixmap_cache.miss')
+        return pixmap
     
-    def put(self, path, pixmap):
-        if path in self.cache:
-            self.access_order.remove(path)
+    def put(self, key, pixmap):
+        if key in self.cache:
+            self.cache.move_to_end(key)
         elif len(self.cache) >= self.max_size:
             # Remove least recently used
-            oldest = self.access_order.pop(0)
-            del self.cache[oldest]
-        
-        self.cache[path] = pixmap
-        self.access_order.append(path)
+            self.cache.popitem(last=False)
+        self.cache[key] = pixmap
     
     def clear(self):
         self.cache.clear()
-        self.access_order.clear()
 
 
-# Global pixmap cache
-pixmap_cache = PixmapCache(max_size=150)
+# Global pixmap cache, shared by the table and grid views
+pixmap_cache = PixmapCache(max_size=600)
+
+
+def tile_radius(width, height):
+    """Corner radius used for grid tiles of the given size"""
+    return min(width, height) // 10
+
+
+def rounded_tile_path(width, height):
+    """Rounded rectangle outline of a grid tile"""
+    radius = tile_radius(width, height)
+    path = QPainterPath()
+    path.addRoundedRect(0, 0, width, height, radius, radius)
+    return path
+
+
+_tile_masks = {}
+_tile_masks_lock = threading.Lock()
+
+
+def rounded_tile_mask(width, height):
+    """Return the antialiased rounded-corner alpha mask for a tile size.
+
+    The mask is rendered once per size and shared by every tile (and every
+    loader thread) of that size.
+    """
+    key = (width, height)
+    with _tile_masks_lock:
+        mask = _tile_masks.get(key)
+        if mask is None:
+            mask = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+            mask.fill(Qt.transparent)
+            painter = QPainter(mask)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.fillPath(rounded_tile_path(width, height), QColor(0, 0, 0))
+            painter.end()
+            # Only a handful of sizes are live at once (slider positions)
+            if len(_tile_masks) > 32:
+                _tile_masks.clear()
+            _tile_masks[key] = mask
+        return mask
+
+
+class ThumbnailLoadSignals(QObject):
+    # key, requested size, decoded image (None if the file could not be read)
+    loaded = pyqtSignal(object, QSize, object)
+
+
+class ThumbnailLoadJob(QRunnable):
+    """Decode and scale one thumbnail off the GUI thread (QImage is thread safe)"""
+
+    def __init__(self, key, path, size, tile, signals, queued):
+        super().__init__()
+        self.queued = queued
+        self.key = key
+        self.path = path
+        self.size = size
+        self.tile = tile
+        self.signals = signals
+
+    def run(self):
+        metrics.record('thumbnail_load.queue_wait', self.queued, time.perf_counter())
+        with metrics.timer('thumbnail_load.decode', tile=self.tile):
+            image = self.load()
+        self.signals.loaded.emit(self.key, self.size, image)
+
+    def load(self):
+        image = QImage(self.path) if os.path.exists(self.path) else QImage()
+        if image.isNull():
+            return None
+        if self.tile:
+            return self.render_tile(image, self.size)
+        return image.scaled(self.size, Qt.KeepAspectRatio, Qt.FastTransformation)
+
+    @staticmethod
+    def render_tile(image, size):
+        """Scale, center-crop and round the corners of a grid tile"""
+        w, h = size.width(), size.height()
+        # Fill the whole tile, cropping the overflow around the center
+        image = image.scaled(size, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
+        x = (image.width() - w) // 2
+        y = (image.height() - h) // 2
+        tile = image.copy(x, y, w, h).convertToFormat(QImage.Format_ARGB32_Premultiplied)
+
+        # Keep only the pixels under the shared rounded mask
+        painter = QPainter(tile)
+        painter.setCompositionMode(QPainter.CompositionMode_DestinationIn)
+        painter.drawImage(0, 0, rounded_tile_mask(w, h))
+        painter.end()
+        return tile
+
+
+class ThumbnailLoader(QObject):
+    """Asynchronous front-end to pixmap_cache.
+
+    Views ask for a thumbnail at a given size and get whatever is cached right
+    now (possibly at a previous size, or None); missing or stale entries are
+    decoded on a thread pool and `thumbnail_ready` fires once they are cached.
+
+    Requests are served visible-first: every paint moves its request to the
+    front of the queue, only as many decodes as pool threads are in flight,
+    and requests left at the back (scrolled out of view) are dropped.
+    """
+
+    thumbnail_ready = pyqtSignal(str)
+
+    def __init__(self, parent=None, max_queued=512):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(2, min(8, (os.cpu_count() or 2))))
+        self.signals = ThumbnailLoadSignals()
+        self.signals.loaded.connect(self._on_loaded)
+        self.max_queued = max_queued
+        self._queue = OrderedDict()  # key -> size, front = most recently painted
+        self._queued_at = {}  # key -> perf_counter() when first queued
+        self._in_flight = {}  # key -> size being decoded
+        self._running = 0
+        self._failed = set()
+
+    def request(self, path, size, tile=False, reload=True):
+        """Return the cached pixmap for path (any size) and schedule a load if needed.
+
+        tile:   True for finished grid tiles (filled, cropped and rounded),
+                False for table cells (fitted)
+        reload: if False a cached pixmap of the wrong size is returned as-is
+                without scheduling a new decode (used while a resize is settling)
+        """
+        key = (path, tile)
+        pixmap = pixmap_cache.get(key)
+        if pixmap is not None and (not reload or self.matches(pixmap, size, tile)):
+            return pixmap
+        if path in self._failed or self._in_flight.get(key) == size:
+            return pixmap
+
+        self._queue[key] = QSize(size)
+        self._queue.move_to_end(key, last=False)
+        self._queued_at.setdefault(key, time.perf_counter())
+        if len(self._queue) > self.max_queued:
+            # Painted long ago, it will be requested again if it scrolls back in
+            dropped, _ = self._queue.popitem(last=True)
+            self._queued_at.pop(dropped, None)
+            metrics.count('thumbnail_load.dropped')
+        self._dispatch()
+        return pixmap
+
+    def _dispatch(self):
+        """Start decodes from the front of the queue while pool threads are free"""
+        while self._queue and self._running < self.pool.maxThreadCount():
+            key, size = self._queue.popitem(last=False)
+            self._in_flight[key] = size
+            self._running += 1
+            self.pool.start(ThumbnailLoadJob(key, key[0], size, key[1], self.signals,
+                                             self._queued_at.pop(key, time.perf_counter())))
+
+    def failed(self, path):
+        return path in self._failed
+
+    def clear(self):
+        self.pool.clear()
+        self._running = self.pool.activeThreadCount()
+        self._queue.clear()
+        self._queued_at.clear()
+        self._in_flight.clear()
+        self._failed.clear()
+        pixmap_cache.clear()
+
+    @staticmethod
+    def matches(pixmap, size, tile):
+        """True if a cached pixmap is exactly what a load at `size` would produce"""
+        if tile:
+            return pixmap.size() == size
+        # Fitted pixmaps touch the bounding box on at least one side
+        return ((pixmap.width() == size.width() and pixmap.height() <= size.height()) or
+                (pixmap.height() == size.height() and pixmap.width() <= size.width()))
+
+    def _on_loaded(self, key, size, image):
+        self._running = max(0, self._running - 1)
+        if self._in_flight.get(key) == size:
+            del self._in_flight[key]
+            if image is None:
+                self._failed.add(key[0])
+            else:
+                pixmap_cache.put(key, QPixmap.fromImage(image))
+            self.thumbnail_ready.emit(key[0])
+        # else: a newer size was requested meanwhile, that job will deliver
+        self._dispatch()
+
+
+# Global loader, shared by the table and grid delegates
+_thumbnail_loader = None
+
+
+def thumbnail_loader():
+    """Return the shared ThumbnailLoader (created lazily, needs a QApplication)"""
+    global _thumbnail_loader
+    if _thumbnail_loader is None:
+        _thumbnail_loader = ThumbnailLoader()
+    return _thumbnail_loader
+
+
+class IncrementalBuilder(QObject):
+    """Feeds queued items to a callback on the GUI thread, a time budget per tick.
+
+    Items are applied in chunks of `chunk_size` until `budget_ms` has elapsed,
+    then the builder yields to the event loop (input, painting) and carries on
+    at the next tick. Fast machines therefore drain the queue in few ticks,
+    while slow ones stay responsive.
+    """
+
+    def __init__(self, apply_batch, budget_ms=8, chunk_size=256, parent=None):
+        super().__init__(parent)
+        self.apply_batch = apply_batch
+        self.budget = budget_ms / 1000.0
+        self.chunk_size = chunk_size
+        self.queue = deque()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self._tick)
+
+    def add(self, items):
+        self.queue.extend(items)
+        self._schedule()
+
+    def clear(self):
+        self.queue.clear()
+        self.timer.stop()
+
+    def pending(self):
+        return len(self.queue)
+
+    def _schedule(self):
+        if self.queue and not self.timer.isActive():
+            self.timer.start()
+
+    def _tick(self):
+        deadline = time.perf_counter() + self.budget
+        queue = self.queue
+        while queue and time.perf_counter() < deadline:
+            count = min(self.chunk_size, len(queue))
+            with metrics.timer('rows.insert', rows=count):
+                self.apply_batch([queue.popleft() for _ in range(count)])
+        self._schedule()
 
 
 class OptimizedTableDelegate(QtWidgets.QStyledItemDelegate):
@@ -49,6 +296,9 @@ class OptimizedTableDelegate(QtWidgets.QStyledItemDelegate):
         self.thumbnail_width = 100
         self.thumbnail_height = 100
         self.row_height = 110
+        # While the user drags the thumbnail slider or a header we only draw
+        # what is already cached (scaled on the fly) instead of reloading files
+        self.resizing = False
     
     def paint(self, painter, option, index):
         """Paint table cell content"""
@@ -60,6 +310,10 @@ class OptimizedTableDelegate(QtWidgets.QStyledItemDelegate):
     
     def paint_thumbnail(self, painter, option, index):
         """Paint a thumbnail with fallback to text"""
+        with metrics.timer('paint.table_thumbnail'):
+            self._paint_thumbnail(painter, option, index)
+
+    def _paint_thumbnail(self, painter, option, index):
         painter.save()
         
         # Fill background
@@ -69,36 +323,45 @@ class OptimizedTableDelegate(QtWidgets.QStyledItemDelegate):
             painter.fillRect(option.rect, option.palette.base())
         
         thumbnail_path = index.data(Qt.DisplayRole)
-        
-        if thumbnail_path and os.path.exists(thumbnail_path):
-            # Try to get from cache first
-            pixmap = pixmap_cache.get(thumbnail_path)
-            
-            if pixmap is None:
-                # Load and cache
-                pixmap = QPixmap(thumbnail_path)
-                if not pixmap.isNull():
-                    # Scale to fill cell while preserving aspect ratio
-                    # Use cell dimensions for max size, then scale down if needed
-                    cell_w = option.rect.width() - 4  # small padding
-                    cell_h = option.rect.height() - 4
-                    pixmap = pixmap.scaledToWidth(cell_w, Qt.FastTransformation)
-                    # If height exceeds cell height, scale by height instead
-                    if pixmap.height() > cell_h:
-                        pixmap = pixmap.scaledToHeight(cell_h, Qt.FastTransformation)
-                    pixmap_cache.put(thumbnail_path, pixmap)
-            
-            # Draw pixmap centered
-            if pixmap and not pixmap.isNull():
-                x = option.rect.x() + (option.rect.width() - pixmap.width()) // 2
-                y = option.rect.y() + (option.rect.height() - pixmap.height()) // 2
-                painter.drawPixmap(x, y, pixmap)
-            else:
-                self.paint_text(painter, option, "No Image")
+        # Scale to fill cell while preserving aspect ratio (small padding)
+        cell = QSize(max(1, option.rect.width() - 4), max(1, option.rect.height() - 4))
+
+        pixmap = None
+        if thumbnail_path:
+            # Cached pixmaps of another size are drawn scaled until the new one is decoded
+            pixmap = thumbnail_loader().request(thumbnail_path, cell, reload=not self.resizing)
+
+        if pixmap is not None and not pixmap.isNull():
+            target = self.fit_size(pixmap.width(), pixmap.height(), cell.width(), cell.height())
+            self.draw_centered(painter, option.rect, pixmap, target)
+        elif thumbnail_path and not thumbnail_loader().failed(thumbnail_path):
+            self.paint_text(painter, option, "Loading...")
         else:
             self.paint_text(painter, option, "No Image")
         
         painter.restore()
+
+    @staticmethod
+    def fit_size(width, height, cell_w, cell_h):
+        """Return the size `width`x`height` takes once fitted into the cell"""
+        if width <= 0 or height <= 0:
+            return QSize(cell_w, cell_h)
+        w = cell_w
+        h = max(1, int(height * cell_w / width))
+        if h > cell_h:
+            h = cell_h
+            w = max(1, int(width * cell_h / height))
+        return QSize(w, h)
+
+    @staticmethod
+    def draw_centered(painter, rect, pixmap, size):
+        """Draw pixmap centered in rect, scaled by the painter if size differs"""
+        x = rect.x() + (rect.width() - size.width()) // 2
+        y = rect.y() + (rect.height() - size.height()) // 2
+        if size == pixmap.size():
+            painter.drawPixmap(x, y, pixmap)
+        else:
+            painter.drawPixmap(QRect(x, y, size.width(), size.height()), pixmap)
     
     def paint_text(self, painter, option, text):
         """Paint fallback text"""
@@ -111,79 +374,175 @@ class OptimizedTableDelegate(QtWidgets.QStyledItemDelegate):
         return super().sizeHint(option, index)
 
 
-class TableBuilderWorker(QObject):
-    finished = pyqtSignal()
+def asset_info_text(info, database):
+    """Text of the Info column: date and every extra field (not name/type/path)"""
+    # ---- Convert ctime to readable date (only if present) ----
+    date_str = ""
+    if "ctime" in info:
+        try:
+            date_str = datetime.fromtimestamp(info["ctime"]).strftime("%Y-%m-%d %H:%M:%S")
+        except:
+            pass
+
+    # ---- Build the "extra info" section (without path) ----
+    extra_lines = []
+    if date_str:
+        extra_lines.append(f"Date: {date_str}")
+
+    # Only include extra fields (exclude standard ones)
+    excluded = {"name", "type", "path", "ctime", "thumbnail", "duplicate_of"} | INTERNAL_KEYS
+    for k, v in info.items():
+        if k not in excluded:
+            extra_lines.append(f"{k}: {v}")
+    if info.get("duplicate_of") in database:
+        extra_lines.append(f"duplicate of: {database[info['duplicate_of']].get('path', '')}")
+
+    return "\n".join(extra_lines)
+
+
+def asset_row(file_id, info, database):
+    """Row dict of one asset for AssetModel.add_rows, sort keys and search text included"""
+    row_data = {
+        'thumbnail': info.get("thumbnail", ""),
+        'name': info.get("name", ""),
+        'type': info.get("type", ""),
+        'extra_info': asset_info_text(info, database),
+        'path': info.get("path", ""),
+        'file_id': file_id,
+        'ctime': info.get("ctime", 0),
+    }
+    # Sort keys and search text are computed here, off the GUI thread
+    row_data['search_text'] = asset_search_text(info)
+    row_data['sort_keys'] = asset_sort_keys(row_data)
+    return row_data
+
+
+class TableBuilderWorker(Job):
     update_status = pyqtSignal(str, int)
-    # Signal to send batch of rows from worker thread to main thread
-    add_rows_batch = pyqtSignal(list)
+    # Signal to send batch of rows (tagged with the build id) from worker thread to main thread
+    add_rows_batch = pyqtSignal(int, list)
+    pool = 'cpu'
+    # What the user is waiting for
+    priority = HIGH
 
-    def __init__(self, parent=None, database=None):
+    def __init__(self, parent=None, database=None, build_id=0, search_index=None, similarity_index=None,
+                 version_stacks=None):
         super().__init__(parent)
-        self.database = database
-        self.is_running = True
-        
+        # Its own copies: the GUI thread keeps changing the database while rows are built
+        self.database = copy_assets(database or {})
+        self.build_id = build_id
+        self.search_index = search_index
+        self.similarity_index = similarity_index
+        # head id -> older version ids: only heads get a row, older versions are
+        # indexed for search but their rows are built when the stack is expanded
+        self.version_stacks = version_stacks or {}
 
     def run(self):
         if self.database:
             print("Building table widget...")
+            started = time.perf_counter()
             
             batch = []
             batch_size = 250  # Even larger batches since we're not creating widgets
             total = len(self.database)
             count = 0
+            older = {i for ids in self.version_stacks.values() for i in ids}
             
             for file_id, info in self.database.items():
-                if not self.is_running:
+                if self.cancelled():
                     break
                     
                 count += 1
-                
-                # Fast attribute access
-                thumbnail = info.get("thumbnail", "")
-                name = info.get("name", "")
-                type_ = info.get("type", "")
-                path = info.get("path", "")
-
-                # ---- Convert ctime to readable date (only if present) ----
-                date_str = ""
-                if "ctime" in info:
-                    try:
-                        date_str = datetime.fromtimestamp(info["ctime"]).strftime("%Y-%m-%d %H:%M:%S")
-                    except:
-                        pass
-
-                # ---- Build the "extra info" section (without path) ----
-                extra_lines = []
-                if date_str:
-                    extra_lines.append(f"Date: {date_str}")
-
-                # Only include extra fields (exclude standard ones)
-                excluded = {"name", "type", "path", "ctime", "thumbnail"}
-                for k, v in info.items():
-                    if k not in excluded:
-                        extra_lines.append(f"{k}: {v}")
-
-                extra_info_text = "\n".join(extra_lines)
-
-                # Add to batch with minimal data
-                row_data = {
-                    'thumbnail': thumbnail,
-                    'name': name,
-                    'type': type_,
-                    'extra_info': extra_info_text,
-                    'path': path,
-                    'file_id': file_id
-                }
+
+                if file_id in older:
+                    if self.search_index is not None:
+                        self.search_index.add(file_id, info)
+                    continue
+
+                row_data = asset_row(file_id, info, self.database)
+                if file_id in self.version_stacks:
+                    row_data['versions'] = len(self.version_stacks[file_id])
+                if self.search_index is not None:
+                    self.search_index.add(file_id, info, text=row_data['search_text'])
+                if self.similarity_index is not None and info.get("phash"):
+                    self.similarity_index.add(file_id, int(info["phash"], 16))
                 batch.append(row_data)
                 
-                # Emit batch when it reaches batch_size or at the end
-                if len(batch) >= batch_size or count == total:
-                    self.add_rows_batch.emit(batch)
-                    # Update status less frequently
-                    if count % (batch_size * 2) == 0 or count == total:
-                        progress = int((count / total) * 100)
-                        self.update_status.emit(f"Building table: {count}/{total}", progress)
+                # Emit batch when it reaches batch_size
+                if len(batch) >= batch_size:
+                    self.post(self.add_rows_batch, self.build_id, batch)
                     batch = []
+                # Update status less frequently
+                if count % (batch_size * 2) == 0:
+                    self.update_status.emit(f"Building table: {count}/{total}", int((count / total) * 100))
+
+            if batch and not self.cancelled():
+                self.post(self.add_rows_batch, self.build_id, batch)
+            self.update_status.emit(f"Building table: {count}/{total}", int((count / total) * 100))
             
             print(f"Finished building table widget. Total: {total} items.")
-        self.finished.emit()
\ No newline at end of file
+            metrics.record('table.build', started, time.perf_counter(), assets=total)
+            if self.search_index is not None and self.search_index.dirty:
+                with metrics.timer('search_index.save'):
+                    self.search_index.save()
+
+class MetadataWorker(Job):
+    """MetadataExtractor as a job: resolution, duration, fps, codec,
+    channels... sent to the main thread one batch at a time"""
+
+    # asset id -> new fields, one batch at a time
+    metadata_ready = pyqtSignal(dict)
+    set_status = pyqtSignal(str, int)
+    # Waits on the extraction process pool
+    pool = 'io'
+    priority = LOW
+
+    def __init__(self, database, cache_path, max_workers=None, parent=None):
+        super().__init__(parent)
+        # Its own copies, the metadata goes back through metadata_ready
+        self.database = copy_assets(database)
+        self.cache_path = cache_path
+        self.max_workers = max_workers
+
+    def run(self):
+        # Imported here: subprocess and process pool machinery are not needed for the first paint
+        from support_files.metadata import MetadataExtractor
+        MetadataExtractor(self.database, self.cache_path, self.max_workers,
+                          status=lambda text, percent: self.post(self.set_status, text, percent),
+                          cancelled=self.token, on_batch=lambda batch: self.post(self.metadata_ready, batch)).run()
+
+
+class FarmSubmitWorker(Job):
+    """Queues assets as render farm jobs (see farm.py), a few hundred small file writes"""
+    submitted = pyqtSignal(int)
+    pool = 'io'
+
+    def __init__(self, root_path, assets, parent=None):
+        super().__init__(parent)
+        self.root_path = root_path
+        self.assets = assets
+
+    def run(self):
+        from support_files.farm import FarmQueue
+        self.submitted.emit(FarmQueue(self.root_path).submit(self.assets))
+
+
+class FarmCollectWorker(Job):
+    """Picks up the results farm workers committed, and how the queue stands"""
+    # asset id -> thumbnail, phash and metadata fields
+    collected = pyqtSignal(dict)
+    # jobs per state: pending, claimed, done, failed
+    queue_counts = pyqtSignal(dict)
+    pool = 'io'
+
+    def __init__(self, root_path, parent=None):
+        super().__init__(parent)
+        self.root_path = root_path
+
+    def run(self):
+        from support_files.farm import FarmQueue
+        queue = FarmQueue(self.root_path)
+        updates = queue.collect(os.path.join(self.root_path, '.db', 'thumbnails'))
+        if updates:
+            self.collected.emit(updates)
+        self.queue_counts.emit(queue.counts())
@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from PyQt5.QtWidgets import QApplication
+
+from support_files.asset_model import AssetModel, AssetProxyModel, asset_sort_keys
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def make_rows(names, start=0):
+    rows = []
+    for i, name in enumerate(names, start):
+        row = {'thumbnail': '', 'name': name, 'type': 'image', 'extra_info': '', 'file_id': f"id{i}",
+               'path': f"/library/{name}", 'ctime': float(i)}
+        row['sort_keys'] = asset_sort_keys(row)
+        rows.append(row)
+    return rows
+
+
+def make_proxy(names, async_rows):
+    model = AssetModel()
+    proxy = AssetProxyModel()
+    proxy.async_filter_rows = async_rows
+    proxy._filter_timer.setInterval(0)
+    proxy.setSourceModel(model)
+    model.add_rows(make_rows(names))
+    return model, proxy
+
+
+def shown(proxy):
+    return [proxy.index(row, AssetModel.NAME).data() for row in range(proxy.rowCount())]
+
+
+def wait(app, proxy):
+    deadline = time.time() + 10
+    while proxy.filtering() and time.time() < deadline:
+        app.processEvents()
+        time.sleep(0.001)
+    assert not proxy.filtering()
+
+
+NAMES = ['smoke_fg.exr', 'fire_bg.exr', 'smoke_bg.exr', 'plate.exr']
+
+
+def test_small_filter_is_immediate(app):
+    model, proxy = make_proxy(NAMES, async_rows=100)
+    proxy.set_filter_text('smoke')
+    assert not proxy.filtering()
+    assert shown(proxy) == ['smoke_fg.exr', 'smoke_bg.exr']
+    proxy.set_filter_text('smoke bg')
+    assert shown(proxy) == ['smoke_bg.exr']
+    proxy.set_filter_text('')
+    assert len(shown(proxy)) == 4
+
+
+def test_large_filter_runs_as_a_job(app):
+    model, proxy = make_proxy(NAMES, async_rows=1)
+    filtered = []
+    proxy.filtered.connect(lambda: filtered.append(proxy.rowCount()))
+    proxy.set_filter_text('smoke')
+    assert proxy.filtering()
+    wait(app, proxy)
+    assert shown(proxy) == ['smoke_fg.exr', 'smoke_bg.exr']
+    assert filtered == [2]
+
+
+def test_only_the_last_query_is_shown(app):
+    model, proxy = make_proxy(NAMES, async_rows=1)
+    for text in ('f', 'fi', 'fir', 'fire'):
+        proxy.set_filter_text(text)
+    wait(app, proxy)
+    assert shown(proxy) == ['fire_bg.exr']
+
+
+def test_rows_added_while_filtering_are_kept(app):
+    model, proxy = make_proxy(NAMES, async_rows=1)
+    proxy.set_filter_text('bg')
+    model.add_rows(make_rows(['water_bg.exr', 'water_fg.exr'], start=len(NAMES)))
+    wait(app, proxy)
+    assert shown(proxy) == ['fire_bg.exr', 'smoke_bg.exr', 'water_bg.exr']
@@ -0,0 +1,46 @@
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import bench
+from benchmarks.synthetic import make_library
+
+TINY = ['--dirs', '2', '--sequences', '4', '--frames', '3', '--videos', '1', '--stills', '2', '--repeat', '1']
+
+
+def test_synthetic_library(tmp_path):
+    shape = {'dirs': 2, 'sequences': 4, 'frames': 3, 'videos': 1, 'stills': 2}
+    assert make_library(str(tmp_path), shape) == 2 * (4 * 3 + 1 + 2)
+    folder = tmp_path / 'seq000' / 'shot0001'
+    assert sorted(os.listdir(folder))[:3] == ['shot0001_clip000.mov', 'shot0001_comp00_v001.1001.exr',
+                                             'shot0001_comp00_v001.1002.exr']
+
+
+def test_run_and_compare(tmp_path, capsys):
+    output = str(tmp_path / 'before.json')
+    assert bench.main(TINY + ['--tmpdir', str(tmp_path), '--output', output]) == 0
+    with open(output) as f:
+        report = json.load(f)
+    assert set(report['results']) == set(bench.STAGES)
+    assert report['counts']['assets'] == 2 * (4 + 1 + 2)
+    assert report['counts']['rows'] > 0
+    assert report['counts']['thumbnails'] > 0
+    # The library is removed afterwards
+    assert os.listdir(tmp_path) == ['before.json']
+
+    # A baseline far faster than anything real: every stage regressed
+    for timing in report['results'].values():
+        timing['median'] = 1e-9
+    with open(output, 'w') as f:
+        json.dump(report, f)
+    assert bench.main(TINY + ['--tmpdir', str(tmp_path), '--stages', 'scan,db_load', '--compare', output]) == 1
+    assert capsys.readouterr().out.count('REGRESSION') == 2
+
+
+def test_compare_threshold():
+    baseline = {'results': {'scan': {'median': 1.0}, 'db_load': {'median': 1.0}, 'db_save': {'median': 0}}}
+    results = {'scan': {'median': 1.05}, 'db_load': {'median': 1.2}, 'db_save': {'median': 1.0},
+               'grouping': {'median': 1.0}}
+    assert bench.compare(results, baseline, threshold=0.1) == ['db_load']
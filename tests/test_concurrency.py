@@ -0,0 +1,70 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support_files import concurrency
+from support_files.concurrency import AdaptiveConcurrency
+
+
+class Clock:
+    """perf_counter and encoder CPU time the test moves forward"""
+
+    def __init__(self, monkeypatch, cpu=True):
+        self.now = 0.0
+        self.cpu = 0.0 if cpu else None
+        monkeypatch.setattr(concurrency.time, 'perf_counter', lambda: self.now)
+        monkeypatch.setattr(concurrency, 'cpu_seconds', lambda: self.cpu)
+
+
+def window(controller, clock, throughput, cpu_load=0.0):
+    """One second of jobs at `throughput` bytes/s using `cpu_load` of the cores"""
+    clock.now += 1
+    if clock.cpu is not None:
+        clock.cpu += cpu_load * controller.cpus
+    count = controller.limit
+    for _ in range(count):
+        controller.record(throughput / count)
+    return controller.limit
+
+
+def test_slow_start_then_throughput_drop(monkeypatch):
+    clock = Clock(monkeypatch)
+    controller = AdaptiveConcurrency(1, 32, cpus=32, min_window=0)
+    assert [window(controller, clock, mb * 1e6) for mb in (100, 200, 400)] == [4, 8, 16]
+    # NAS congested at 16: halved, then one at a time
+    assert window(controller, clock, 300e6) == 8
+    assert window(controller, clock, 250e6) == 9
+    assert window(controller, clock, 260e6) == 10
+
+
+def test_drop_without_a_raise_decreases(monkeypatch):
+    clock = Clock(monkeypatch)
+    controller = AdaptiveConcurrency(1, 8, cpus=8, min_window=0)
+    for _ in range(4):
+        window(controller, clock, 100e6)
+    assert controller.limit == 8
+    # At the maximum, the limit stays the same and the storage slows down
+    assert window(controller, clock, 100e6) == 8
+    assert window(controller, clock, 50e6) == 4
+    # Lower because of the decrease itself: not a new congestion
+    assert window(controller, clock, 30e6) == 5
+
+
+def test_encoder_saturation_decreases(monkeypatch):
+    clock = Clock(monkeypatch)
+    controller = AdaptiveConcurrency(1, 16, cpus=8, min_window=0)
+    assert window(controller, clock, 100e6, cpu_load=0.5) == 4
+    assert window(controller, clock, 100e6, cpu_load=0.95) == 2
+    assert round(controller.cpu_load, 2) == 0.95
+    assert window(controller, clock, 100e6, cpu_load=0.5) == 3
+
+
+def test_without_cpu_accounting_a_useless_raise_is_taken_back(monkeypatch):
+    clock = Clock(monkeypatch, cpu=False)
+    controller = AdaptiveConcurrency(1, 16, cpus=8, min_window=0)
+    assert [window(controller, clock, mb * 1e6) for mb in (100, 200, 400)] == [4, 8, 16]
+    # 16 workers read no more than 8 did
+    assert window(controller, clock, 410e6) == 8
+    assert controller.cpu_load is None
+    assert window(controller, clock, 400e6) == 9
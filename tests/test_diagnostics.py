@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support_files.diagnostics import Instrumentation, profile_report
+
+
+def test_timers():
+    metrics = Instrumentation()
+    metrics.record('scan.directory', 1.0, 1.5)
+    metrics.record('scan.directory', 2.0, 2.1)
+
+    @metrics.timed('db.load')
+    def load():
+        return 42
+    assert load() == 42
+    with metrics.timer('thumbnails.encode', path='a.exr'):
+        pass
+
+    timers = metrics.snapshot()['timers']
+    assert list(timers) == ['db.load', 'scan.directory', 'thumbnails.encode']
+    scan = timers['scan.directory']
+    assert scan['count'] == 2
+    assert round(scan['total_ms']) == 600
+    assert round(scan['mean_ms']) == 300
+    assert round(scan['min_ms']) == 100
+    assert round(scan['max_ms']) == 500
+    assert timers['db.load']['count'] == 1
+
+
+def test_counters_gauges_and_rates():
+    metrics = Instrumentation()
+    metrics.count('thumbnails.cache.hit', 3)
+    metrics.count('thumbnails.cache.miss')
+    metrics.count('scan.assets', 10)
+    metrics.gauge('thumbnails.limit', 4)
+    metrics.gauge('thumbnails.limit', 8)
+
+    snapshot = metrics.snapshot()
+    assert snapshot['counters'] == {'scan.assets': 10, 'thumbnails.cache.hit': 3, 'thumbnails.cache.miss': 1}
+    assert snapshot['gauges'] == {'thumbnails.limit': 8}
+    assert snapshot['rates'] == {'thumbnails.cache': 0.75}
+
+    metrics.reset()
+    assert metrics.snapshot() == {'timers': {}, 'counters': {}, 'gauges': {}, 'rates': {}}
+
+
+def test_disabled_records_nothing():
+    metrics = Instrumentation()
+    metrics.enabled = False
+    with metrics.timer('scan.walk'):
+        pass
+    metrics.count('scan.assets')
+    metrics.gauge('thumbnails.limit', 4)
+    assert metrics.snapshot() == {'timers': {}, 'counters': {}, 'gauges': {}, 'rates': {}}
+
+
+def test_threads_do_not_lose_counts():
+    metrics = Instrumentation()
+
+    def work():
+        for _ in range(1000):
+            metrics.count('jobs.done')
+            metrics.record('jobs.run', 0.0, 0.001)
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    snapshot = metrics.snapshot()
+    assert snapshot['counters']['jobs.done'] == 8000
+    assert snapshot['timers']['jobs.run']['count'] == 8000
+
+
+def test_chrome_trace(tmp_path):
+    metrics = Instrumentation(max_events=2)
+    for i in range(3):
+        metrics.record('scan.directory', metrics._origin + i, metrics._origin + i + 0.5, folder=i)
+    metrics.count('scan.assets', 5)
+
+    path = str(tmp_path / 'trace.json')
+    metrics.export_chrome_trace(path)
+    with open(path) as f:
+        trace = json.load(f)['traceEvents']
+    spans = [event for event in trace if event['ph'] == 'X']
+    # Only the most recent spans are kept, the totals count them all
+    assert [span['ts'] for span in spans] == [1e6, 2e6]
+    assert spans[0] == dict(spans[0], name='scan.directory', cat='scan', dur=5e5, args={'folder': '1'})
+    assert metrics.snapshot()['timers']['scan.directory']['count'] == 3
+    counter, = [event for event in trace if event['ph'] == 'C']
+    assert counter['args'] == {'value': 5}
+    assert counter['ts'] == 2.5e6
+
+
+def test_profile():
+    metrics = Instrumentation()
+    assert metrics.stop_profile() is None
+    metrics.start_profile()
+    assert metrics.profiling
+    sorted(range(1000), key=lambda value: -value)
+    stats = metrics.stop_profile()
+    assert not metrics.profiling
+    assert 'function calls' in profile_report(stats, limit=5)
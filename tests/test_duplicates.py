@@ -0,0 +1,82 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support_files import duplicates
+from support_files.duplicates import PARTIAL_BYTES, DuplicateFinder
+
+
+def write(folder, name, data):
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def make_assets(tmp_path):
+    big = os.urandom(3 * PARTIAL_BYTES)
+    # Same size and ends as `big`, another middle
+    middle = big[:PARTIAL_BYTES] + os.urandom(PARTIAL_BYTES) + big[-PARTIAL_BYTES:]
+    small = os.urandom(1000)
+    files = {
+        "original": ("a.mov", big, 1),
+        "copy": ("b.mov", big, 2),
+        "same_ends": ("c.mov", middle, 0),
+        "other_size": ("d.mov", os.urandom(2 * PARTIAL_BYTES), 0),
+        "small": ("e.jpg", small, 5),
+        "small_copy": ("f.jpg", small, 4),
+        "frames": ("g.exr", small, 3),
+    }
+    return {asset_id: {"path": write(str(tmp_path), name, data), "ctime": ctime,
+                       "type": "sequence" if asset_id == "frames" else "video"}
+            for asset_id, (name, data, ctime) in files.items()}
+
+
+def counting(monkeypatch, name):
+    calls = []
+    original = getattr(duplicates, name)
+
+    def counted(path, *args):
+        calls.append(os.path.basename(path))
+        return original(path, *args)
+    monkeypatch.setattr(duplicates, name, counted)
+    return calls
+
+
+def test_stages(tmp_path, monkeypatch):
+    assets = make_assets(tmp_path)
+    partial = counting(monkeypatch, "partial_hash")
+    full = counting(monkeypatch, "full_hash")
+
+    found = DuplicateFinder().run(assets)
+    # The oldest copy is the original, sequences are never compared
+    assert found == {"original": ["copy"], "small_copy": ["small"]}
+    assert assets["copy"]["duplicate_of"] == "original"
+    assert assets["small"]["duplicate_of"] == "small_copy"
+    assert "duplicate_of" not in assets["same_ends"]
+    # Only same-size files are read, and only the ones whose ends collide in full
+    assert sorted(partial) == ["a.mov", "b.mov", "c.mov", "e.jpg", "f.jpg"]
+    assert sorted(full) == ["a.mov", "b.mov", "c.mov"]
+    assert "partial_hash" not in assets["other_size"]
+    # Small files: their ends are the whole file
+    assert assets["small"]["content_hash"] == assets["small"]["partial_hash"]
+
+
+def test_hashes_are_kept_until_the_file_changes(tmp_path, monkeypatch):
+    assets = make_assets(tmp_path)
+    DuplicateFinder().run(assets)
+    partial = counting(monkeypatch, "partial_hash")
+    full = counting(monkeypatch, "full_hash")
+
+    assert DuplicateFinder().run(assets) == {"original": ["copy"], "small_copy": ["small"]}
+    assert partial == full == []
+
+    # Rewritten: same size, another content and mtime
+    path = assets["copy"]["path"]
+    write(str(tmp_path), "b.mov", os.urandom(3 * PARTIAL_BYTES))
+    os.utime(path, (1, 1))
+    assert DuplicateFinder().run(assets) == {"small_copy": ["small"]}
+    assert "duplicate_of" not in assets["copy"]
+    assert partial == ["b.mov"]
+    assert full == []
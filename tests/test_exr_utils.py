@@ -0,0 +1,102 @@
+import os
+import struct
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support_files.exr_utils import (FLAG_MULTIPART, MAGIC, ExrError, header_metadata, read_header,
+                                     read_sequence)
+
+
+def attribute(name, type_name, data):
+    return name.encode() + b'\0' + type_name.encode() + b'\0' + struct.pack('<i', len(data)) + data
+
+
+def channels(names):
+    return b''.join(name.encode() + b'\0' + struct.pack('<iB3xii', 1, 0, 1, 1) for name in names) + b'\0'
+
+
+def part(width=2048, height=1152, extra=b''):
+    return (attribute('channels', 'chlist', channels(['A', 'B', 'G', 'R']))
+            + attribute('compression', 'compression', bytes([3]))
+            + attribute('dataWindow', 'box2i', struct.pack('<4i', 0, 0, width - 1, height - 1))
+            + attribute('displayWindow', 'box2i', struct.pack('<4i', 0, 0, width - 1, height - 1))
+            + attribute('lineOrder', 'lineOrder', bytes([0]))
+            + attribute('pixelAspectRatio', 'float', struct.pack('<f', 1.0))
+            + extra + b'\0')
+
+
+def write_exr(path, parts, flags=0, pixels=4096):
+    header = MAGIC + struct.pack('<i', 2 | flags) + b''.join(parts)
+    if flags & FLAG_MULTIPART:
+        header += b'\0'
+    with open(path, 'wb') as f:
+        f.write(header + bytes(pixels))
+    return str(path)
+
+
+def test_single_part(tmp_path):
+    extra = (attribute('framesPerSecond', 'rational', struct.pack('<iI', 24000, 1001))
+             + attribute('timeCode', 'timecode', struct.pack('<2I', 0x01235912, 0))
+             + attribute('cameraModel', 'string', b'ARRI ALEXA 35')
+             + attribute('worldToCamera', 'm44f', struct.pack('<16f', *range(16)))
+             + attribute('preview', 'preview', struct.pack('<II', 2, 2) + bytes(16)))
+    path = write_exr(tmp_path / 'plate.exr', [part(extra=extra)])
+
+    header = read_header(path)
+    assert header['version'] == 2
+    assert header['flags'] == 0
+    assert len(header['parts']) == 1
+    assert 'preview' not in header['parts'][0]
+    assert header['header_size'] == os.path.getsize(path) - 4096
+
+    fields = header_metadata(header)
+    assert fields['resolution'] == '2048x1152'
+    assert 'display_resolution' not in fields
+    # R, G, B, A first like iinfo, not in the stored alphabetical order
+    assert fields['channels'] == 'R, G, B, A'
+    assert fields['channel_count'] == 4
+    assert fields['bit_depth'] == 'half'
+    assert fields['compression'] == 'zip'
+    assert fields['pixel_aspect'] == 1.0
+    assert fields['fps'] == 23.976
+    assert fields['timecode'] == '01:23:59:12'
+    assert fields['exr_camera_model'] == 'ARRI ALEXA 35'
+    assert 'exr_world_to_camera' not in fields
+
+
+def test_multipart(tmp_path):
+    path = write_exr(tmp_path / 'layers.exr', [part(), part(1024, 576)], flags=FLAG_MULTIPART)
+    header = read_header(path)
+    assert [p['dataWindow'] for p in header['parts']] == [(0, 0, 2047, 1151), (0, 0, 1023, 575)]
+    fields = header_metadata(header)
+    assert fields['parts'] == 2
+    assert fields['resolution'] == '2048x1152'
+
+
+def test_not_an_exr(tmp_path):
+    path = tmp_path / 'plate.exr'
+    path.write_bytes(b'\x89PNG\r\n\x1a\n' + bytes(64))
+    with pytest.raises(ExrError):
+        read_header(str(path))
+
+
+def test_truncated_header(tmp_path):
+    path = tmp_path / 'plate.exr'
+    path.write_bytes((MAGIC + struct.pack('<i', 2) + part())[:40])
+    with pytest.raises(ExrError):
+        read_header(str(path))
+
+
+def test_sequence_with_bad_frames(tmp_path):
+    paths = [write_exr(tmp_path / f'plate.{frame}.exr', [part()]) for frame in range(1001, 1004)]
+    # Render killed after the header, and a frame that is not an EXR at all
+    write_exr(paths[1], [part()], pixels=0)
+    with open(paths[2], 'wb') as f:
+        f.write(bytes(8192))
+
+    fields, invalid = read_sequence(paths)
+    assert fields['resolution'] == '2048x1152'
+    assert invalid == paths[1:]
@@ -0,0 +1,108 @@
+import os
+import sys
+import time
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support_files.farm import FarmQueue, FarmWorker, collect_results
+
+
+class RecordingWorker(FarmWorker):
+    """Logs the jobs it processes instead of running encoders"""
+
+    def __init__(self, root, log, **kwargs):
+        super().__init__(root, **kwargs)
+        self.log = log
+
+    def process(self, job):
+        with open(os.path.join(self.log, f"{self.name}.txt"), 'a') as f:
+            f.write(job['id'] + '\n')
+        time.sleep(0.01)
+        return {asset_id: {'resolution': '1920x1080', 'worker': self.name} for asset_id in job['assets']}
+
+
+def work(root, log, name):
+    RecordingWorker(root, log, name=name, poll=0.05, lease=60).run(drain=True)
+
+
+def make_assets(root, count):
+    return {f"asset{i}": {'name': f"asset{i}.exr", 'type': 'image', 'path': os.path.join(root, 'shots', f"asset{i}.exr")}
+            for i in range(count)}
+
+
+def run_workers(root, log, count):
+    processes = [multiprocessing.Process(target=work, args=(root, log, f"worker{n}")) for n in range(count)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+
+def processed_jobs(log):
+    jobs = []
+    for name in os.listdir(log):
+        with open(os.path.join(log, name)) as f:
+            jobs.extend(f.read().split())
+    return jobs
+
+
+def test_each_job_is_claimed_once(tmp_path):
+    root, log = str(tmp_path / 'library'), str(tmp_path / 'log')
+    os.makedirs(log)
+    database = make_assets(root, 200)
+    queue = FarmQueue(root)
+    assert queue.submit(database, batch_size=4) == 50
+
+    run_workers(root, log, 4)
+
+    jobs = processed_jobs(log)
+    assert len(jobs) == 50
+    assert len(set(jobs)) == 50
+    assert queue.counts() == {'pending': 0, 'claimed': 0, 'done': 50, 'failed': 0}
+
+    updates = collect_results(root, database)
+    assert set(updates) == set(database)
+    assert all(info['resolution'] == '1920x1080' for info in database.values())
+    assert queue.counts()['done'] == 0
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    root, log = str(tmp_path / 'library'), str(tmp_path / 'log')
+    os.makedirs(log)
+    database = make_assets(root, 8)
+    queue = FarmQueue(root, lease=60)
+    queue.submit(database, batch_size=4)
+
+    # A worker claimed a job and died: no heartbeat since
+    dead = queue.claim('dead')
+    old = time.time() - 3600
+    os.utime(dead.path, (old, old))
+
+    run_workers(root, log, 2)
+
+    jobs = processed_jobs(log)
+    assert len(jobs) == len(set(jobs)) == 2
+    # Taken back from the dead worker and done by a live one
+    assert dead.id in jobs
+    assert queue.counts() == {'pending': 0, 'claimed': 0, 'done': 2, 'failed': 0}
+    assert set(collect_results(root, database)) == set(database)
+
+
+def test_lost_lease_commit_is_collected_once(tmp_path):
+    root = str(tmp_path / 'library')
+    database = make_assets(root, 4)
+    queue = FarmQueue(root, lease=60)
+    queue.submit(database, batch_size=4)
+
+    slow = queue.claim('slow')
+    old = time.time() - 3600
+    os.utime(slow.path, (old, old))
+    assert queue.requeue_expired() == 1
+    assert not slow.renew()
+    # The slow worker still commits, its requeued copy is dropped with the results
+    slow.commit({asset_id: {'resolution': '2048x1080'} for asset_id in slow.job['assets']})
+
+    assert set(queue.collect(os.path.join(root, '.db', 'thumbnails'))) == set(database)
+    assert queue.counts() == {'pending': 0, 'claimed': 0, 'done': 0, 'failed': 0}
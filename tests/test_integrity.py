@@ -0,0 +1,64 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support_files import library
+from support_files.integrity import frame_ranges, sequence_integrity
+from support_files.library import LibraryScanner
+
+
+def test_frame_ranges():
+    assert frame_ranges([]) == ''
+    assert frame_ranges([9, 1, 2, 3, 7, 10, 2]) == '1-3,7,9-10'
+
+
+def test_gaps_and_short_frames():
+    frames = [1001, 1002, 1003, 1007, 1008, 1010]
+    sizes = [5000, 4800, 0, 5100, 300, 4900]
+    assert sequence_integrity(frames, sizes) == {'missing_frames': '1004-1006,1009',
+                                                 'short_frames': '1003,1008'}
+
+
+def test_clean_sequence():
+    # Dark frames compress well: smaller, but not far enough off the median
+    sizes = [5000, 5000, 1200, 5000]
+    assert sequence_integrity([4, 1, 3, 2], sizes) == {'missing_frames': '', 'short_frames': ''}
+
+
+def write(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(bytes(size))
+
+
+def test_scanner_checks_sequences(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    for frame in (1001, 1002, 1003, 1005, 1006):
+        write(os.path.join(root, 'shot', f"plate.{frame}.exr"), 10 if frame == 1003 else 1000)
+    write(os.path.join(root, 'shot', 'notes.txt'), 50)
+    write(os.path.join(root, 'shot', 'ref.mov'), 50)
+
+    looked_up = []
+    original = library._EntrySizes.get
+
+    def get(self, filename, default=0):
+        looked_up.append(filename)
+        return original(self, filename, default)
+    monkeypatch.setattr(library._EntrySizes, 'get', get)
+
+    assets = LibraryScanner(root, check_integrity=True).run()
+    sequence, = [info for info in assets.values() if info['type'] == 'sequence']
+    assert sequence['missing_frames'] == '1004'
+    assert sequence['short_frames'] == '1003'
+    # Only the frames are stat'ed, not the other files of the folder
+    assert sorted(looked_up) == [f"plate.{frame}.exr" for frame in (1001, 1002, 1003, 1005, 1006)]
+
+
+def test_scanner_without_integrity(tmp_path):
+    root = str(tmp_path)
+    for frame in (1, 2, 4):
+        write(os.path.join(root, f"plate.{frame:04d}.exr"), 1000)
+    sequence, = LibraryScanner(root).run().values()
+    assert sequence['frame_count'] == 3
+    assert 'missing_frames' not in sequence
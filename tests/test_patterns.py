@@ -0,0 +1,34 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support_files.patterns import PatternEngine
+
+
+def group(folder, filenames):
+    for filename in filenames:
+        open(os.path.join(folder, filename), 'w').close()
+    assets = PatternEngine().group_directory(str(folder), filenames)
+    return {info['name']: info for _, info in assets}
+
+
+def test_stereo_views_merge(tmp_path):
+    assets = group(tmp_path, [f"plate_{view}.{frame:04d}.exr" for view in ('left', 'right') for frame in (1, 2)])
+    assert list(assets) == ['plate_%V[0001-0002].exr']
+    assert assets['plate_%V[0001-0002].exr']['views'] == 'left, right'
+
+
+def test_view_separators_stay_apart(tmp_path):
+    filenames = [f"plate{sep}{view}.{frame:04d}.exr"
+                 for sep, views in (('_', ('left', 'right')), ('.', ('l', 'r'))) for view in views for frame in (1, 2)]
+    assets = group(tmp_path, filenames)
+    assert sorted(assets) == ['plate.%v[0001-0002].exr', 'plate_%V[0001-0002].exr']
+    assert assets['plate_%V[0001-0002].exr']['views'] == 'left, right'
+    assert assets['plate.%v[0001-0002].exr']['views'] == 'l, r'
+
+
+def test_short_and_long_view_names_stay_apart(tmp_path):
+    filenames = [f"plate_{view}.0001.exr" for view in ('left', 'right', 'l', 'r')]
+    assets = group(tmp_path, filenames)
+    assert sorted(assets) == ['plate_%V[0001-0001].exr', 'plate_%v[0001-0001].exr']
@@ -0,0 +1,66 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support_files.query import QueryError, QueryFilter, parse_query
+from support_files.search_index import SearchIndex
+
+
+def test_terms_and_filters():
+    query = parse_query("Plate type:sequence,video ext:.exr path:C:\\Shots\\* c:/shots")
+    assert query.terms == ["plate", "c:/shots"]
+    assert query.filters == [QueryFilter("type", "=", ("sequence", "video"), False),
+                             QueryFilter("ext", "=", ("exr",), False),
+                             QueryFilter("path", "=", "c:/shots/*", False)]
+    assert not query.fuzzy
+
+
+def test_frame_ranges():
+    inf = float("inf")
+    assert parse_query("frames>100").filters[0].value == (101, inf)
+    assert parse_query("frames>=100").filters[0].value == (100, inf)
+    assert parse_query("frames<100").filters[0].value == (-inf, 100)
+    assert parse_query("frame_count<=100").filters[0].value == (-inf, 101)
+    assert parse_query("frames:100").filters[0].value == (100, 101)
+
+
+def test_date_ranges():
+    low, high = parse_query("ctime:2026-02").filters[0].value
+    assert (low, high) == (datetime(2026, 2, 1).timestamp(), datetime(2026, 3, 1).timestamp())
+    low, high = parse_query("date>2025").filters[0].value
+    assert low == datetime(2026, 1, 1).timestamp()
+    low, high = parse_query("ctime<2025-12-31").filters[0].value
+    assert high == datetime(2025, 12, 31).timestamp()
+
+
+def test_negation():
+    assert parse_query("-type:video").filters == [QueryFilter("type", "=", ("video",), True)]
+
+
+@pytest.mark.parametrize("text", ["frames>many", "ctime>yesterday", "type>image", "name<a"])
+def test_malformed_filters(text):
+    with pytest.raises(QueryError):
+        parse_query(text)
+
+
+def test_filters_on_the_index():
+    index = SearchIndex()
+    index.add_many({
+        "seq": {"name": "plate[1001-1100].exr", "path": "/shots/ab010/plate.1001.exr", "type": "sequence",
+                "frame_count": 100, "ctime": datetime(2026, 3, 2).timestamp()},
+        "mov": {"name": "plate.mov", "path": "/shots/ab010/plate.mov", "type": "video",
+                "ctime": datetime(2025, 6, 1).timestamp()},
+        "jpg": {"name": "ref.jpg", "path": "/refs/ref.jpg", "type": "image",
+                "ctime": datetime(2026, 1, 5).timestamp()},
+    })
+    assert index.search("type:sequence") == ["seq"]
+    assert sorted(index.search("-type:video")) == ["jpg", "seq"]
+    assert index.search("frames>=100") == ["seq"]
+    assert sorted(index.search("ctime>=2026")) == ["jpg", "seq"]
+    assert index.search("plate ext:mov") == ["mov"]
+    assert sorted(index.search("path:/shots/ab*")) == ["mov", "seq"]
+    assert index.search("name:ref*") == ["jpg"]
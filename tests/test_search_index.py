@@ -0,0 +1,65 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support_files.query import parse_query
+from support_files.search_index import SearchIndex
+
+
+def make_index(*names):
+    index = SearchIndex()
+    index.add_many({name: {"name": name, "path": f"/library/{name}", "type": "image"} for name in names})
+    return index
+
+
+def test_fuzzy_within_a_token():
+    index = make_index("plate_comp.exr", "smoke_fg.exr")
+    assert index.fuzzy_search("~smk") == ["smoke_fg.exr"]
+
+
+def test_fuzzy_across_tokens():
+    index = make_index("plate_comp.exr", "sh010_plate.exr", "smoke_fg.exr")
+    assert index.fuzzy_search("~pltcmp") == ["plate_comp.exr"]
+    assert index.fuzzy_search("~shplate") == ["sh010_plate.exr"]
+
+
+def test_fuzzy_across_tokens_while_typing():
+    index = make_index("plate_comp.exr", "sh010_plate.exr", "plate_bg.exr")
+    assert sorted(index.fuzzy_search("~plt")) == ["plate_bg.exr", "plate_comp.exr", "sh010_plate.exr"]
+    # Narrowed from the cached matches of 'plt'
+    assert index.fuzzy_search("~pltc") == ["plate_comp.exr"]
+    assert index.fuzzy_search("~pltcmp") == ["plate_comp.exr"]
+
+
+def test_fuzzy_across_tokens_with_filters():
+    index = make_index("plate_comp.exr", "plate_comp.mov")
+    assert index.fuzzy_search("~pltcmp ext:mov") == ["plate_comp.mov"]
+
+
+def test_empty_fuzzy_query():
+    assert not parse_query("~")
+    assert not parse_query("~ _")
+    assert parse_query("~ ext:mov").filters
+
+
+def test_glob_class_does_not_prune():
+    index = make_index("bg_plate.exr", "zplate.exr")
+    # No token contains 'zzz', the class must not be looked up as text
+    assert index.search("name:*[!zzz]plate*") == ["bg_plate.exr"]
+    assert index.search("name:[]z]plate*") == ["zplate.exr"]
+
+
+def test_removed_assets_are_not_found(tmp_path):
+    index = make_index("plate_comp.exr", "plate_bg.exr")
+    index.remove("plate_bg.exr")
+    assert len(index) == 1
+    assert index.search("plate") == ["plate_comp.exr"]
+    assert index.search("name:plate*") == ["plate_comp.exr"]
+    assert index.fuzzy_search("~plt") == ["plate_comp.exr"]
+
+    index.path = str(tmp_path / "search_index.json")
+    index.save()
+    loaded = SearchIndex(index.path)
+    loaded.load()
+    assert loaded.search("plate") == ["plate_comp.exr"]
@@ -0,0 +1,166 @@
+import os
+import sys
+import time
+import multiprocessing
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support_files.shared_db import LockTimeout, SharedDatabase, WriterLock
+
+
+ASSETS = {f"asset{i}": {"name": f"asset{i}.exr", "type": "image"} for i in range(20)}
+
+
+def make_library(root):
+    SharedDatabase(root).save({asset_id: dict(info) for asset_id, info in ASSETS.items()})
+
+
+def writer(root, name, rounds):
+    """Sets its own field on every asset and adds an asset per round, merging the others' saves"""
+    SharedDatabase.compact_every = 5
+    shared = SharedDatabase(root)
+    database = shared.load()
+    for n in range(rounds):
+        polled = shared.poll()
+        if polled is not None:
+            shared.apply(database, *polled)
+        for info in database.values():
+            info[name] = n
+        database[f"{name}-{n}"] = {"name": f"{name}-{n}.exr", "type": "image"}
+        shared.save(database)
+
+
+def test_concurrent_writers_lose_nothing(tmp_path):
+    root = str(tmp_path)
+    make_library(root)
+    rounds = 15
+    processes = [multiprocessing.Process(target=writer, args=(root, name, rounds)) for name in ("a", "b")]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    shared = SharedDatabase(root)
+    database = shared.load()
+    for asset_id in ASSETS:
+        assert database[asset_id]["a"] == rounds - 1
+        assert database[asset_id]["b"] == rounds - 1
+    for name in ("a", "b"):
+        for n in range(rounds):
+            assert f"{name}-{n}" in database
+    # One generation per save: the first one and every round of both writers
+    state = shared.state()
+    assert state["generation"] == 1 + 2 * rounds
+    assert 0 < state["snapshot"] <= state["generation"]
+    assert not os.path.exists(shared.lock().path)
+
+
+def test_compaction_keeps_the_content(tmp_path):
+    root = str(tmp_path)
+    make_library(root)
+    shared = SharedDatabase(root)
+    shared.compact_every = 3
+    database = shared.load()
+    for n in range(10):
+        database["asset0"]["count"] = n
+        shared.save(database)
+    # Generations 2-11 after the first save, folded into database.json every 3
+    state = shared.state()
+    assert (state["generation"], state["snapshot"]) == (11, 10)
+    # The entries of the last compact_every generations stay for readers a little behind
+    assert sorted(os.listdir(shared.journal_path)) == [f"{generation:010d}.json" for generation in range(8, 12)]
+    assert SharedDatabase(root).load() == database
+
+
+def test_apply_merges_another_writer(tmp_path):
+    root = str(tmp_path)
+    make_library(root)
+    mine, theirs = SharedDatabase(root), SharedDatabase(root)
+    database, other = mine.load(), theirs.load()
+
+    other["asset1"]["resolution"] = "4096x2160"
+    other["asset2"]["resolution"] = "1920x1080"
+    other["new"] = {"name": "new.exr", "type": "image"}
+    del other["asset3"]
+    theirs.save(other)
+    # Changed here and not saved yet: wins over theirs
+    database["asset2"]["resolution"] = "2048x1080"
+    database["asset1"]["note"] = "mine"
+
+    changed, added, removed = mine.apply(database, *mine.poll())
+    assert changed == {"asset1"}
+    assert added == {"new"}
+    assert removed == {"asset3"}
+    assert database["asset1"] == {"name": "asset1.exr", "type": "image", "resolution": "4096x2160", "note": "mine"}
+    assert database["asset2"]["resolution"] == "2048x1080"
+    assert "asset3" not in database
+    assert mine.poll() is None
+
+    mine.save(database)
+    stored = SharedDatabase(root).load()
+    assert stored["asset2"]["resolution"] == "2048x1080"
+    assert stored["asset1"]["note"] == "mine"
+
+
+def test_apply_after_the_journal_was_compacted_away(tmp_path):
+    root = str(tmp_path)
+    make_library(root)
+    mine, theirs = SharedDatabase(root), SharedDatabase(root)
+    database, other = mine.load(), theirs.load()
+    theirs.compact_every = 1
+    for n in range(4):
+        other["asset0"]["count"] = n
+        theirs.save(other)
+
+    generation, changes = mine.poll()
+    assert "snapshot" in changes[0]
+    changed, added, removed = mine.apply(database, generation, changes)
+    assert (changed, added, removed) == ({"asset0"}, set(), set())
+    assert database["asset0"]["count"] == 3
+
+
+def test_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "test.lock")
+    with WriterLock(path) as lock:
+        with pytest.raises(LockTimeout):
+            with WriterLock(path, timeout=0.2):
+                pass
+        assert open(path).read() == lock.owner
+    assert not os.path.exists(path)
+
+
+def test_stale_lock_is_broken(tmp_path):
+    path = str(tmp_path / "test.lock")
+    with open(path, "w") as f:
+        f.write("crashed-1")
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    with WriterLock(path, lease=60, timeout=2) as lock:
+        assert open(path).read() == lock.owner
+    assert sorted(os.listdir(tmp_path)) == [".clock"]
+
+
+def test_fresh_lock_taken_meanwhile_is_not_broken(tmp_path, monkeypatch):
+    path = str(tmp_path / "test.lock")
+    with open(path, "w") as f:
+        f.write("crashed-1")
+    old = time.time() - 120
+    os.utime(path, (old, old))
+
+    rename = os.rename
+
+    def released_and_taken_again(source, destination):
+        # Between the age check and the rename, the holder lets go and another writer takes the lock
+        monkeypatch.setattr(os, "rename", rename)
+        os.remove(path)
+        with open(path, "w") as f:
+            f.write("fresh-2")
+        rename(source, destination)
+
+    monkeypatch.setattr(os, "rename", released_and_taken_again)
+    WriterLock(path, lease=60)._break_if_stale()
+    assert open(path).read() == "fresh-2"
+    assert sorted(os.listdir(tmp_path)) == [".clock", "test.lock"]
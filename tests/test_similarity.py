@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support_files.similarity import SimilarityIndex
+
+
+def test_similar_and_removed():
+    index = SimilarityIndex()
+    index.add("a", 0xFFFF0000FFFF0000)
+    index.add("b", 0xFFFF0000FFFF0001)
+    index.add("c", 0xFFFF0000FFFF0003)
+    index.add("far", 0x0000FFFF0000FFFF)
+    assert index.similar("a") == [(1, "b"), (2, "c")]
+
+    index.remove("b")
+    assert index.hash_of("b") is None
+    assert index.similar("a") == [(2, "c")]
+    assert len(index) == 3
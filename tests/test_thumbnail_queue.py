@@ -0,0 +1,110 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support_files.library import load_json
+from support_files.thumbnails import ThumbnailGenerator, ThumbnailQueue
+
+
+class StubThumbnails(ThumbnailGenerator):
+    """Writes an empty thumbnail, or fails for inputs named bad*"""
+
+    converted = None
+
+    def _convert_one(self, file, queued):
+        self.converted.append(os.path.basename(file['path']))
+        if os.path.basename(file['path']).startswith('bad'):
+            return None
+        path = os.path.join(self.thumbnail_path, os.path.basename(file['path']) + '.jpeg')
+        open(path, 'wb').close()
+        return path
+
+
+def write(path, data=b'data'):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def test_states(tmp_path):
+    source = write(tmp_path / 'plate.exr')
+    thumbnail = write(tmp_path / 'plate.jpeg')
+    queue = ThumbnailQueue(str(tmp_path / 'queue.json'))
+    assert queue.todo('a', source)
+    assert queue.entries['a']['state'] == 'pending'
+    queue.done('a', thumbnail)
+    assert not queue.todo('a', source)
+    # Thumbnail deleted since: converted again
+    os.remove(thumbnail)
+    assert queue.todo('a', source)
+    # Another file under the same id starts over
+    queue.failed('a', 'no decoder')
+    assert queue.todo('a', write(tmp_path / 'other.exr'))
+    assert queue.entries['a']['tries'] == 0
+
+
+def test_failed_inputs_are_given_up_on_until_they_change(tmp_path):
+    source = write(tmp_path / 'broken.exr')
+    queue = ThumbnailQueue(str(tmp_path / 'queue.json'))
+    for _ in range(queue.max_tries):
+        assert queue.todo('a', source)
+        queue.failed('a', 'no decoder')
+    assert queue.entries['a']['tries'] == queue.max_tries
+    assert not queue.todo('a', source)
+
+    write(source, b'fixed render')
+    assert queue.todo('a', source)
+    assert queue.entries['a']['tries'] == 0
+
+
+def test_saves_only_after_the_interval(tmp_path):
+    path = str(tmp_path / 'queue.json')
+    queue = ThumbnailQueue(path)
+    queue.todo('a', 'a.exr')
+    assert not os.path.exists(path)
+    queue.save_interval = 0
+    queue.todo('b', 'b.exr')
+    assert set(load_json(path)) == {'a', 'b'}
+
+
+def test_saves_merge(tmp_path):
+    path = str(tmp_path / 'queue.json')
+    first, second = ThumbnailQueue(path), ThumbnailQueue(path)
+    first.todo('a', 'a.exr')
+    second.todo('b', 'b.exr')
+    second.failed('b', 'no decoder')
+    first.save()
+    second.save()
+    entries = load_json(path)
+    assert set(entries) == {'a', 'b'}
+    assert entries['b']['state'] == 'failed'
+    # Nothing changed since the last save: the file is not rewritten
+    os.remove(path)
+    first.save()
+    assert not os.path.exists(path)
+
+
+def test_interrupted_pass_resumes(tmp_path):
+    thumbnails = tmp_path / 'thumbnails'
+    thumbnails.mkdir()
+    path = str(tmp_path / 'queue.json')
+    assets = {name: {'path': write(tmp_path / f"{name}.exr")} for name in ('a', 'b', 'bad')}
+
+    def run(assets):
+        generator = StubThumbnails(str(thumbnails), assets, max_workers=2, find_duplicates=False,
+                                   queue=ThumbnailQueue(path))
+        generator.converted = []
+        generator.run()
+        return sorted(generator.converted)
+
+    assert run({'a': assets['a']}) == ['a.exr']
+    # A new pass (e.g. after a crash) only converts what the queue has no result for
+    fresh = {key: {'path': info['path']} for key, info in assets.items()}
+    assert run(fresh) == ['b.exr', 'bad.exr']
+    assert fresh['a']['thumbnail'] == str(thumbnails / 'a.exr.jpeg')
+
+    for _ in range(ThumbnailQueue.max_tries):
+        run({'bad': {'path': assets['bad']['path']}})
+    assert load_json(path)['bad']['state'] == 'failed'
+    assert run({key: {'path': info['path']} for key, info in assets.items()}) == []